@@ -7,10 +7,242 @@ Pytest配置文件和共享fixtures
 import pytest
 import json
 import os
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+import time
+from datetime import datetime
+
+from pages import HomePage
+from utils.api_client import APIClient
+from utils.cdp_fetch import FetchInterceptor
+from utils.driver_pool import DriverPool, chrome_factory
+from utils.driver_resolver import resolve_driver_path
+from utils import command_profiler, data_provider, impact_map, memory_monitor, page_profiles, wait_stats
+from utils.flaky import DEFAULT_QUARANTINE_FILE, RERUN, load_quarantine, run_with_reruns
+from utils.http_cache import DEFAULT_CACHE_DIR, MODES, HttpCache
+from utils.locator_index import DEFAULT_INDEX_PATH, LocatorIndex
+from utils.replica_server import DEFAULT_SNAPSHOT_DIR, LIVE_BASE_URL, ReplicaServer
+from utils.result_sink import DEFAULT_STREAM_PATH, VISUAL_DIFFS, ResultSink
+from utils import scheduler
+from utils.history_store import DEFAULT_DB_PATH, HistoryStore, outcome_of
+from utils.page_metrics import DEFAULT_BUDGETS_FILE, load_budgets
+from utils.site_crawler import DEFAULT_CHECKPOINT
+from utils.visual import DEFAULT_BASELINE_DIR, BaselineStore
+from utils.waits import use_explicit_lookups
+
+
+# 本次运行中每个测试各阶段的耗时和结果 {nodeid: {"setup": 秒, ..., "phases": {...}}}
+_run_results = {}
+_session_started_at = datetime.now()
+
+# 主进程的结果事件流，每个测试阶段报告到达时立即写入
+_result_sink = None
+
+# 本次运行中每个测试前后的浏览器内存 {nodeid: memory_monitor.compare()的返回值}
+_memory_records = {}
+
+# 本次运行中每个测试的元素查找和等待耗时 {nodeid: wait_stats.take()的返回值}
+_wait_records = {}
+
+# 本次运行中每个测试的WebDriver命令汇总 {nodeid: command_profiler.summarize()的返回值}
+_command_records = {}
+
+# 本进程的命令时间线(指定 --command-trace 时)
+_trace_writer = None
+
+# 本次运行中每个测试的依赖记录，结束时合并到影响图 {nodeid: {"data", "fixtures", "urls"}}
+_impact_records = {}
+
+
+def pytest_addoption(parser):
+    """添加命令行选项"""
+    group = parser.getgroup("nikon", "尼康网站测试")
+    group.addoption(
+        "--pool-size",
+        type=int,
+        default=int(os.environ.get("DRIVER_POOL_SIZE", 1)),
+        help="每个进程预热的浏览器数量 (默认: 1, 环境变量 DRIVER_POOL_SIZE)"
+    )
+    group.addoption(
+        "--driver-max-uses",
+        type=int,
+        default=int(os.environ.get("DRIVER_MAX_USES", 20)),
+        help="浏览器被复用多少次后回收重建 (默认: 20, 环境变量 DRIVER_MAX_USES)"
+    )
+    group.addoption(
+        "--target",
+        choices=["live", "replica"],
+        default=os.environ.get("NIKON_TARGET", "live"),
+        help="测试目标: live为线上站点，replica为本地镜像 (默认: live, 环境变量 NIKON_TARGET)"
+    )
+    group.addoption(
+        "--replica-dir",
+        default=os.environ.get("NIKON_REPLICA_DIR", DEFAULT_SNAPSHOT_DIR),
+        help="本地镜像快照目录 (环境变量 NIKON_REPLICA_DIR)"
+    )
+    group.addoption(
+        "--http-cache",
+        choices=MODES,
+        default=os.environ.get("NIKON_HTTP_CACHE", "off"),
+        help="HTTP录制/回放: record录制，replay离线回放 (默认: off, 环境变量 NIKON_HTTP_CACHE)"
+    )
+    group.addoption(
+        "--http-cache-dir",
+        default=os.environ.get("NIKON_HTTP_CACHE_DIR", DEFAULT_CACHE_DIR),
+        help="HTTP缓存目录 (环境变量 NIKON_HTTP_CACHE_DIR)"
+    )
+    group.addoption(
+        "--http-refresh",
+        action="append",
+        default=[],
+        metavar="URL_PATTERN",
+        help="回放模式下需要重新录制的URL通配模式，可重复指定"
+    )
+    group.addoption(
+        "--order",
+        choices=["default", "duration"],
+        default="default",
+        help="测试顺序: duration按历史耗时排序，串行时最近失败的测试优先、其余由快到慢，"
+             "并行时最长优先以均衡负载 (默认: default)"
+    )
+    group.addoption(
+        "--smart-schedule",
+        action="store_const",
+        const="duration",
+        dest="order",
+        help="等同于 --order duration"
+    )
+    group.addoption(
+        "--history-db",
+        default=os.environ.get("NIKON_HISTORY_DB", DEFAULT_DB_PATH),
+        help="测试耗时历史数据库 (环境变量 NIKON_HISTORY_DB)"
+    )
+    group.addoption(
+        "--perf-budgets",
+        default=DEFAULT_BUDGETS_FILE,
+        help="页面性能预算配置文件 (默认: perf_budgets.json)"
+    )
+    group.addoption(
+        "--perf-runs",
+        type=int,
+        default=None,
+        help="性能测试每种加载模式的采样次数 (默认取预算文件中的runs)"
+    )
+    group.addoption(
+        "--memory-limit-mb",
+        type=int,
+        default=int(os.environ.get("NIKON_MEMORY_LIMIT_MB", memory_monitor.DEFAULT_LIMIT_MB)),
+        help="测试结束时浏览器进程内存超过该值(MB)则回收浏览器，0为不限制 "
+             "(默认: 1536, 环境变量 NIKON_MEMORY_LIMIT_MB)"
+    )
+    group.addoption(
+        "--no-memory-monitor",
+        action="store_true",
+        default=False,
+        help="不在每个测试前后采样浏览器内存"
+    )
+    group.addoption(
+        "--results-stream",
+        default=os.environ.get("NIKON_RESULTS_STREAM", DEFAULT_STREAM_PATH),
+        help="逐条写入测试事件的JSONL文件，空字符串表示不写 (环境变量 NIKON_RESULTS_STREAM)"
+    )
+    group.addoption(
+        "--flaky-reruns",
+        type=int,
+        default=int(os.environ.get("NIKON_FLAKY_RERUNS", 0)),
+        help="失败的测试在新浏览器上重跑的次数，重跑通过记为flaky (默认: 0 不重跑, 环境变量 NIKON_FLAKY_RERUNS)"
+    )
+    group.addoption(
+        "--quarantine",
+        action="store_true",
+        default=False,
+        help="跳过隔离名单中的不稳定测试，它们不参与本次运行"
+    )
+    group.addoption(
+        "--run-quarantined",
+        action="store_true",
+        default=False,
+        help="只运行隔离名单中的测试"
+    )
+    group.addoption(
+        "--quarantine-file",
+        default=DEFAULT_QUARANTINE_FILE,
+        help="不稳定测试隔离名单 (默认: quarantine.json)"
+    )
+    group.addoption(
+        "--update-baselines",
+        action="store_true",
+        default=False,
+        help="用本次截图覆盖视觉回归基线"
+    )
+    group.addoption(
+        "--baseline-dir",
+        default=os.environ.get("NIKON_BASELINE_DIR", DEFAULT_BASELINE_DIR),
+        help="视觉回归基线目录 (环境变量 NIKON_BASELINE_DIR)"
+    )
+    group.addoption(
+        "--changed",
+        nargs="?",
+        const="HEAD",
+        default=None,
+        metavar="REV",
+        help="只运行受工作区相对于REV(默认HEAD)的修改影响的测试，例如 --changed origin/main"
+    )
+    group.addoption(
+        "--changed-url",
+        action="append",
+        default=[],
+        metavar="URL_PATTERN",
+        help="只运行加载过匹配页面的测试(路径或URL，支持通配符)，可重复指定"
+    )
+    group.addoption(
+        "--impact-map",
+        default=os.environ.get("NIKON_IMPACT_MAP", impact_map.DEFAULT_MAP_PATH),
+        help="测试依赖记录文件 (环境变量 NIKON_IMPACT_MAP)"
+    )
+    group.addoption(
+        "--crawl",
+        action="store_true",
+        default=False,
+        help="运行站点爬取回归(耗时较长，默认跳过)"
+    )
+    group.addoption(
+        "--crawl-depth",
+        type=int,
+        default=int(os.environ.get("NIKON_CRAWL_DEPTH", 2)),
+        help="爬取深度，首页为0 (默认: 2, 环境变量 NIKON_CRAWL_DEPTH)"
+    )
+    group.addoption(
+        "--crawl-max-pages",
+        type=int,
+        default=None,
+        help="最多检查的页面数，达到后保存检查点，下次运行继续 (默认: 不限)"
+    )
+    group.addoption(
+        "--crawl-checkpoint",
+        default=os.environ.get("NIKON_CRAWL_CHECKPOINT", DEFAULT_CHECKPOINT),
+        help="爬取检查点文件 (环境变量 NIKON_CRAWL_CHECKPOINT)"
+    )
+    group.addoption(
+        "--data-limit",
+        type=int,
+        default=int(os.environ["NIKON_DATA_LIMIT"]) if os.environ.get("NIKON_DATA_LIMIT") else None,
+        help="data_source标记的数据源最多使用多少条记录 (默认: 全部, 环境变量 NIKON_DATA_LIMIT)"
+    )
+    group.addoption(
+        "--locator-index",
+        default=os.environ.get("NIKON_LOCATOR_INDEX", DEFAULT_INDEX_PATH),
+        help="页面对象定位器索引文件 (环境变量 NIKON_LOCATOR_INDEX)"
+    )
+    group.addoption(
+        "--zero-implicit-wait",
+        action="store_true",
+        default=os.environ.get("NIKON_ZERO_IMPLICIT_WAIT") == "1",
+        help="隐式等待固定为0，find_element改为显式超时、find_elements不等待 (环境变量 NIKON_ZERO_IMPLICIT_WAIT=1)"
+    )
+    group.addoption(
+        "--command-trace",
+        default=os.environ.get("NIKON_COMMAND_TRACE"),
+        help="导出WebDriver命令时间线(Chrome trace_event JSON)，并行时每个worker一个文件 (环境变量 NIKON_COMMAND_TRACE)"
+    )
 
 
 def pytest_configure(config):
@@ -23,35 +255,312 @@ def pytest_configure(config):
     config.addinivalue_line("markers", "regression: 回归测试标记")
     config.addinivalue_line("markers", "ui: UI测试标记")
     config.addinivalue_line("markers", "api: API测试标记")
+    config.addinivalue_line("markers", "slow: 慢速测试标记")
+    config.addinivalue_line("markers", "browser: 需要浏览器的测试")
+    config.addinivalue_line("markers", "viewport: 需要调整窗口尺寸的测试")
+    config.addinivalue_line("markers", "http: 只发送HTTP请求、不需要浏览器的测试")
+    config.addinivalue_line("markers", "crawl: 站点爬取回归，需要 --crawl 才会运行")
+    config.addinivalue_line("markers", "visual: 视觉回归(截图与基线比较)")
+    config.addinivalue_line("markers", "profile(name): 页面加载配置，如 text-only 不加载图片、字体和统计脚本")
+    config.addinivalue_line("markers", "uses_data(*keys): 模块导入时读取的test_data.json键，用于变更影响分析")
+    config.addinivalue_line(
+        "markers",
+        "data_source(spec, argname='record', ids=None, chunk_size=None): 从JSONL/CSV/Excel/JSON文件参数化测试"
+    )
+    
+    # 历史耗时: xdist worker使用主进程下发的数据，保证各worker排序一致
+    if hasattr(config, "workerinput"):
+        config._nikon_durations = config.workerinput.get("nikon_durations", {})
+        config._nikon_failures = {}
+    elif config.getoption("--order") == "duration":
+        store = HistoryStore(config.getoption("--history-db"))
+        config._nikon_durations = store.durations()
+        config._nikon_failures = store.recent_failures()
+    else:
+        config._nikon_durations = {}
+        config._nikon_failures = {}
+
+
+def pytest_sessionstart(session):
+    """各进程准备命令时间线，主进程打开结果事件流"""
+    global _result_sink, _trace_writer
+    config = session.config
+    trace = config.getoption("--command-trace")
+    if trace:
+        worker = config.workerinput["workerid"] if hasattr(config, "workerinput") else None
+        _trace_writer = command_profiler.TraceWriter(
+            command_profiler.trace_path(trace, worker), process_name=worker or "pytest"
+        )
+    
+    path = config.getoption("--results-stream")
+    if hasattr(config, "workerinput") or not path:
+        return
+    _result_sink = ResultSink(path)
+    _result_sink.session_start(config.invocation_params.args)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """向xdist worker下发历史耗时"""
+    node.workerinput["nikon_durations"] = node.config._nikon_durations
+
+
+def pytest_generate_tests(metafunc):
+    """按data_source标记参数化测试"""
+    try:
+        data_provider.parametrize(metafunc, metafunc.config.getoption("--data-limit"))
+    except (OSError, ValueError, KeyError) as e:
+        raise pytest.UsageError(f"{metafunc.definition.nodeid}: 无法读取data_source数据源: {e}")
 
 
+@pytest.hookimpl(tryfirst=True)
 def pytest_collection_modifyitems(config, items):
     """修改测试项收集"""
+    skip_crawl = pytest.mark.skip(reason="站点爬取需要 --crawl 选项")
     for item in items:
+        mark = item.get_closest_marker("profile")
+        if mark and (not mark.args or mark.args[0] not in page_profiles.PROFILES):
+            raise pytest.UsageError(
+                f"{item.nodeid}: profile标记需要指定 {', '.join(page_profiles.PROFILES)} 之一"
+            )
+        
         # 为所有测试添加UI标记
         if "test_" in item.name:
             item.add_marker(pytest.mark.ui)
+        
+        if "crawl" in item.keywords and not config.getoption("--crawl"):
+            item.add_marker(skip_crawl)
+        
+        # 按所需资源分组，共用同一份视口采集结果的测试放在同一个xdist分组
+        group = scheduler.classify(item)
+        item.add_marker(group)
+        xdist_group = scheduler.viewport_group(item) if group == "viewport" else None
+        if xdist_group:
+            item.add_marker(pytest.mark.xdist_group(xdist_group))
+    
+    # 隔离名单: 主流程不运行名单中的测试，--run-quarantined时只运行名单中的测试
+    run_quarantined = config.getoption("--run-quarantined")
+    if config.getoption("--quarantine") or run_quarantined:
+        quarantine = load_quarantine(config.getoption("--quarantine-file"))
+        selected, deselected = [], []
+        for item in items:
+            if (item.nodeid in quarantine) == run_quarantined:
+                selected.append(item)
+            else:
+                deselected.append(item)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+    
+    # 变更影响分析: 只保留受修改影响的测试
+    rev, url_patterns = config.getoption("--changed"), config.getoption("--changed-url")
+    if rev or url_patterns:
+        try:
+            root = impact_map.git_root()
+            changes = impact_map.changed_lines(rev, root) if rev else None
+            data_keys = impact_map.changed_data_keys(rev, root) if rev else set()
+        except RuntimeError as e:
+            raise pytest.UsageError(str(e))
+        reasons = impact_map.affected_tests(
+            items, impact_map.load_map(config.getoption("--impact-map")), root,
+            changes, data_keys, url_patterns
+        )
+        selected = [item for item in items if item.nodeid.split("@")[0] in reasons]
+        deselected = [item for item in items if item.nodeid.split("@")[0] not in reasons]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+        config._nikon_impact_reasons = reasons
+    
+    if config.getoption("--order") == "duration":
+        if hasattr(config, "workerinput"):
+            # 并行: 最长优先，均衡各worker负载
+            scheduler.order_longest_first(items, config._nikon_durations)
+        else:
+            # 串行: 快速失败
+            scheduler.order_fail_fast(items, config._nikon_durations, config._nikon_failures)
+
+
+def pytest_report_collectionfinish(config, items):
+    """显示变更影响分析选中的测试及原因"""
+    reasons = getattr(config, "_nikon_impact_reasons", None)
+    if reasons is None:
+        return None
+    lines = [f"变更影响分析: 选中 {len(items)} 个测试"]
+    for item in items[:20]:
+        lines.append(f"  {item.nodeid}: {reasons[item.nodeid.split('@')[0]]}")
+    if len(items) > 20:
+        lines.append(f"  ... 另有 {len(items) - 20} 个")
+    return lines
+
+
+def pytest_runtest_protocol(item, nextitem):
+    """启用 --flaky-reruns 时失败的测试立即重跑"""
+    reruns = item.config.getoption("--flaky-reruns")
+    if reruns <= 0:
+        return None
+    run_with_reruns(item, nextitem, reruns)
+    return True
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    """开始记录测试读取的test_data键"""
+    impact_map.begin()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """
+    记录测试是否失败，pooled_driver据此决定是否回收浏览器；
+    测试执行完后汇总它用到的依赖，随teardown报告发回主进程
+    """
+    outcome = yield
+    report = outcome.get_result()
+    if report.when == "setup":
+        item._nikon_failed = report.failed
+        client = item.funcargs.get("api_client")
+        item._nikon_api_mark = len(client.latencies) if client else 0
+    elif report.when == "call":
+        item._nikon_failed = item._nikon_failed or report.failed
+        urls = set()
+        driver = item.funcargs.get("pooled_driver")
+        if driver is not None:
+            # 浏览器崩溃时不记录URL，不能让钩子异常中断整个会话
+            urls.update(impact_map.safe_document_urls(driver))
+        client = item.funcargs.get("api_client")
+        if client is not None:
+            urls.update(record["url"] for record in client.latencies[item._nikon_api_mark:])
+        item._nikon_impact = impact_map.collect(item, impact_map.end(), urls)
+    elif report.when == "teardown" and getattr(item, "_nikon_impact", None):
+        # 报告的额外属性会随xdist序列化到主进程
+        report.nikon_impact = item._nikon_impact
+        item._nikon_impact = None
+
+
+def pytest_report_teststatus(report, config):
+    """重跑前的失败显示为R"""
+    if report.outcome == RERUN:
+        return RERUN, "R", ("RERUN", {"yellow": True})
+    return None
+
+
+def pytest_runtest_logreport(report):
+    """记录每个测试各阶段的耗时和结果"""
+    # --dist loadgroup 会在nodeid后追加 @分组名
+    nodeid = report.nodeid.split("@")[0]
+    if _result_sink is not None:
+        _result_sink.test_report(report)
+    if getattr(report, "nikon_impact", None):
+        _impact_records[nodeid] = report.nikon_impact
+    if report.when == "teardown":
+        properties = dict(report.user_properties)
+        if properties.get("memory"):
+            _memory_records[nodeid] = properties["memory"]
+        if properties.get("waits"):
+            _wait_records[nodeid] = properties["waits"]
+        if properties.get("commands"):
+            _command_records[nodeid] = properties["commands"]
+    result = _run_results.setdefault(nodeid, {"phases": {}, "attempts": 1})
+    if report.outcome == RERUN:
+        result["attempts"] += 1
+        return
+    result[report.when] = report.duration
+    result["phases"][report.when] = report.outcome
+    result["worker"] = getattr(report, "worker_id", "master")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """把本次运行的耗时写入历史数据库(只在主进程写入)"""
+    config = session.config
+    if _trace_writer is not None:
+        _trace_writer.write()
+    if _result_sink is not None:
+        _result_sink.session_finish(exitstatus)
+        _result_sink.close()
+    if hasattr(config, "workerinput") or not _run_results:
+        return
+    
+    if _impact_records:
+        impact_map.update_map(_impact_records, config.getoption("--impact-map"))
+    
+    results = {}
+    for nodeid, result in _run_results.items():
+        phases = result.pop("phases")
+        results[nodeid] = dict(result, outcome=outcome_of(phases, result["attempts"]))
+    HistoryStore(config.getoption("--history-db")).record_run(
+        _session_started_at, results, int(exitstatus)
+    )
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """显示耗时最多的WebDriver命令、等待耗时最多的定位器和内存增长最多的测试"""
+    if _command_records:
+        durations = {
+            nodeid: sum(result.get(when, 0) for when in ("setup", "call", "teardown"))
+            for nodeid, result in _run_results.items()
+        }
+        terminalreporter.write_sep("-", "耗时最多的WebDriver命令")
+        terminalreporter.write_line(command_profiler.format_report(_command_records, durations, top=10))
+    if _wait_records:
+        terminalreporter.write_sep("-", "等待耗时最多的定位器")
+        terminalreporter.write_line(wait_stats.format_report(_wait_records, top=10))
+    if _memory_records:
+        terminalreporter.write_sep("-", "浏览器内存增长最多的测试")
+        terminalreporter.write_line(memory_monitor.format_report(_memory_records, top=10))
 
 
 @pytest.fixture(scope="session")
-def test_config():
+def replica_server(request):
+    """本地镜像服务器fixture，每个进程在随机端口上启动一个"""
+    try:
+        server = ReplicaServer(request.config.getoption("--replica-dir")).start()
+    except FileNotFoundError as e:
+        pytest.exit(str(e), returncode=4)
+    
+    yield server
+    
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def test_config(request):
     """测试配置fixture"""
+    if request.config.getoption("--target") == "replica":
+        base_url = request.getfixturevalue("replica_server").url
+    else:
+        base_url = LIVE_BASE_URL
+    
     return {
-        "base_url": "https://my.nikon.com.cn",
+        "base_url": base_url,
         "timeout": 10,
         "implicit_wait": 5
     }
 
 
+@pytest.fixture(scope="session")
+def base_url(test_config):
+    """被测站点地址(线上站点或本地镜像)"""
+    return test_config["base_url"]
+
+
+@pytest.fixture(scope="session")
+def served_paths(request):
+    """测试目标为本地镜像时，判断镜像能否提供某个路径的函数；线上站点为None"""
+    if request.config.getoption("--target") == "replica":
+        return request.getfixturevalue("replica_server").serves
+    return None
+
+
 @pytest.fixture(scope="session")
 def test_data():
     """加载测试数据"""
     try:
         with open("test_data.json", "r", encoding="utf-8") as f:
-            return json.load(f)
+            data = json.load(f)
     except FileNotFoundError:
         # 返回默认测试数据
-        return {
+        data = {
             "test_users": [
                 {
                     "username": "test_user_1",
@@ -63,45 +572,173 @@ def test_data():
             "search_keywords": ["相机", "镜头"],
             "navigation_items": ["首页", "照片"]
         }
+    # 记录每个测试读取了哪些键，用于变更影响分析
+    return impact_map.TrackedData(data)
 
 
 @pytest.fixture(scope="session")
-def chrome_driver():
-    """Chrome WebDriver fixture"""
-    options = Options()
-    
-    # 设置Chrome选项
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36")
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option('useAutomationExtension', False)
-    
-    # 启用性能日志
-    options.add_experimental_option('perfLoggingPrefs', {
-        'enableNetwork': True,
-        'enablePage': False,
-        'enableTimeline': False
-    })
-    options.add_argument("--enable-logging")
-    options.add_argument("--log-level=0")
-    
-    # 自动下载ChromeDriver
-    service = Service(ChromeDriverManager().install())
-    
-    driver = webdriver.Chrome(service=service, options=options)
-    driver.implicitly_wait(5)
-    
-    # 执行脚本移除webdriver标识
-    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+def perf_budgets(request):
+    """页面性能预算fixture"""
+    budgets = load_budgets(request.config.getoption("--perf-budgets"))
+    runs = request.config.getoption("--perf-runs")
+    if runs:
+        budgets["runs"] = runs
+    return budgets
+
+
+@pytest.fixture(scope="session")
+def http_cache(request):
+    """HTTP录制/回放缓存fixture"""
+    return HttpCache(
+        request.config.getoption("--http-cache-dir"),
+        mode=request.config.getoption("--http-cache"),
+        refresh=request.config.getoption("--http-refresh")
+    )
+
+
+@pytest.fixture(scope="session")
+def visual_store(request):
+    """视觉回归基线fixture"""
+    return BaselineStore(
+        request.config.getoption("--baseline-dir"),
+        update=request.config.getoption("--update-baselines")
+    )
+
+
+@pytest.fixture
+def visual_check(request, visual_store, extras):
+    """
+    截图比较fixture，失败时把差异图缩略图附加到pytest-html报告，
+    同时记为测试属性，由结果事件流生成的报告嵌入
+    """
+    from pytest_html import extras as html_extras
+    
+    diffs = []
+    
+    def check(screenshot):
+        result = visual_store.compare(screenshot["name"], screenshot["path"], screenshot["masks"])
+        if result["status"] == "failed":
+            extras.append(html_extras.png(result["thumbnail"], f"{screenshot['name']} 差异"))
+            if not diffs:
+                request.node.user_properties.append((VISUAL_DIFFS, diffs))
+            diffs.append({
+                "name": screenshot["name"], "diff_path": result["diff_path"], "thumbnail": result["thumbnail"]
+            })
+        return result
+    
+    return check
+
+
+@pytest.fixture(scope="session")
+def locator_index(request):
+    """定位器索引fixture，会话结束时保存学到的定位策略"""
+    index = LocatorIndex(request.config.getoption("--locator-index"))
+    
+    yield index
+    
+    index.save()
+
+
+@pytest.fixture(scope="session")
+def driver_pool(request, http_cache):
+    """浏览器池fixture，每个进程只预热一次"""
+    # 每个进程只解析一次ChromeDriver，Chrome版本未变时直接命中本地缓存
+    create_chrome = chrome_factory(resolve_driver_path())
+    zero_implicit_wait = request.config.getoption("--zero-implicit-wait")
+    
+    def factory():
+        driver = create_chrome()
+        # 元素查找经过等待统计，--zero-implicit-wait 时改为显式超时
+        use_explicit_lookups(driver, zero_implicit_wait)
+        # 记录每条WebDriver命令的耗时
+        command_profiler.profile_commands(driver)
+        if http_cache.enabled:
+            # 浏览器流量通过CDP拦截接入录制/回放缓存
+            FetchInterceptor(driver, [http_cache]).start()
+        return driver
+    
+    pool = DriverPool(
+        factory,
+        size=request.config.getoption("--pool-size"),
+        max_uses=request.config.getoption("--driver-max-uses")
+    )
+    pool.warm_up()
+    
+    yield pool
+    
+    pool.close()
+
+
+@pytest.fixture
+def pooled_driver(request, driver_pool):
+    """从浏览器池借出的浏览器，测试结束后重置状态并归还"""
+    driver = driver_pool.acquire()
+    # 丢弃借出之前(类级fixture在池中并行采集等)记录的命令
+    command_profiler.take(driver)
+    started = time.perf_counter()
+    capabilities = driver.capabilities
+    request.node.user_properties.append(
+        ("browser", f"{capabilities.get('browserName')} {capabilities.get('browserVersion')}")
+    )
+    
+    # 按标记选择页面加载配置，归还浏览器时恢复为full
+    mark = request.node.get_closest_marker("profile")
+    if mark:
+        try:
+            page_profiles.apply(driver, mark.args[0])
+        except Exception:
+            driver_pool.release(driver, discard=True)
+            raise
+        request.node.user_properties.append(("page_profile", mark.args[0]))
+    
+    # 借出时浏览器处于空闲状态(about:blank)，作为这个测试的内存基线
+    monitor = not request.config.getoption("--no-memory-monitor")
+    before = memory_monitor.safe_sample(driver) if monitor else None
+    # 丢弃借出之前(其他测试的类级fixture等)留下的等待统计
+    wait_stats.take(driver)
     
     yield driver
     
-    driver.quit()
+    # 测试失败时浏览器状态不可信，直接回收，重跑时会拿到新的浏览器
+    discard = getattr(request.node, "_nikon_failed", False)
+    try:
+        waits = wait_stats.take(driver)
+        if waits:
+            request.node.user_properties.append(("waits", waits))
+        after = memory_monitor.safe_sample(driver) if before else None
+        if after:
+            record = memory_monitor.compare(before, after, driver.session_id)
+            # 内存超过上限的浏览器回收重建，避免worker被OOM杀掉
+            if memory_monitor.over_limit(after, request.config.getoption("--memory-limit-mb")):
+                record["recycled"] = True
+                discard = True
+            request.node.user_properties.append(("memory", record))
+    except Exception:
+        discard = True
+        raise
+    finally:
+        # 无论如何都归还浏览器，否则浏览器进程泄漏，池的计数也不会减少
+        driver_pool.release(driver, discard=discard)
+    
+    # 命令记录包括归还时重置浏览器的开销
+    calls = command_profiler.take(driver)
+    if calls:
+        request.node.user_properties.append(("commands", command_profiler.summarize(calls)))
+        if _trace_writer is not None:
+            _trace_writer.add_test(request.node.nodeid, driver, started, time.perf_counter(), calls)
+
+
+@pytest.fixture
+def chrome_driver(pooled_driver):
+    """Chrome WebDriver fixture"""
+    pooled_driver.implicitly_wait(5)
+    return pooled_driver
+
+
+@pytest.fixture
+def home_page(pooled_driver, base_url, locator_index):
+    """首页页面对象(未加载页面，需要时调用open())"""
+    return HomePage(pooled_driver, base_url, locator_index)
 
 
 @pytest.fixture(scope="function")
@@ -112,28 +749,14 @@ def browser(chrome_driver, test_config):
     return driver
 
 
-@pytest.fixture
-def api_client():
-    """API客户端fixture"""
-    import requests
-    
-    class APIClient:
-        def __init__(self, base_url):
-            self.base_url = base_url
-            self.session = requests.Session()
-            self.session.headers.update({
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-            })
-        
-        def get(self, endpoint, **kwargs):
-            url = f"{self.base_url}{endpoint}"
-            return self.session.get(url, **kwargs)
-        
-        def post(self, endpoint, **kwargs):
-            url = f"{self.base_url}{endpoint}"
-            return self.session.post(url, **kwargs)
+@pytest.fixture(scope="session")
+def api_client(base_url, http_cache):
+    """API客户端fixture，整个会话共用连接池"""
+    client = APIClient(base_url, http_cache)
+    
+    yield client
     
-    return APIClient("https://my.nikon.com.cn")
+    client.close()
 
 
 def pytest_html_report_title(report):
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+页面对象
+"""
+
+from pages.base import BasePage
+from pages.home import HomePage
+
+__all__ = ["BasePage", "HomePage"]
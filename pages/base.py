@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+页面对象基类
+
+元素的定位策略集中写在页面对象的 LOCATORS 中，查找经由定位器索引(utils.locator_index):
+先试上次命中的策略，查找期间不使用隐式等待。
+"""
+
+from utils.locator_index import LocatorIndex, page_build
+from utils.waits import wait_for_page_settled
+
+
+class BasePage:
+    """页面对象基类"""
+
+    # 页面名称，作为定位器索引的键
+    name = None
+    # 相对于站点根地址的路径
+    path = "/"
+    # {元素名称: [(By, 值)]}，按优先级排列
+    LOCATORS = {}
+    # find()默认的轮询时间(秒)，页面已加载完成，只需等待少量延迟渲染的元素
+    timeout = 2
+
+    def __init__(self, driver, base_url, index=None):
+        self.driver = driver
+        self.base_url = base_url.rstrip("/")
+        self.index = index if index is not None else LocatorIndex(path=None)
+        self._build = None
+
+    @property
+    def url(self):
+        return self.base_url + self.path
+
+    @property
+    def build(self):
+        """当前页面的前端版本，每次加载页面后重新计算"""
+        if self._build is None:
+            self._build = page_build(self.driver)
+        return self._build
+
+    def open(self):
+        """加载页面并等待稳定"""
+        self.driver.get(self.url)
+        self.loaded()
+        return self
+
+    def loaded(self):
+        """页面已由其他方式加载(例如测试的setup或点击跳转)"""
+        wait_for_page_settled(self.driver)
+        self._build = None
+        return self
+
+    def find(self, element, timeout=None, **params):
+        """查找元素，找不到时抛出NoSuchElementException"""
+        return self.index.find(
+            self.driver, self.name, self.build, element, self.LOCATORS[element],
+            timeout=self.timeout if timeout is None else timeout, params=params
+        )
+
+    def find_all(self, element, timeout=0, **params):
+        """查找全部匹配的元素，找不到时返回空列表"""
+        return self.index.find(
+            self.driver, self.name, self.build, element, self.LOCATORS[element],
+            timeout=timeout, multiple=True, params=params
+        )
+
+    def exists(self, element, timeout=0, **params):
+        return bool(self.find_all(element, timeout, **params))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+尼康网站首页
+"""
+
+from selenium.webdriver.common.by import By
+
+from pages.base import BasePage
+from utils.dom_snapshot import snapshot
+from utils.waits import wait_for_page_ready
+
+
+class HomePage(BasePage):
+    """首页"""
+
+    name = "home"
+    path = "/"
+
+    # 主要导航项目
+    NAV_ITEMS = ("首页", "照片", "学习讨论", "直营店画廊")
+
+    LOCATORS = {
+        "logo": [
+            (By.CSS_SELECTOR, "img[alt*='logo']"),
+            (By.CSS_SELECTOR, "img[src*='logo']"),
+            (By.CSS_SELECTOR, ".logo img"),
+            (By.CSS_SELECTOR, "header a[href='/'] img"),
+        ],
+        "navigation": [
+            (By.CSS_SELECTOR, "nav"),
+            (By.CSS_SELECTOR, ".nav"),
+            (By.CSS_SELECTOR, ".navigation"),
+            (By.CSS_SELECTOR, ".navbar"),
+        ],
+        "main_content": [
+            (By.CSS_SELECTOR, "main"),
+            (By.CSS_SELECTOR, ".main"),
+            (By.CSS_SELECTOR, "#main"),
+            (By.CSS_SELECTOR, ".content"),
+            (By.CSS_SELECTOR, ".container"),
+        ],
+        "nav_link": [
+            (By.LINK_TEXT, "{text}"),
+            (By.PARTIAL_LINK_TEXT, "{text}"),
+            (By.XPATH, "//a[contains(normalize-space(.), '{text}')]"),
+        ],
+    }
+
+    def click_logo(self):
+        """点击Logo，等待跳转后的页面加载完成"""
+        self.find("logo").click()
+        wait_for_page_ready(self.driver)
+        self._build = None
+
+    def click_nav(self, text):
+        """点击文字包含text的导航链接，等待跳转后的页面加载完成"""
+        self.find("nav_link", text=text).click()
+        wait_for_page_ready(self.driver)
+        self._build = None
+
+    def nav_links(self, items=NAV_ITEMS):
+        """
+        导航项目对应的链接
+
+        一次取回页面上所有链接再按文字匹配，代替逐项查找
+
+        Returns:
+            {导航项目: 第一个匹配链接的快照}，没有匹配的项目不在结果中
+        """
+        links = snapshot(self.driver, "a")
+        found = {}
+        for item in items:
+            matches = [link for link in links if item in link["text"]]
+            if matches:
+                found[item] = matches[0]
+        return found
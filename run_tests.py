@@ -11,16 +11,33 @@ import subprocess
 import argparse
 from datetime import datetime
 
+from utils.history_store import HistoryStore
+from utils.scheduler import plan_workers
 
-def run_tests(test_type="all", browser="chrome", parallel=False, report_type="html"):
+
+def run_tests(test_type="all", browser="chrome", parallel=False, report_type="stream",
+              driver_path=None, target="live", http_cache="off", http_refresh=(), workers=None,
+              order="default", reruns=None, quarantine=False, run_quarantined=False,
+              changed=None, changed_urls=()):
     """
     运行测试
     
     Args:
-        test_type: 测试类型 (all, smoke, regression, ui, api)
+        test_type: 测试类型 (all, smoke, regression, ui, api, crawl)
         browser: 浏览器类型 (chrome, firefox)
         parallel: 是否并行执行
-        report_type: 报告类型 (html, allure)
+        report_type: 报告类型 (stream: 运行结束后由结果事件流生成HTML, html: pytest-html, allure)
+        driver_path: ChromeDriver路径，指定后跳过驱动版本解析
+        target: 测试目标 (live: 线上站点, replica: 本地镜像)
+        http_cache: HTTP录制/回放模式 (off, record, replay)
+        http_refresh: 回放模式下需要重新录制的URL通配模式
+        workers: 并行worker数量，为None时根据CPU、内存和历史耗时估算
+        order: 测试顺序 (default, duration)，并行执行时总是按耗时均衡负载
+        reruns: 失败重跑次数，为None时使用conftest的默认值(不重跑)
+        quarantine: 跳过隔离名单中的不稳定测试
+        run_quarantined: 只运行隔离名单中的测试
+        changed: git版本，只运行受工作区相对于该版本的修改影响的测试
+        changed_urls: 只运行加载过匹配页面的测试
     """
     
     # 基础pytest命令
@@ -35,10 +52,41 @@ def run_tests(test_type="all", browser="chrome", parallel=False, report_type="ht
         cmd.extend(["-m", "ui"])
     elif test_type == "api":
         cmd.extend(["-m", "api"])
+    elif test_type == "crawl":
+        cmd.extend(["-m", "crawl", "--crawl"])
+    
+    # 失败重跑与不稳定测试隔离
+    if reruns is not None:
+        cmd.extend(["--flaky-reruns", str(reruns)])
+    if run_quarantined:
+        cmd.append("--run-quarantined")
+    elif quarantine:
+        cmd.append("--quarantine")
+    
+    # 变更影响分析
+    if changed:
+        cmd.extend(["--changed", changed])
+    for pattern in changed_urls:
+        cmd.extend(["--changed-url", pattern])
     
-    # 并行执行
+    # HTTP录制/回放
+    if http_cache != "off":
+        cmd.extend(["--http-cache", http_cache])
+        for pattern in http_refresh:
+            cmd.extend(["--http-refresh", pattern])
+    
+    # 并行执行: 按历史耗时最长优先分配，worker数量按CPU和每个浏览器的内存占用估算
     if parallel:
-        cmd.extend(["-n", "auto"])
+        if workers is None:
+            workers = plan_workers(
+                HistoryStore().durations(),
+                pool_size=int(os.environ.get("DRIVER_POOL_SIZE", 1))
+            )
+        cmd.extend(["-n", str(workers), "--dist", "loadgroup"])
+        order = "duration"
+    
+    if order == "duration":
+        cmd.extend(["--order", "duration"])
     
     # 报告设置
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -60,6 +108,12 @@ def run_tests(test_type="all", browser="chrome", parallel=False, report_type="ht
         "--strict-markers"
     ])
     
+    # 通过环境变量传递给所有xdist worker
+    env = os.environ.copy()
+    if driver_path:
+        env["CHROMEDRIVER_PATH"] = os.path.abspath(driver_path)
+    env["NIKON_TARGET"] = target
+    
     print(f"运行命令: {' '.join(cmd)}")
     
     # 创建报告目录
@@ -67,7 +121,19 @@ def run_tests(test_type="all", browser="chrome", parallel=False, report_type="ht
     
     # 执行测试
     try:
-        result = subprocess.run(cmd, check=False)
+        result = subprocess.run(cmd, check=False, env=env)
+        
+        if (changed or changed_urls) and result.returncode == 5:
+            # pytest没有选中任何测试
+            print("没有受修改影响的测试")
+            return 0
+        
+        if report_type == "stream":
+            # 事件流在运行中已逐条写入，这里只做离线渲染
+            subprocess.run([
+                sys.executable, "-m", "utils.result_sink", "html",
+                "-o", "reports/test_report_{}.html".format(timestamp)
+            ])
         
         if report_type == "allure" and result.returncode == 0:
             # 生成allure报告
@@ -88,15 +154,65 @@ def run_tests(test_type="all", browser="chrome", parallel=False, report_type="ht
         return 1
 
 
+def run_load(users=10, duration="1m", browsers=2, target="live", driver_path=None):
+    """
+    负载测试: HTTP虚拟用户和少量浏览器虚拟用户反复执行功能检查
+    
+    Args:
+        users: HTTP虚拟用户数
+        duration: 持续时间，如 30s、10m
+        browsers: 浏览器虚拟用户数
+        target: 测试目标 (live: 线上站点, replica: 本地镜像)
+        driver_path: ChromeDriver路径
+    """
+    cmd = [
+        sys.executable, "-m", "utils.load_runner",
+        "--users", str(users),
+        "--duration", str(duration),
+        "--browsers", str(browsers),
+        "--target", target
+    ]
+    if driver_path:
+        cmd.extend(["--driver-path", os.path.abspath(driver_path)])
+    
+    print(f"运行命令: {' '.join(cmd)}")
+    os.makedirs("reports", exist_ok=True)
+    try:
+        return subprocess.run(cmd, check=False).returncode
+    except KeyboardInterrupt:
+        print("\n负载测试被用户中断")
+        return 1
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description="尼康网站自动化测试运行器")
     
     parser.add_argument(
         "--type", "-t",
-        choices=["all", "smoke", "regression", "ui", "api"],
+        choices=["all", "smoke", "regression", "ui", "api", "crawl", "load"],
         default="all",
-        help="测试类型 (默认: all)"
+        help="测试类型，crawl为站点爬取回归，load为负载测试 (默认: all)"
+    )
+    
+    parser.add_argument(
+        "--users",
+        type=int,
+        default=10,
+        help="负载测试的HTTP虚拟用户数 (默认: 10)"
+    )
+    
+    parser.add_argument(
+        "--duration",
+        default="1m",
+        help="负载测试持续时间，如 30s、10m (默认: 1m)"
+    )
+    
+    parser.add_argument(
+        "--browsers",
+        type=int,
+        default=2,
+        help="负载测试的浏览器虚拟用户数，0为只发HTTP请求 (默认: 2)"
     )
     
     parser.add_argument(
@@ -112,11 +228,101 @@ def main():
         help="并行执行测试"
     )
     
+    parser.add_argument(
+        "--workers", "-w",
+        type=int,
+        default=None,
+        help="并行worker数量 (默认: 根据CPU、内存和历史耗时自动估算)"
+    )
+    
+    parser.add_argument(
+        "--order",
+        choices=["default", "duration"],
+        default="default",
+        help="测试顺序: duration按历史耗时排序，最近失败的测试优先 (默认: default)"
+    )
+    
+    parser.add_argument(
+        "--reruns",
+        type=int,
+        default=None,
+        help="失败的测试在新浏览器上重跑的次数 (默认: 0 不重跑)"
+    )
+    
+    parser.add_argument(
+        "--quarantine",
+        action="store_true",
+        help="跳过 quarantine.json 中的不稳定测试"
+    )
+    
+    parser.add_argument(
+        "--run-quarantined",
+        action="store_true",
+        help="只运行 quarantine.json 中的不稳定测试"
+    )
+    
+    parser.add_argument(
+        "--changed",
+        nargs="?",
+        const="HEAD",
+        default=None,
+        metavar="REV",
+        help="只运行受修改影响的测试，REV为比较的git版本 (默认: HEAD)"
+    )
+    
+    parser.add_argument(
+        "--changed-url",
+        action="append",
+        default=[],
+        metavar="URL_PATTERN",
+        help="只运行加载过匹配页面的测试，例如 '/gallery/*'，可重复指定"
+    )
+    
+    parser.add_argument(
+        "--trend",
+        action="store_true",
+        help="显示耗时增长最多的测试"
+    )
+    
     parser.add_argument(
         "--report", "-r",
-        choices=["html", "allure"],
-        default="html",
-        help="报告类型 (默认: html)"
+        choices=["stream", "html", "allure"],
+        default="stream",
+        help="报告类型: stream为由结果事件流生成HTML (默认: stream)"
+    )
+    
+    parser.add_argument(
+        "--driver-path",
+        default=os.environ.get("CHROMEDRIVER_PATH"),
+        help="ChromeDriver路径，离线环境下跳过版本解析 (也可设置环境变量 CHROMEDRIVER_PATH)"
+    )
+    
+    parser.add_argument(
+        "--target",
+        choices=["live", "replica"],
+        default="live",
+        help="测试目标: live为线上站点，replica为本地镜像 (默认: live)"
+    )
+    
+    parser.add_argument(
+        "--http-cache",
+        choices=["off", "record", "replay"],
+        default="off",
+        help="HTTP录制/回放: record录制响应，replay离线回放 (默认: off)"
+    )
+    
+    parser.add_argument(
+        "--http-refresh",
+        action="append",
+        default=[],
+        metavar="URL_PATTERN",
+        help="回放时重新录制匹配的URL，例如 'https://my.nikon.com.cn/api/*'，可重复指定"
+    )
+    
+    parser.add_argument(
+        "--record-replica",
+        action="store_true",
+        help="抓取线上站点快照到本地镜像目录"
     )
     
     parser.add_argument(
@@ -134,12 +340,42 @@ def main():
         print("依赖包安装完成")
         return 0
     
+    # 耗时趋势
+    if args.trend:
+        return subprocess.run([sys.executable, "-m", "utils.history_store", "trend"]).returncode
+    
+    # 录制本地镜像
+    if args.record_replica:
+        print("抓取站点快照...")
+        return subprocess.run([sys.executable, "-m", "utils.replica_server", "record"]).returncode
+    
+    # 负载测试
+    if args.type == "load":
+        return run_load(
+            users=args.users,
+            duration=args.duration,
+            browsers=args.browsers,
+            target=args.target,
+            driver_path=args.driver_path
+        )
+    
     # 运行测试
     return run_tests(
         test_type=args.type,
         browser=args.browser,
         parallel=args.parallel,
-        report_type=args.report
+        report_type=args.report,
+        driver_path=args.driver_path,
+        target=args.target,
+        http_cache=args.http_cache,
+        http_refresh=args.http_refresh,
+        workers=args.workers,
+        order=args.order,
+        reruns=args.reruns,
+        quarantine=args.quarantine,
+        run_quarantined=args.run_quarantined,
+        changed=args.changed,
+        changed_urls=args.changed_url
     )
 
 
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+页面资源检查单元测试
+用模拟的浏览器返回页面上的元素，检查URL收集以及针对本地镜像的过滤，不需要访问站点。
+"""
+
+from utils.asset_checker import collect_asset_urls, served_only
+from utils.replica_server import ReplicaServer
+
+
+PAGE_URL = "http://127.0.0.1:8000/"
+
+# 本地镜像首页上的元素 {选择器: [属性]}
+ELEMENTS = {
+    "img[src]": [{"src": "/files/logo.png"}, {"src": "data:image/png;base64,AAAA"}],
+    "script[src]": [{"src": "/__external__/cdn.example.org/app.js"}],
+    "link[href]": [{"href": "/style.css?v=2"}],
+    "a[href]": [
+        {"href": "/"}, {"href": "/products/"}, {"href": "/#top"},
+        {"href": "https://other.example.org/"}, {"href": "mailto:info@example.com"},
+    ],
+}
+
+
+class FakeDriver:
+    current_url = PAGE_URL
+
+    def execute_script(self, script, selectors, attributes, max_text):
+        return {
+            selector: [{"attributes": {name: e.get(name) for name in attributes}} for e in ELEMENTS[selector]]
+            for selector in selectors
+        }
+
+
+def test_collect_asset_urls():
+    urls = dict(collect_asset_urls(FakeDriver()))
+    assert urls == {
+        PAGE_URL + "files/logo.png": "img",
+        PAGE_URL + "__external__/cdn.example.org/app.js": "script",
+        PAGE_URL + "style.css?v=2": "link",
+        PAGE_URL: "a",
+        PAGE_URL + "products/": "a",
+        "https://other.example.org/": "a",
+    }
+
+
+def test_collect_asset_urls_served_by_replica(tmp_path):
+    """本地镜像只保存了首页及其资源，其他页面链接和跨域链接都不检查"""
+    (tmp_path / "manifest.json").write_text(
+        '{"entries": {"/": {"file": "files/home"}, "/files/logo.png": {"file": "files/logo"}, '
+        '"/__external__/cdn.example.org/app.js": {"file": "files/app"}, "/style.css": {"file": "files/css"}}}',
+        encoding="utf-8"
+    )
+    server = ReplicaServer(str(tmp_path))
+    try:
+        urls = dict(collect_asset_urls(FakeDriver(), served=server.serves))
+    finally:
+        server.httpd.server_close()
+
+    assert urls == {
+        PAGE_URL + "files/logo.png": "img",
+        PAGE_URL + "__external__/cdn.example.org/app.js": "script",
+        PAGE_URL + "style.css?v=2": "link",
+        PAGE_URL: "a",
+    }
+
+
+def test_served_only_same_origin():
+    urls = [("http://127.0.0.1:8000/a?x=1", "a"), ("http://127.0.0.1:9000/a", "a"), ("http://127.0.0.1:8000/b", "img")]
+    served = {"/a?x=1", "/b"}.__contains__
+    assert served_only(urls, PAGE_URL, served) == [urls[0], urls[2]]
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+WebDriver命令耗时分析单元测试
+用模拟的命令执行器检查命令记录、按命令汇总、报告和trace导出，不需要浏览器。
+"""
+
+import json
+
+import pytest
+
+from utils import command_profiler
+from utils.command_profiler import HISTOGRAM_BOUNDS_MS, TraceWriter, format_report, summarize
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.commands = []
+
+    def execute(self, command, params=None):
+        self.commands.append(command)
+        if command == "quit":
+            raise ConnectionError("browser gone")
+        return {"value": "x" * 10 if command == "getTitle" else None}
+
+
+class FakeDriver:
+    def __init__(self):
+        self.command_executor = FakeExecutor()
+
+
+def call(name, ms, request_bytes=0, response_bytes=0, error=None, start=0.0):
+    return (name, start, ms / 1000, request_bytes, response_bytes, error)
+
+
+def test_profile_commands_records_each_command():
+    driver = FakeDriver()
+    recorder = command_profiler.profile_commands(driver)
+    # 同一个浏览器只包装一次
+    assert command_profiler.profile_commands(driver) is recorder
+
+    driver.command_executor.execute("getTitle", {"sessionId": "abc"})
+    driver.command_executor.execute("executeCdpCommand", {"cmd": "Network.enable", "params": {}})
+    with pytest.raises(ConnectionError):
+        driver.command_executor.execute("quit", {})
+
+    calls = command_profiler.take(driver)
+    assert [(c[0], c[3], c[4], c[5]) for c in calls] == [
+        ("getTitle", 3, 10, None),
+        ("cdp:Network.enable", 14, 0, None),
+        ("quit", 0, 0, "ConnectionError"),
+    ]
+    assert driver.command_executor.commands == ["getTitle", "executeCdpCommand", "quit"]
+    assert command_profiler.take(driver) == []
+
+
+def test_take_without_profiling():
+    assert command_profiler.take(FakeDriver()) == []
+
+
+def test_size_counts_strings_only():
+    assert command_profiler._size(None) == 0
+    assert command_profiler._size("abcd") == 4
+    assert command_profiler._size({"script": "return 1", "args": [1, 2]}) == 8
+    assert command_profiler._size(["a", "bc", {"nested": "ignored"}]) == 3
+    assert command_profiler._size(42) == 0
+
+
+def test_summarize_groups_by_command():
+    calls = [call("get", ms) for ms in (100, 200, 300, 400)] + [
+        call("findElement", 3, 50, 80),
+        call("findElement", 7, 50, 80, error="NoSuchElementException"),
+    ]
+
+    summary = summarize(calls)
+    assert summary["count"] == 6
+    assert summary["total_ms"] == 1010
+
+    get = summary["commands"]["get"]
+    assert (get["count"], get["total_ms"], get["p50_ms"], get["p95_ms"], get["max_ms"]) == (4, 1000, 300, 400, 400)
+
+    find = summary["commands"]["findElement"]
+    assert (find["request_bytes"], find["response_bytes"], find["errors"]) == (100, 160, 1)
+    assert len(find["histogram"]) == len(HISTOGRAM_BOUNDS_MS) + 1
+    # 3ms落在≤5ms桶，7ms落在≤10ms桶
+    assert find["histogram"][HISTOGRAM_BOUNDS_MS.index(5)] == 1
+    assert find["histogram"][HISTOGRAM_BOUNDS_MS.index(10)] == 1
+
+
+def test_histogram_overflow_bucket():
+    histogram = summarize([call("get", 20000)])["commands"]["get"]["histogram"]
+    assert histogram[-1] == 1
+    assert command_profiler.format_histogram(histogram) == ">10000ms:1"
+
+
+def test_summarize_empty():
+    assert summarize([]) == {"count": 0, "total_ms": 0, "commands": {}}
+
+
+def test_format_report_ranks_commands_and_tests():
+    records = {
+        "test_a": summarize([call("get", 2000), call("findElement", 10)]),
+        "test_b": summarize([call("findElement", 30), call("findElement", 20, error="Timeout")]),
+    }
+
+    report = format_report(records, {"test_a": 4.0}, top=5)
+    lines = report.splitlines()
+    assert lines[1].endswith("get")
+    assert "findElement  [1次失败]" in report
+    assert "2.01s /    4.00s ( 50%)  " in report
+    assert report.index("test_a") < report.index("test_b")
+
+
+def test_trace_path_per_worker():
+    assert command_profiler.trace_path("reports/trace.json") == "reports/trace.json"
+    assert command_profiler.trace_path("reports/trace.json", "gw1") == "reports/trace-gw1.json"
+
+
+def test_trace_writer(tmp_path):
+    path = tmp_path / "trace.json"
+    writer = TraceWriter(str(path), "gw0")
+    driver_a, driver_b = object(), object()
+    writer.add_test("test_a", driver_a, 1.0, 2.0, [call("get", 500, start=1.1)])
+    writer.add_test("test_b", driver_b, 1.5, 1.8, [call("quit", 1, error="ConnectionError", start=1.6)])
+    writer.add_test("test_c", driver_a, 2.0, 2.5, [])
+    writer.write()
+
+    events = json.loads(path.read_text(encoding="utf-8"))["traceEvents"]
+    threads = [e for e in events if e["name"] == "thread_name"]
+    assert [e["args"]["name"] for e in threads] == ["浏览器 1", "浏览器 2"]
+
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    assert spans["test_c"]["tid"] == spans["test_a"]["tid"] == 1
+    assert spans["get"]["dur"] == pytest.approx(500000)
+    assert spans["quit"]["args"]["error"] == "ConnectionError"
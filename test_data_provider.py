@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+流式测试数据单元测试
+用临时的JSONL、CSV和Excel文件检查分段、按段读取、记录数上限和参数化。
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from openpyxl import Workbook
+
+from utils import data_provider
+from utils.data_provider import DataSource, collect_failures
+
+
+@pytest.fixture
+def jsonl_file(tmp_path):
+    path = tmp_path / "users.jsonl"
+    lines = [json.dumps({"id": i, "name": f"用户{i}"}, ensure_ascii=False) for i in range(10)]
+    # 空行不算记录
+    lines.insert(4, "")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "keywords.csv"
+    path.write_text(
+        'id,keyword\n1,相机\n2,"镜头\n广角"\n\n3,"Z ""系列"""\n4,尼克尔\n5,望远镜\n',
+        encoding="utf-8-sig"
+    )
+    return path
+
+
+@pytest.fixture
+def excel_file(tmp_path):
+    path = tmp_path / "urls.xlsx"
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "pages"
+    sheet.append(["path", "status"])
+    for i in range(8):
+        sheet.append([None, None] if i == 3 else [f"/page/{i}", 200])
+    workbook.save(path)
+    return path
+
+
+def chunk_records(source, chunk_size, limit=None):
+    return [list(chunk) for chunk in source.chunks(chunk_size, limit)]
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        DataSource(str(tmp_path / "data.txt"))
+
+
+def test_jsonl_chunks(jsonl_file):
+    source = DataSource(str(jsonl_file))
+    assert len(list(source)) == 10
+
+    chunks = source.chunks(4)
+    assert [(chunk.start, chunk.stop) for chunk in chunks] == [(0, 4), (4, 8), (8, 10)]
+    assert [chunk.id for chunk in chunks] == ["users[0:4]", "users[4:8]", "users[8:10]"]
+    # 每段从扫描得到的字节位置开始读取，空行跳过
+    assert [[r["id"] for r in chunk] for chunk in chunks] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+def test_jsonl_limit(jsonl_file):
+    source = DataSource(str(jsonl_file))
+    assert [[r["id"] for r in records] for records in chunk_records(source, 3, limit=5)] == [[0, 1, 2], [3, 4]]
+
+
+def test_csv_chunks_keep_quoted_newlines(csv_file):
+    source = DataSource(str(csv_file))
+    chunks = chunk_records(source, 2)
+    assert [[r["id"] for r in records] for records in chunks] == [["1", "2"], ["3", "4"], ["5"]]
+    assert chunks[0][1]["keyword"] == "镜头\n广角"
+    assert chunks[1][0]["keyword"] == 'Z "系列"'
+
+
+def test_excel_chunks_follow_sheet_rows(excel_file):
+    """Excel按工作表行分段，空行占用序号但不产生记录"""
+    source = DataSource(f"{excel_file}#pages")
+    assert source.scan(3) == [(0, 3, None), (3, 6, None), (6, 8, None)]
+    assert [[r["path"] for r in records] for records in chunk_records(source, 3)] == [
+        ["/page/0", "/page/1", "/page/2"],
+        ["/page/4", "/page/5"],
+        ["/page/6", "/page/7"],
+    ]
+    assert source.scan(3, limit=4) == [(0, 3, None), (3, 4, None)]
+
+
+def test_excel_default_sheet(excel_file):
+    assert len(list(DataSource(str(excel_file)))) == 7
+
+
+def test_json_part(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps({"sizes": [{"name": "a"}, {"name": "b"}, {"name": "c"}]}), encoding="utf-8")
+    source = DataSource(f"{path}#sizes")
+    assert source.name == "data-sizes"
+    assert [[r["name"] for r in records] for records in chunk_records(source, 2)] == [["a", "b"], ["c"]]
+
+
+def test_collect_failures_continues_after_failure(jsonl_file):
+    def check(record):
+        assert record["id"] % 3, "是3的倍数"
+
+    chunk = DataSource(str(jsonl_file)).chunks(5)[1]
+    failures = collect_failures(chunk, check)
+    # 序号从分段的起始位置开始
+    assert [failure.split(" ")[0] for failure in failures] == ["第6条", "第9条"]
+
+
+def test_collect_failures_stops_at_limit(jsonl_file):
+    def check(record):
+        assert False
+
+    failures = collect_failures(DataSource(str(jsonl_file)), check, max_failures=3)
+    assert len(failures) == 4
+    assert failures[-1] == "失败过多，后续记录未检查"
+
+
+class FakeMetafunc:
+    """parametrize用到的metafunc属性"""
+
+    def __init__(self, *marks, fixturenames=("record",)):
+        self.definition = SimpleNamespace(
+            iter_markers=lambda name: [mark.mark for mark in marks if mark.name == name]
+        )
+        self.fixturenames = list(fixturenames)
+        self.calls = []
+
+    def parametrize(self, argname, values, ids=None):
+        self.calls.append((argname, list(values), ids))
+
+
+def test_parametrize_records_with_ids(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps({"sizes": [{"name": "Desktop"}, {"width": 375}]}), encoding="utf-8")
+    metafunc = FakeMetafunc(pytest.mark.data_source(f"{path}#sizes", argname="size", ids="name"),
+                            fixturenames=("size",))
+
+    data_provider.parametrize(metafunc)
+    argname, values, ids = metafunc.calls[0]
+    assert argname == "size"
+    assert values == [{"name": "Desktop"}, {"width": 375}]
+    assert ids == ["Desktop", "data-sizes-1"]
+
+
+def test_parametrize_chunks(jsonl_file):
+    metafunc = FakeMetafunc(pytest.mark.data_source(str(jsonl_file), argname="record", chunk_size=6))
+
+    data_provider.parametrize(metafunc, limit=8)
+    argname, values, ids = metafunc.calls[0]
+    assert ids == ["users[0:6]", "users[6:8]"]
+    assert [len(chunk) for chunk in values] == [6, 2]
+
+
+def test_parametrize_skips_unused_argname(jsonl_file):
+    metafunc = FakeMetafunc(pytest.mark.data_source(str(jsonl_file), argname="other"))
+    data_provider.parametrize(metafunc)
+    assert metafunc.calls == []
+
+
+def test_large_source_requires_chunk_size(jsonl_file, monkeypatch):
+    monkeypatch.setattr(data_provider, "MAX_UNCHUNKED_BYTES", 100)
+    metafunc = FakeMetafunc(pytest.mark.data_source(str(jsonl_file)))
+
+    with pytest.raises(ValueError, match="chunk_size"):
+        data_provider.parametrize(metafunc)
+
+    metafunc = FakeMetafunc(pytest.mark.data_source(str(jsonl_file), chunk_size=5))
+    data_provider.parametrize(metafunc)
+    assert len(metafunc.calls[0][1]) == 2
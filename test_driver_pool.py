@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+浏览器池单元测试
+用模拟的浏览器检查借出、归还时的重置和回收，以及借出超时，不需要启动Chrome。
+"""
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from utils.driver_pool import DEFAULT_IMPLICIT_WAIT, DriverPool, reset_driver
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current = handle
+
+
+class FakeDriver:
+    """reset_driver()用到的WebDriver方法"""
+
+    def __init__(self, handles=("main",)):
+        self.window_handles = list(handles)
+        self.switch_to = FakeSwitchTo(self)
+        self.implicit_wait = 10
+        self.quit_called = False
+
+    def close(self):
+        self.window_handles.remove(self.current)
+
+    def execute_script(self, script):
+        pass
+
+    def execute_cdp_cmd(self, cmd, params):
+        return {}
+
+    def delete_all_cookies(self):
+        pass
+
+    def get(self, url):
+        self.url = url
+
+    def set_window_size(self, width, height):
+        self.window_size = (width, height)
+
+    def implicitly_wait(self, seconds):
+        self.implicit_wait = seconds
+
+    def get_log(self, log_type):
+        return []
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_reset_driver_restores_state():
+    driver = FakeDriver(["main", "popup", "other"])
+    reset_driver(driver, window_size=(800, 600))
+
+    assert driver.window_handles == ["main"] and driver.current == "main"
+    assert driver.url == "about:blank"
+    assert driver.window_size == (800, 600)
+    # 测试中设置的隐式等待不带到之后的测试
+    assert driver.implicit_wait == DEFAULT_IMPLICIT_WAIT
+
+
+def test_reset_driver_without_windows():
+    with pytest.raises(WebDriverException):
+        reset_driver(FakeDriver([]))
+
+
+def test_release_reuses_reset_driver():
+    pool = DriverPool(FakeDriver, size=1)
+    driver = pool.acquire()
+    pool.release(driver)
+    assert pool.acquire() is driver
+    assert not driver.quit_called
+
+
+def test_release_discards_driver_without_windows():
+    """测试关闭了全部窗口时回收浏览器，而不是在归还时抛出异常"""
+    pool = DriverPool(FakeDriver, size=1)
+    driver = pool.acquire()
+    driver.window_handles.clear()
+    pool.release(driver)
+
+    assert driver.quit_called
+    replacement = pool.acquire(timeout=5)
+    assert replacement is not driver
+
+
+def test_acquire_timeout():
+    pool = DriverPool(FakeDriver, size=1)
+    pool.acquire()
+    with pytest.raises(TimeoutError, match="DRIVER_POOL_SIZE"):
+        pool.acquire(timeout=0.1)
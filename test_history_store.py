@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试历史数据库单元测试
+在临时SQLite数据库中写入几次运行，检查耗时、失败次数、不稳定率和耗时趋势的统计。
+"""
+
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from utils.history_store import HistoryStore, outcome_of
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path / "history.db"))
+
+
+def result(call, outcome="passed", attempts=1, setup=0.0, teardown=0.0):
+    return {"worker": "gw0", "setup": setup, "call": call, "teardown": teardown,
+            "outcome": outcome, "attempts": attempts}
+
+
+def record_runs(store, *runs):
+    for results in runs:
+        store.record_run(datetime.now(), results, exitstatus=0)
+
+
+@pytest.mark.parametrize("phases, attempts, expected", [
+    ({"setup": "passed", "call": "passed", "teardown": "passed"}, 1, "passed"),
+    ({"setup": "passed", "call": "passed"}, 2, "flaky"),
+    ({"setup": "passed", "call": "failed"}, 2, "failed"),
+    ({"setup": "skipped"}, 1, "skipped"),
+    ({"setup": "passed", "call": "skipped", "teardown": "failed"}, 1, "failed"),
+])
+def test_outcome_of(phases, attempts, expected):
+    assert outcome_of(phases, attempts) == expected
+
+
+def test_durations_average_recent_runs(store):
+    record_runs(
+        store,
+        {"test_a": result(100.0)},
+        {"test_a": result(1.0, setup=0.5, teardown=0.5), "test_b": result(3.0)},
+        {"test_a": result(3.0, setup=0.5, teardown=0.5)},
+    )
+    # 只统计最近两次运行，总耗时包括setup和teardown
+    assert store.durations(last_runs=2) == {"test_a": 3.0, "test_b": 3.0}
+
+
+def test_recent_failures(store):
+    record_runs(
+        store,
+        {"test_a": result(1.0, "failed")},
+        {"test_a": result(1.0, "failed"), "test_b": result(1.0, "failed")},
+        {"test_a": result(1.0), "test_b": result(1.0, "failed")},
+    )
+    assert store.recent_failures(last_runs=2) == {"test_a": 1, "test_b": 2}
+
+
+def test_flake_rates(store):
+    record_runs(
+        store,
+        {"test_a": result(1.0, "flaky", 2), "test_b": result(1.0, "flaky", 2), "test_c": result(1.0, "failed")},
+        {"test_a": result(1.0, "flaky", 2), "test_b": result(1.0), "test_c": result(1.0, "skipped")},
+        {"test_a": result(1.0, "failed", 2), "test_b": result(1.0, "skipped")},
+    )
+    rates = store.flake_rates()
+    # 跳过的运行不计入，没有flaky记录的测试不列出，按不稳定率从高到低排序
+    assert list(rates) == ["test_a", "test_b"]
+    assert rates["test_a"] == {"runs": 3, "flaky": 2, "failed": 1, "rate": 2 / 3}
+    assert rates["test_b"] == {"runs": 2, "flaky": 1, "failed": 0, "rate": 0.5}
+
+
+def test_trend(store):
+    record_runs(
+        store,
+        {"test_slower": result(1.0), "test_faster": result(4.0), "test_new": result(1.0)},
+        {"test_slower": result(1.0), "test_faster": result(4.0)},
+        {"test_slower": result(3.0), "test_faster": result(2.0)},
+        {"test_slower": result(5.0), "test_faster": result(2.0)},
+    )
+    trends = store.trend(last_runs=4)
+    assert [t[0] for t in trends] == ["test_slower", "test_faster"]
+    assert trends[0][1:] == (1.0, 4.0, 3.0)
+    assert store.trend(last_runs=4, limit=1) == trends[:1]
+
+
+def test_migrates_database_without_attempts(tmp_path):
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as conn:
+        conn.executescript(
+            "CREATE TABLE runs (id INTEGER PRIMARY KEY AUTOINCREMENT, started_at TEXT NOT NULL, "
+            "finished_at TEXT, exitstatus INTEGER);"
+            "CREATE TABLE results (run_id INTEGER NOT NULL, nodeid TEXT NOT NULL, worker TEXT, "
+            "setup REAL DEFAULT 0, call REAL DEFAULT 0, teardown REAL DEFAULT 0, outcome TEXT);"
+        )
+    conn.close()
+
+    store = HistoryStore(path)
+    record_runs(store, {"test_a": result(1.0, "flaky", 2)})
+    assert store.flake_rates()["test_a"]["flaky"] == 1
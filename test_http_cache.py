@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+HTTP录制/回放缓存单元测试
+对本地临时HTTP服务录制后回放(回放时服务不应再收到请求)；浏览器拦截的处理器方法用构造的请求信息检查。
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils.cdp_fetch import Fail, Fulfill
+from utils.http_cache import HttpCache
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.hits += 1
+        if self.path.startswith("/old"):
+            # /old/... 永久重定向到 /new/...
+            self.send_response(301)
+            self.send_header("Location", "/new" + self.path[len("/old"):])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = f"<html>{self.path}</html>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """本地HTTP服务，hits为收到的请求数"""
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.hits = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url_of(server, path):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}{path}"
+
+
+def session_for(cache):
+    session = requests.Session()
+    session.mount("http://", cache.adapter())
+    return session
+
+
+def test_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        HttpCache(str(tmp_path), mode="playback")
+
+
+def test_key_depends_on_method_url_and_body(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    url = "https://www.example.com/api"
+    assert cache.key("get", url) == cache.key("GET", url) == cache.key("GET", url, b"")
+    assert cache.key("GET", url) != cache.key("POST", url)
+    assert cache.key("POST", url, "a=1") == cache.key("POST", url, b"a=1")
+    assert cache.key("POST", url, "a=1") != cache.key("POST", url, "a=2")
+    assert cache.key("GET", url) != cache.key("GET", url + "?page=2")
+
+
+def test_store_deduplicates_bodies(tmp_path):
+    cache = HttpCache(str(tmp_path), mode="record")
+    headers = {"Content-Type": "text/css", "Content-Encoding": "gzip", "Content-Length": "4"}
+    cache.store("GET", "https://www.example.com/a.css", 200, headers, b"body")
+    cache.store("GET", "https://www.example.com/b.css", 200, headers, "body")
+
+    assert len(list((tmp_path / "objects").rglob("*"))) == 2  # 一个子目录和一个对象
+    entry = cache.lookup("GET", "https://www.example.com/b.css")
+    assert entry["body"] == b"body"
+    # 响应体按解码后的内容保存，压缩和长度头部不再适用
+    assert entry["headers"] == {"Content-Type": "text/css"}
+    assert cache.lookup("GET", "https://www.example.com/missing.css") is None
+
+
+def test_record_then_replay(tmp_path, server):
+    url = url_of(server, "/products/")
+    recorded = session_for(HttpCache(str(tmp_path), mode="record")).get(url)
+    assert recorded.status_code == 200
+    assert server.hits == 1
+
+    replayed = session_for(HttpCache(str(tmp_path), mode="replay")).get(url)
+    assert server.hits == 1
+    assert replayed.status_code == 200
+    assert replayed.text == recorded.text == "<html>/products/</html>"
+    assert replayed.headers["content-type"] == "text/html; charset=utf-8"
+
+
+def test_replay_redirect(tmp_path, server):
+    """重定向链上的每一跳都录制，回放时从原始URL出发同样能跟随到最终页面"""
+    url = url_of(server, "/old/products/")
+    recorded = session_for(HttpCache(str(tmp_path), mode="record")).get(url)
+    assert [r.status_code for r in recorded.history] == [301]
+    assert server.hits == 2
+
+    replayed = session_for(HttpCache(str(tmp_path), mode="replay")).get(url)
+    assert server.hits == 2
+    assert [r.status_code for r in replayed.history] == [301]
+    assert replayed.url == url_of(server, "/new/products/")
+    assert replayed.text == recorded.text == "<html>/new/products/</html>"
+
+
+def test_replay_miss_raises(tmp_path, server):
+    with pytest.raises(requests.ConnectionError, match="缓存未命中"):
+        session_for(HttpCache(str(tmp_path), mode="replay")).get(url_of(server, "/never-recorded"))
+    assert server.hits == 0
+
+
+def test_refresh_pattern_rerecords(tmp_path, server):
+    url = url_of(server, "/news/")
+    session_for(HttpCache(str(tmp_path), mode="record")).get(url)
+
+    cache = HttpCache(str(tmp_path), mode="replay", refresh=["*/news/*"])
+    assert cache.intercepts_responses
+    session_for(cache).get(url)
+    assert server.hits == 2
+
+
+def test_off_mode_does_not_intercept(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    assert not cache.enabled
+    assert cache.uses_network("https://www.example.com/")
+    assert cache.on_request({"url": "https://www.example.com/", "method": "GET", "post_data": None}) is None
+
+
+def test_browser_handler_replay(tmp_path):
+    cache = HttpCache(str(tmp_path), mode="record")
+    info = {"url": "https://www.example.com/logo.png", "method": "GET", "post_data": None,
+            "status": 200, "headers": {"content-type": "image/png"}}
+    # 录制模式下请求放行，响应阶段保存
+    assert cache.on_request(info) is None
+    cache.on_response(info, b"\x89PNG")
+
+    cache = HttpCache(str(tmp_path), mode="replay")
+    assert not cache.intercepts_responses
+    assert cache.on_request(info) == Fulfill(200, {"content-type": "image/png"}, b"\x89PNG")
+    assert cache.on_request(dict(info, url="https://www.example.com/new.png")) == Fail("InternetDisconnected")
+
+
+def test_browser_handler_replay_redirect(tmp_path):
+    """浏览器拦截的重定向响应没有响应体，同样录制，回放时返回重定向由浏览器跟随"""
+    cache = HttpCache(str(tmp_path), mode="record")
+    redirect = {"url": "https://www.example.com/old", "method": "GET", "post_data": None,
+                "status": 302, "headers": {"location": "https://www.example.com/new"}}
+    final = {"url": "https://www.example.com/new", "method": "GET", "post_data": None,
+             "status": 200, "headers": {"content-type": "text/html"}}
+    cache.on_response(redirect, None)
+    cache.on_response(final, b"<html></html>")
+    # 获取响应体失败的非重定向响应不录制
+    cache.on_response(dict(final, url="https://www.example.com/error"), None)
+
+    cache = HttpCache(str(tmp_path), mode="replay")
+    assert cache.on_request(redirect) == Fulfill(302, {"location": "https://www.example.com/new"}, b"")
+    assert cache.on_request(final) == Fulfill(200, {"content-type": "text/html"}, b"<html></html>")
+    assert cache.on_request(dict(final, url="https://www.example.com/error")) == Fail("InternetDisconnected")
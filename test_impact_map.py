@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+变更影响分析单元测试
+在临时git仓库上检查 changed_lines，用模拟的测试项检查 affected_tests 的选择和原因，不需要浏览器。
+"""
+
+import importlib.util
+import inspect
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+from utils import impact_map
+
+
+TEST_MODULE = '''\
+import pytest
+
+
+@pytest.fixture
+def site():
+    return "site"
+
+
+def test_home(site):
+    assert site
+
+
+def test_other():
+    assert True
+'''
+
+
+def git(root, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=root, check=True, capture_output=True
+    )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """只有一次提交的临时仓库"""
+    git(tmp_path, "init", "-q")
+    (tmp_path / "a.py").write_text("".join(f"line{i}\n" for i in range(1, 11)), encoding="utf-8")
+    (tmp_path / "b.py").write_text("print('b')\n", encoding="utf-8")
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG\x00\x01")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "init")
+    return tmp_path
+
+
+class FakeItem:
+    """affected_tests用到的测试项属性"""
+
+    def __init__(self, module, name, fixtures=(), marks=()):
+        self.nodeid = f"test_mod.py::{name}"
+        self.function = getattr(module, name)
+        self.fixturenames = list(fixtures)
+        self._marks = [mark.mark for mark in marks]
+        fixture_funcs = {n: getattr(module, n).__wrapped__ for n in fixtures if hasattr(module, n)}
+        self.session = SimpleNamespace(_fixturemanager=SimpleNamespace(
+            getfixturedefs=lambda n, nodeid: [SimpleNamespace(func=fixture_funcs[n])] if n in fixture_funcs else None
+        ))
+
+    def iter_markers(self, name):
+        return [mark for mark in self._marks if mark.name == name]
+
+
+@pytest.fixture
+def test_module(tmp_path):
+    path = tmp_path / "test_mod.py"
+    path.write_text(TEST_MODULE, encoding="utf-8")
+    spec = importlib.util.spec_from_file_location("impact_test_mod", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def lines_of(func):
+    """函数在文件中的 (起始行, 结束行)"""
+    lines, start = inspect.getsourcelines(func)
+    return start, start + len(lines) - 1
+
+
+def record(fixtures=(), data=(), urls=()):
+    return {"fixtures": list(fixtures), "data": list(data), "urls": list(urls)}
+
+
+def test_changed_lines_modified_and_deleted(repo):
+    """修改的行按工作区行号记录，纯删除记为删除位置前后两行"""
+    lines = [f"line{i}\n" for i in range(1, 11)]
+    lines[1] = "changed\n"
+    del lines[6]
+    (repo / "a.py").write_text("".join(lines), encoding="utf-8")
+
+    assert impact_map.changed_lines("HEAD", str(repo)) == {"a.py": [(2, 2), (6, 7)]}
+
+
+def test_changed_lines_removed_and_binary_files(repo):
+    """删除的文件和二进制文件覆盖全部行"""
+    (repo / "b.py").unlink()
+    (repo / "logo.png").write_bytes(b"\x89PNG\x00\x02")
+
+    changes = impact_map.changed_lines("HEAD", str(repo))
+    assert set(changes) == {"b.py", "logo.png"}
+    assert (1, float("inf")) in changes["b.py"]
+    assert changes["logo.png"] == [(1, float("inf"))]
+
+
+def test_changed_lines_bad_revision(repo):
+    with pytest.raises(RuntimeError):
+        impact_map.changed_lines("no-such-rev", str(repo))
+
+
+def test_affected_by_test_function_change(test_module, tmp_path):
+    items = [FakeItem(test_module, "test_home", ["site"]), FakeItem(test_module, "test_other")]
+    impact = {item.nodeid: record(item.fixturenames) for item in items}
+    start, _ = lines_of(test_module.test_other)
+
+    reasons = impact_map.affected_tests(items, impact, str(tmp_path), {"test_mod.py": [(start + 1, start + 1)]})
+    assert reasons == {"test_mod.py::test_other": "测试函数已修改"}
+
+
+def test_affected_by_fixture_change(test_module, tmp_path):
+    items = [FakeItem(test_module, "test_home", ["site"]), FakeItem(test_module, "test_other")]
+    impact = {item.nodeid: record(item.fixturenames) for item in items}
+    _, end = lines_of(test_module.site.__wrapped__)
+
+    reasons = impact_map.affected_tests(items, impact, str(tmp_path), {"test_mod.py": [(end, end)]})
+    assert reasons == {"test_mod.py::test_home": "fixture site 已修改"}
+
+
+def test_module_level_change_selects_whole_file(test_module, tmp_path):
+    items = [FakeItem(test_module, "test_home", ["site"]), FakeItem(test_module, "test_other")]
+    impact = {item.nodeid: record(item.fixturenames) for item in items}
+
+    reasons = impact_map.affected_tests(items, impact, str(tmp_path), {"test_mod.py": [(1, 1)]})
+    assert set(reasons) == {"test_mod.py::test_home", "test_mod.py::test_other"}
+    assert all("模块级代码" in reason for reason in reasons.values())
+
+
+def test_other_source_change_selects_everything(test_module, tmp_path):
+    items = [FakeItem(test_module, "test_home", ["site"]), FakeItem(test_module, "test_other")]
+    impact = {item.nodeid: record(item.fixturenames) for item in items}
+
+    reasons = impact_map.affected_tests(items, impact, str(tmp_path), {"utils/waits.py": [(10, 12)]})
+    assert len(reasons) == 2
+    assert all(reason.startswith("修改了测试以外的文件") for reason in reasons.values())
+
+
+def test_ignored_files_select_nothing(test_module, tmp_path):
+    items = [FakeItem(test_module, "test_home", ["site"])]
+    impact = {items[0].nodeid: record(["site"])}
+
+    changes = {"README.md": [(1, 3)], "quarantine.json": [(2, 2)]}
+    assert impact_map.affected_tests(items, impact, str(tmp_path), changes) == {}
+
+
+def test_unrecorded_tests_always_run(test_module, tmp_path):
+    items = [FakeItem(test_module, "test_home", ["site"]), FakeItem(test_module, "test_other")]
+    impact = {"test_mod.py::test_home": record(["site"])}
+
+    reasons = impact_map.affected_tests(items, impact, str(tmp_path), {})
+    assert reasons == {"test_mod.py::test_other": "影响图中没有记录"}
+
+
+def test_affected_by_data_keys_and_urls(test_module, tmp_path):
+    items = [FakeItem(test_module, "test_home", ["site"]), FakeItem(test_module, "test_other")]
+    impact = {
+        "test_mod.py::test_home": record(["site"], data=["browser_sizes"]),
+        "test_mod.py::test_other": record(urls=["/ja_CN/products/"]),
+    }
+
+    reasons = impact_map.affected_tests(
+        items, impact, str(tmp_path), {"test_data.json": [(3, 3)]}, {"browser_sizes"}, ["/ja_CN/products/*"]
+    )
+    assert reasons == {
+        "test_mod.py::test_home": "test_data.json 的 browser_sizes 已修改",
+        "test_mod.py::test_other": "页面已修改: /ja_CN/products/",
+    }
+
+
+def test_affected_by_data_source_file(test_module, tmp_path):
+    """data_source数据文件的修改只选出从该文件参数化的测试"""
+    items = [
+        FakeItem(test_module, "test_home", ["site"], [pytest.mark.data_source("data/users.jsonl", argname="site")]),
+        FakeItem(test_module, "test_other"),
+    ]
+    impact = {item.nodeid: record(item.fixturenames) for item in items}
+
+    reasons = impact_map.affected_tests(items, impact, str(tmp_path), {"data/users.jsonl": [(1, 100)]})
+    assert reasons == {"test_mod.py::test_home": "数据源 data/users.jsonl 已修改"}
+
+
+def test_nodeid_group_suffix_is_ignored(test_module, tmp_path):
+    """--dist loadgroup 在nodeid后追加的 @分组名 不影响匹配"""
+    item = FakeItem(test_module, "test_other")
+    item.nodeid += "@viewport"
+    start, _ = lines_of(test_module.test_other)
+
+    reasons = impact_map.affected_tests([item], {"test_mod.py::test_other": record()}, str(tmp_path),
+                                        {"test_mod.py": [(start, start)]})
+    assert reasons == {"test_mod.py::test_other": "测试函数已修改"}
+
+
+def test_safe_document_urls_on_crashed_browser():
+    """浏览器崩溃时返回空集合而不是抛出异常"""
+    from selenium.common.exceptions import WebDriverException
+
+    class CrashedDriver:
+        def get_log(self, log_type):
+            raise WebDriverException("chrome not reachable")
+
+    assert impact_map.safe_document_urls(CrashedDriver()) == set()
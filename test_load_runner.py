@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+负载测试工具单元测试
+检查延迟直方图的分位数精度、统计汇总、负载预算和站内链接发现(包括本地镜像能提供的页面)，不需要访问站点。
+"""
+
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from utils.load_runner import (
+    CheckFailed, LatencyHistogram, LoadStats, check_load_budgets, discover_links, parse_duration
+)
+from utils.replica_server import ReplicaServer
+
+
+def exact_percentile(samples_ms, p):
+    ordered = sorted(samples_ms)
+    return ordered[max(0, int(len(ordered) * p / 100 + 0.999999) - 1)]
+
+
+def test_histogram_empty():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None
+    assert histogram.count == 0
+
+
+@pytest.mark.parametrize("p", [50, 90, 95, 99])
+def test_histogram_relative_error(p):
+    """对数分桶的分位数与精确值的相对误差在1%左右"""
+    rng = random.Random(p)
+    samples = [rng.lognormvariate(4, 1) for _ in range(20000)]
+    histogram = LatencyHistogram()
+    for ms in samples:
+        histogram.add(ms / 1000)
+
+    assert histogram.count == len(samples)
+    assert histogram.percentile(p) == pytest.approx(exact_percentile(samples, p), rel=0.011)
+
+
+def test_histogram_never_exceeds_max():
+    histogram = LatencyHistogram()
+    for seconds in (0.1, 0.1, 0.25):
+        histogram.add(seconds)
+    assert histogram.max == 250
+    assert histogram.percentile(100) <= 250
+    assert histogram.percentile(50) == pytest.approx(100, rel=0.01)
+
+
+def test_histogram_memory_independent_of_count():
+    histogram = LatencyHistogram()
+    for _ in range(10000):
+        histogram.add(0.05)
+    assert len(histogram.buckets) == 1
+
+
+def test_load_stats_totals_and_window():
+    stats = LoadStats()
+    for _ in range(9):
+        stats.record("page", 0.1)
+    stats.record("page", 0.1, error="HTTP 503")
+
+    window = stats.window()
+    assert window["page"]["requests"] == 10
+    assert window["page"]["error_rate"] == 0.1
+    assert window["page"]["top_errors"] == [("HTTP 503", 1)]
+    assert stats.window() == {}
+
+    stats.record("browser_load", 2.0)
+    totals = stats.totals()
+    assert totals["page"]["requests"] == 10
+    assert totals["browser_load"]["p50"] == pytest.approx(2000, rel=0.01)
+
+
+def test_check_load_budgets():
+    totals = {
+        "page": {"p95": 900.0, "p99": 1500.0, "error_rate": 0.02},
+        "browser_load": {"p95": 5000.0, "p99": None, "error_rate": 0.0},
+    }
+    budgets = {"p95_ms": 1000, "p99_ms": 1200, "error_rate": 0.01, "browser_load": {"p95_ms": 8000}}
+
+    assert check_load_budgets(totals, budgets) == [
+        "page p99 = 1500ms，超出预算 1200ms",
+        "page 错误率 2.00%，超出预算 1.00%",
+    ]
+
+
+@pytest.mark.parametrize("text, seconds", [("90", 90), ("30s", 30), ("10m", 600), ("1.5h", 5400)])
+def test_parse_duration(text, seconds):
+    assert parse_duration(text) == seconds
+
+
+def test_parse_duration_invalid():
+    with pytest.raises(ValueError):
+        parse_duration("10 minutes")
+
+
+class FakeClient:
+    def __init__(self, html, status=200, content_type="text/html; charset=utf-8"):
+        self.response = SimpleNamespace(status_code=status, headers={"content-type": content_type}, text=html)
+
+    def get(self, endpoint):
+        return self.response
+
+
+HOMEPAGE = """
+<a href="/products/">产品</a>
+<a class="nav" href="https://www.example.com/support/?lang=zh">支持</a>
+<a href="/">首页</a>
+<a href="https://other.example.org/">外部</a>
+<a href="#top">顶部</a>
+<a href="/products/">重复</a>
+"""
+
+
+def test_discover_links_same_site_only():
+    links = discover_links(FakeClient(HOMEPAGE), "https://www.example.com")
+    assert links == ["https://www.example.com/products/", "https://www.example.com/support/?lang=zh"]
+
+
+def test_discover_links_filtered_by_replica():
+    """本地镜像只提供其中保存了的页面"""
+    served = {"/support/?lang=zh"}
+    links = discover_links(FakeClient(HOMEPAGE), "https://www.example.com", served=served.__contains__)
+    assert links == ["https://www.example.com/support/?lang=zh"]
+
+
+def test_discover_links_limit():
+    html = "".join(f'<a href="/page/{i}">{i}</a>' for i in range(10))
+    assert len(discover_links(FakeClient(html), "https://www.example.com", limit=3)) == 3
+
+
+def test_discover_links_requires_html_homepage():
+    with pytest.raises(CheckFailed):
+        discover_links(FakeClient("{}", content_type="application/json"), "https://www.example.com")
+
+
+def test_replica_serves_manifest_entries(tmp_path):
+    (tmp_path / "manifest.json").write_text(
+        '{"entries": {"/": {"file": "files/home"}, "/about/": {"file": "files/about"}, "/pending": null}}',
+        encoding="utf-8"
+    )
+    server = ReplicaServer(str(tmp_path))
+    try:
+        assert server.serves("/about/")
+        # 与请求处理相同，找不到时忽略查询参数
+        assert server.serves("/about/?from=nav")
+        assert not server.serves("/products/")
+        assert not server.serves("/pending")
+    finally:
+        server.httpd.server_close()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+网络瀑布图解析单元测试
+用构造的性能日志检查请求记录、重定向、缓存、失败请求和关键路径，不需要浏览器。
+"""
+
+import json
+
+from utils.network_log import NetworkLogParser, build_waterfall, check_page_weight, parse_network_log
+
+
+def entry(method, **params):
+    """一条 driver.get_log('performance') 格式的日志"""
+    return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+
+def will_be_sent(request_id, url, timestamp, type="Document", initiator=None, **extra):
+    return entry("Network.requestWillBeSent", requestId=request_id, timestamp=timestamp, type=type,
+                 request={"url": url, "method": "GET"}, initiator=initiator or {"type": "other"}, **extra)
+
+
+def response(request_id, status=200, mime_type="text/html", **extra):
+    return entry("Network.responseReceived", requestId=request_id,
+                 response=dict({"status": status, "mimeType": mime_type}, **extra))
+
+
+def finished(request_id, timestamp, size):
+    return entry("Network.loadingFinished", requestId=request_id, timestamp=timestamp, encodedDataLength=size)
+
+
+def test_single_request():
+    records = parse_network_log([
+        will_be_sent("1", "https://example.com/", 100.0),
+        response("1", timing={"receiveHeadersEnd": 42.5}),
+        entry("Network.dataReceived", requestId="1", encodedDataLength=100),
+        finished("1", 100.25, 2048),
+    ])
+
+    assert len(records) == 1
+    record = records[0]
+    assert record["url"] == "https://example.com/"
+    assert record["status"] == 200
+    assert record["mime_type"] == "text/html"
+    # loadingFinished的encodedDataLength优先于dataReceived的累计值
+    assert record["size"] == 2048
+    assert record["start"] == 0
+    assert record["end"] == record["duration"] == 250
+    assert record["ttfb"] == 42.5
+    assert not record["cache_hit"] and not record["failed"]
+
+
+def test_redirect_produces_one_record_per_hop():
+    records = parse_network_log([
+        will_be_sent("1", "http://example.com/", 1.0),
+        will_be_sent("1", "https://example.com/", 1.1, redirectResponse={"status": 301, "mimeType": ""}),
+        response("1"),
+        finished("1", 1.3, 500),
+    ])
+
+    assert [(r["url"], r["status"]) for r in records] == [
+        ("http://example.com/", 301),
+        ("https://example.com/", 200),
+    ]
+    assert round(records[0]["duration"]) == 100
+
+
+def test_cache_hits_and_failures():
+    records = parse_network_log([
+        will_be_sent("1", "https://example.com/app.js", 1.0, type="Script"),
+        entry("Network.requestServedFromCache", requestId="1"),
+        response("1", mime_type="application/javascript"),
+        finished("1", 1.01, 0),
+        will_be_sent("2", "https://example.com/logo.png", 1.0, type="Image"),
+        response("2", mime_type="image/png", fromDiskCache=True),
+        finished("2", 1.02, 0),
+        will_be_sent("3", "https://ads.example.net/pixel", 1.0, type="Image"),
+        entry("Network.loadingFailed", requestId="3", timestamp=1.05, errorText="net::ERR_BLOCKED_BY_CLIENT"),
+    ])
+
+    by_url = {r["url"]: r for r in records}
+    assert by_url["https://example.com/app.js"]["cache_hit"]
+    assert by_url["https://example.com/logo.png"]["cache_hit"]
+    assert by_url["https://ads.example.net/pixel"]["failed"]
+    assert by_url["https://ads.example.net/pixel"]["error"] == "net::ERR_BLOCKED_BY_CLIENT"
+
+
+def test_unfinished_requests_stay_pending():
+    parser = NetworkLogParser()
+    assert parser.feed(will_be_sent("1", "https://example.com/slow", 1.0)) == []
+    # 其他域的事件和未知请求的事件被忽略
+    assert parser.feed(entry("Page.loadEventFired", timestamp=1.5)) == []
+    assert parser.feed(finished("unknown", 1.5, 10)) == []
+    assert [r["url"] for r in parser.pending()] == ["https://example.com/slow"]
+
+
+def test_waterfall_and_critical_path():
+    records = parse_network_log([
+        will_be_sent("1", "https://example.com/", 10.0),
+        response("1"),
+        finished("1", 10.2, 10000),
+        will_be_sent("2", "https://example.com/app.js", 10.2, type="Script",
+                     initiator={"type": "parser", "url": "https://example.com/"}),
+        response("2", mime_type="application/javascript"),
+        finished("2", 10.5, 50000),
+        will_be_sent("3", "https://example.com/data.json", 10.5, type="XHR",
+                     initiator={"type": "script", "stack": {"callFrames": [{"url": "https://example.com/app.js"}]}}),
+        response("3", status=404, mime_type="application/json"),
+        finished("3", 10.9, 300),
+        will_be_sent("4", "https://example.com/logo.png", 10.2, type="Image",
+                     initiator={"type": "parser", "url": "https://example.com/"}),
+        response("4", mime_type="image/png"),
+        finished("4", 10.3, 20000),
+    ])
+
+    waterfall = build_waterfall(records, top=2)
+    assert waterfall["request_count"] == 4
+    assert waterfall["total_bytes"] == 80300
+    assert waterfall["by_type"]["Script"] == {"count": 1, "bytes": 50000}
+    assert waterfall["failed"] == ["https://example.com/data.json"]
+    assert waterfall["critical_path"] == [
+        "https://example.com/", "https://example.com/app.js", "https://example.com/data.json"
+    ]
+    assert waterfall["critical_path_depth"] == 3
+    assert round(waterfall["critical_path_ms"]) == 900
+    assert waterfall["largest"] == [("https://example.com/app.js", 50000), ("https://example.com/logo.png", 20000)]
+
+    violations = check_page_weight(waterfall, {"total_bytes": 100000, "request_count": 3})
+    assert violations == ["request_count = 4，超出预算 3"]
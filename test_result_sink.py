@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+流式测试结果单元测试
+用模拟的测试报告写入临时事件流，检查轮转、按运行读取、阶段合并(包括重跑)和离线渲染。
+"""
+
+import base64
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from utils.result_sink import (
+    VISUAL_DIFFS, ResultSink, iter_tests, last_run, read_events, render_allure, render_html, stream_files
+)
+
+
+def report(nodeid, when, outcome="passed", duration=0.1, properties=(), longrepr=None, worker="gw0"):
+    """pytest TestReport用到的属性"""
+    return SimpleNamespace(
+        nodeid=nodeid, when=when, outcome=outcome, duration=duration, start=100.0, stop=100.0 + duration,
+        worker_id=worker, user_properties=list(properties), longrepr=longrepr, failed=outcome == "failed",
+    )
+
+
+def write_test(sink, nodeid, call="passed", properties=(), longrepr=None):
+    sink.test_report(report(nodeid, "setup"))
+    sink.test_report(report(nodeid, "call", call, 1.0, properties, longrepr))
+    sink.test_report(report(nodeid, "teardown"))
+
+
+@pytest.fixture
+def stream(tmp_path):
+    return str(tmp_path / "results.jsonl")
+
+
+def test_events_by_run(stream):
+    first = ResultSink(stream)
+    first.session_start(["-n", "2"])
+    write_test(first, "test_a.py::test_one")
+    first.session_finish(0)
+    first.close()
+
+    second = ResultSink(stream)
+    second.session_start([])
+    write_test(second, "test_a.py::test_two@viewport")
+    second.close()
+
+    assert first.run != second.run
+    assert last_run(stream) == second.run
+    events = list(read_events(stream, first.run))
+    assert [e["event"] for e in events] == ["session_start"] + ["test"] * 3 + ["session_finish"]
+    assert events[0]["argv"] == ["-n", "2"]
+    # loadgroup追加的 @分组名 不写入事件流
+    assert [t["nodeid"] for t in iter_tests(stream, second.run)] == ["test_a.py::test_two"]
+
+
+def test_truncated_last_line_ignored(stream):
+    sink = ResultSink(stream)
+    sink.session_start([])
+    sink.close()
+    with open(stream, "a", encoding="utf-8") as f:
+        f.write('{"event": "test", "run": ')
+
+    assert [e["event"] for e in read_events(stream)] == ["session_start"]
+
+
+def test_rotation_keeps_all_events(stream):
+    sink = ResultSink(stream, max_bytes=2000, backup_count=20)
+    sink.session_start([])
+    for i in range(10):
+        write_test(sink, f"test_a.py::test_{i}")
+    sink.close()
+
+    files = stream_files(stream)
+    assert len(files) > 2
+    assert files[-1] == stream and files[0].endswith(f".{len(files) - 1}")
+    # 轮转后仍按写入顺序读出全部测试
+    assert [t["nodeid"] for t in iter_tests(stream)] == [f"test_a.py::test_{i}" for i in range(10)]
+
+
+def test_iter_tests_merges_phases(stream):
+    sink = ResultSink(stream)
+    write_test(sink, "test_a.py::test_pass", properties=[("waits", {"nav": 1})])
+    write_test(sink, "test_a.py::test_fail", call="failed", longrepr="AssertionError: boom")
+    sink.test_report(report("test_a.py::test_skip", "setup", "skipped"))
+    sink.test_report(report("test_a.py::test_skip", "teardown"))
+    sink.close()
+
+    tests = {t["nodeid"]: t for t in iter_tests(stream)}
+    passed = tests["test_a.py::test_pass"]
+    assert (passed["outcome"], passed["attempts"], passed["worker"]) == ("passed", 1, "gw0")
+    assert (passed["setup"], passed["call"], passed["teardown"]) == (0.1, 1.0, 0.1)
+    assert passed["properties"] == {"waits": {"nav": 1}}
+    assert tests["test_a.py::test_fail"]["outcome"] == "failed"
+    assert tests["test_a.py::test_fail"]["longrepr"] == "AssertionError: boom"
+    assert tests["test_a.py::test_skip"]["outcome"] == "skipped"
+
+
+def test_iter_tests_reruns(stream):
+    """重跑前的失败以rerun上报，重跑通过记为flaky，全部失败记为failed"""
+    sink = ResultSink(stream)
+    nodeid = "test_a.py::test_flaky"
+    sink.test_report(report(nodeid, "setup"))
+    sink.test_report(report(nodeid, "call", "rerun"))
+    sink.test_report(report(nodeid, "teardown"))
+    write_test(sink, nodeid)
+
+    nodeid = "test_a.py::test_broken"
+    sink.test_report(report(nodeid, "setup"))
+    sink.test_report(report(nodeid, "call", "rerun"))
+    sink.test_report(report(nodeid, "teardown"))
+    write_test(sink, nodeid, call="failed", longrepr="AssertionError")
+    sink.close()
+
+    tests = list(iter_tests(stream))
+    assert [(t["nodeid"], t["outcome"], t["attempts"]) for t in tests] == [
+        ("test_a.py::test_flaky", "flaky", 2),
+        ("test_a.py::test_broken", "failed", 2),
+    ]
+
+
+def test_render_html(stream, tmp_path):
+    sink = ResultSink(stream)
+    sink.session_start([])
+    write_test(sink, "test_a.py::test_one")
+    write_test(sink, "test_a.py::test_<two>", call="failed", longrepr="assert <b>")
+    sink.close()
+
+    output = render_html(str(tmp_path / "out" / "report.html"), stream)
+    with open(output, encoding="utf-8") as f:
+        content = f.read()
+    assert f"运行 {sink.run}: failed 1，passed 1" in content
+    assert "test_a.py::test_&lt;two&gt;" in content
+    assert "assert &lt;b&gt;" in content
+    assert content.count("<tr class=") == 2
+
+
+def test_render_allure(stream, tmp_path):
+    sink = ResultSink(stream)
+    sink.session_start([])
+    nodeid = "test_a.py::TestX::test_one"
+    sink.test_report(report(nodeid, "setup"))
+    sink.test_report(report(nodeid, "call", "rerun"))
+    sink.test_report(report(nodeid, "teardown"))
+    write_test(sink, nodeid, properties=[("size", "Desktop")])
+    sink.close()
+
+    output_dir = render_allure(str(tmp_path / "allure"), stream)
+    [name] = os.listdir(output_dir)
+    with open(os.path.join(output_dir, name), encoding="utf-8") as f:
+        result = json.load(f)
+    assert (result["name"], result["fullName"], result["status"]) == ("test_one", nodeid, "passed")
+    assert result["statusDetails"]["flaky"] is True
+    assert {"name": "suite", "value": "test_a.py::TestX"} in result["labels"]
+    assert result["parameters"] == [{"name": "size", "value": "Desktop"}]
+
+
+THUMBNAIL = base64.b64encode(b"\x89PNG thumbnail").decode("ascii")
+DIFFS = [{"name": "home-desktop", "diff_path": "reports/visual/home-desktop-diff.png", "thumbnail": THUMBNAIL}]
+
+
+def test_render_html_visual_diffs(stream, tmp_path):
+    """视觉回归差异图嵌入缩略图并链接到差异图，不作为文本属性输出"""
+    sink = ResultSink(stream)
+    sink.session_start([])
+    write_test(sink, "test_a.py::test_visual", call="failed", properties=[(VISUAL_DIFFS, DIFFS)])
+    sink.close()
+
+    with open(render_html(str(tmp_path / "report.html"), stream), encoding="utf-8") as f:
+        content = f.read()
+    assert f'<img src="data:image/png;base64,{THUMBNAIL}">' in content
+    assert "home-desktop-diff.png\">" in content
+    assert "home-desktop 差异" in content
+    assert f"{VISUAL_DIFFS}:" not in content
+
+
+def test_render_allure_visual_diffs(stream, tmp_path):
+    sink = ResultSink(stream)
+    sink.session_start([])
+    write_test(sink, "test_a.py::test_visual", call="failed", properties=[(VISUAL_DIFFS, DIFFS)])
+    sink.close()
+
+    output_dir = render_allure(str(tmp_path / "allure"), stream)
+    [name] = [n for n in os.listdir(output_dir) if n.endswith("-result.json")]
+    with open(os.path.join(output_dir, name), encoding="utf-8") as f:
+        result = json.load(f)
+    assert result["parameters"] == []
+    [attachment] = result["attachments"]
+    assert (attachment["name"], attachment["type"]) == ("home-desktop 差异", "image/png")
+    with open(os.path.join(output_dir, attachment["source"]), "rb") as f:
+        assert f.read() == b"\x89PNG thumbnail"
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+并行调度单元测试
+用模拟的测试项检查资源分组、视口测试的xdist分组和最长优先排序。
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from utils.scheduler import VIEWPORT_GROUP, classify, order_longest_first, viewport_group
+
+
+class ResponsiveSuite:
+    pass
+
+
+class VisualSuite:
+    pass
+
+
+def fake_item(nodeid, fixtures=(), scope="class", cls=None, group=None):
+    """pytest测试项用到的属性，fixtures中的视口fixture使用scope缓存范围"""
+    marks = {"xdist_group": SimpleNamespace(args=(group,))} if group else {}
+    return SimpleNamespace(
+        nodeid=nodeid,
+        fixturenames=list(fixtures),
+        _fixtureinfo=SimpleNamespace(name2fixturedefs={name: [SimpleNamespace(scope=scope)] for name in fixtures}),
+        cls=cls,
+        module=SimpleNamespace(__name__="test_site"),
+        get_closest_marker=marks.get,
+    )
+
+
+@pytest.mark.parametrize("fixtures, expected", [
+    (("api_client",), "http"),
+    (("pooled_driver",), "browser"),
+    (("driver_pool", "responsive_results"), "viewport"),
+])
+def test_classify(fixtures, expected):
+    assert classify(fake_item("t", fixtures)) == expected
+
+
+def test_viewport_group_per_class():
+    """不共享结果的测试类分到不同的分组，可以在不同的worker上并行"""
+    responsive = fake_item("t1", ("driver_pool", "responsive_results"), cls=ResponsiveSuite)
+    responsive_other = fake_item("t2", ("driver_pool", "responsive_results"), cls=ResponsiveSuite)
+    visual = fake_item("t3", ("driver_pool", "screenshots"), cls=VisualSuite)
+
+    assert viewport_group(responsive) == viewport_group(responsive_other) == "viewport-test_site.ResponsiveSuite"
+    assert viewport_group(visual) == "viewport-test_site.VisualSuite"
+
+
+@pytest.mark.parametrize("scope, expected", [
+    ("session", VIEWPORT_GROUP),
+    ("module", "viewport-test_site"),
+    ("function", None),
+])
+def test_viewport_group_by_scope(scope, expected):
+    item = fake_item("t", ("driver_pool", "screenshots"), scope=scope, cls=VisualSuite)
+    assert viewport_group(item) == expected
+
+
+def test_order_longest_first_keeps_groups_together():
+    items = [
+        fake_item("a", group="g1"), fake_item("b"), fake_item("c", group="g2"),
+        fake_item("d", group="g1"), fake_item("e", group="g2"),
+    ]
+    durations = {"a": 1.0, "b": 2.5, "c": 2.0, "d": 1.0, "e": 2.0}
+    order_longest_first(items, durations)
+    assert [item.nodeid for item in items] == ["c", "e", "b", "a", "d"]
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+站点爬取单元测试
+用模拟的浏览器池和页面替换真实的页面访问，检查URL规范化、深度和页面数限制以及检查点恢复。
+"""
+
+import json
+from contextlib import contextmanager
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from utils import site_crawler
+from utils.site_crawler import SiteCrawler, is_crawlable, normalize_url
+
+
+ORIGIN = "https://www.example.com"
+
+# 站点结构 {路径: 页面上的链接}
+SITE = {
+    "/": ["/a", "/b", "/c", "https://other.example.org/x", "/logo.png"],
+    "/a": ["/a1", "/a2", "/#top"],
+    "/b": ["/b1", "/?x=1&a=2"],
+    "/c": [],
+    "/a1": ["/deep"],
+    "/a2": [],
+    "/b1": [],
+    "/?a=2&x=1": [],
+    "/deep": [],
+}
+
+
+class FakePool:
+    size = 2
+
+    @contextmanager
+    def lease(self):
+        yield object()
+
+
+@pytest.fixture
+def visited(monkeypatch):
+    """替换页面访问，返回访问过的URL列表"""
+    urls = []
+
+    def fake_visit(driver, url, depth, checks):
+        urls.append(url)
+        path = url[len(ORIGIN):]
+        if path == "/broken":
+            raise WebDriverException("net::ERR_CONNECTION_RESET")
+        result = {"url": url, "depth": depth, "status": 200, "title": path, "final_url": url,
+                  "problems": [], "elapsed": 0.01}
+        return result, [ORIGIN + link if link.startswith("/") else link for link in SITE.get(path, [])]
+
+    monkeypatch.setattr(site_crawler, "visit", fake_visit)
+    return urls
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://WWW.Example.com:443/a?b=2&a=1#frag") == "https://www.example.com/a?a=1&b=2"
+    assert normalize_url("http://example.com") == "http://example.com/"
+    assert normalize_url("http://example.com:8080/x") == "http://example.com:8080/x"
+
+
+def test_is_crawlable():
+    assert is_crawlable(ORIGIN + "/products/", ORIGIN)
+    assert not is_crawlable(ORIGIN + "/catalog.PDF", ORIGIN)
+    assert not is_crawlable("https://other.example.org/", ORIGIN)
+    assert not is_crawlable("mailto:info@example.com", ORIGIN)
+
+
+def test_crawl_deduplicates_and_respects_depth(visited):
+    results = SiteCrawler(FakePool(), max_depth=2).crawl([ORIGIN])
+
+    paths = {url[len(ORIGIN):] for url in results}
+    assert paths == {"/", "/a", "/b", "/c", "/a1", "/a2", "/b1", "/?a=2&x=1"}
+    # 锚点和查询参数顺序不同的链接视为同一页面，每个页面只访问一次
+    assert len(visited) == len(set(visited)) == 8
+    assert results[ORIGIN + "/a1"]["depth"] == 2
+
+
+def test_crawl_max_pages(visited):
+    results = SiteCrawler(FakePool(), max_depth=5, max_pages=3, concurrency=2).crawl([ORIGIN])
+    assert len(results) == len(visited) == 3
+
+
+def test_failed_page_recorded_as_problem(visited, monkeypatch):
+    monkeypatch.setitem(SITE, "/", ["/broken"])
+    crawler = SiteCrawler(FakePool(), max_depth=1)
+    crawler.crawl([ORIGIN])
+
+    assert list(crawler.problems()) == [ORIGIN + "/broken"]
+    assert crawler.problems()[ORIGIN + "/broken"][0].startswith("页面打开失败")
+
+
+def test_resume_from_checkpoint(visited, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    first = SiteCrawler(FakePool(), max_depth=2, max_pages=4, concurrency=1, checkpoint=str(checkpoint))
+    first.crawl([ORIGIN])
+
+    # 未完成时保留检查点
+    state = json.loads(checkpoint.read_text(encoding="utf-8"))
+    assert state["origin"] == ORIGIN
+    assert len(state["results"]) == 4
+    assert state["queue"]
+
+    visited.clear()
+    second = SiteCrawler(FakePool(), max_depth=2, max_pages=3, concurrency=1, checkpoint=str(checkpoint))
+    results = second.crawl([ORIGIN])
+    # 每次运行的页面数限制只计算本次运行检查的页面
+    assert len(visited) == 3
+    assert not set(visited) & set(state["results"])
+    assert len(results) == 7
+
+    visited.clear()
+    third = SiteCrawler(FakePool(), max_depth=2, checkpoint=str(checkpoint))
+    assert len(third.crawl([ORIGIN])) == 8
+    assert len(visited) == 1
+    # 爬取完成后删除检查点
+    assert not checkpoint.exists()
+
+
+def test_checkpoint_for_other_site_ignored(visited, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    checkpoint.write_text(json.dumps({
+        "origin": "https://other.example.org", "queue": [], "seen": [], "results": {}
+    }), encoding="utf-8")
+
+    results = SiteCrawler(FakePool(), max_depth=0, checkpoint=str(checkpoint)).crawl([ORIGIN])
+    assert list(results) == [ORIGIN + "/"]
+
+
+def test_format_report():
+    results = {
+        ORIGIN + "/": {"depth": 0, "problems": []},
+        ORIGIN + "/a": {"depth": 1, "problems": ["页面标题为空", "HTTP状态码 404"]},
+    }
+    report = site_crawler.format_report(results)
+    assert report.splitlines() == [
+        "共检查 2 个页面，1 个页面有问题",
+        f"  [深度1] {ORIGIN}/a",
+        "      - 页面标题为空",
+        "      - HTTP状态码 404",
+    ]
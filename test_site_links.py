@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+站点链接回归测试(访问线上站点，需要 --crawl)
+从首页和导航栏目出发爬取同源页面，对每个页面执行标题、状态码、横向溢出和图片检查。
+爬取逻辑本身的单元测试见 test_site_crawler.py。
+
+使用方法:
+    pytest test_site_links.py --crawl --crawl-depth 3 --pool-size 4
+"""
+
+from urllib.parse import urljoin
+
+import pytest
+
+from utils.dom_snapshot import snapshot
+from utils.site_crawler import SiteCrawler, format_report
+from utils.waits import wait_for_page_settled
+
+
+def navigation_urls(driver, base_url, nav_items):
+    """在首页上找到各导航栏目的链接地址"""
+    driver.get(base_url)
+    wait_for_page_settled(driver)
+    links = snapshot(driver, "a[href]", ["href"])
+
+    urls = []
+    for item in nav_items:
+        for link in links:
+            if item in link["text"]:
+                urls.append(urljoin(driver.current_url, link["attributes"]["href"]))
+                break
+    return urls
+
+
+@pytest.mark.crawl
+def test_site_links(request, driver_pool, base_url, test_data, record_property):
+    """爬取站点并检查每个页面"""
+    with driver_pool.lease() as driver:
+        start_urls = [base_url] + navigation_urls(driver, base_url, test_data["navigation_items"])
+
+    config = request.config
+    crawler = SiteCrawler(
+        driver_pool,
+        max_depth=config.getoption("--crawl-depth"),
+        max_pages=config.getoption("--crawl-max-pages"),
+        checkpoint=config.getoption("--crawl-checkpoint")
+    )
+    results = crawler.crawl(start_urls)
+
+    report = format_report(results)
+    record_property("crawl_report", report)
+    print(report)
+
+    problems = crawler.problems()
+    assert not problems, f"{len(problems)} 个页面检查未通过:\n{report}"
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+测试框架公共组件
+"""
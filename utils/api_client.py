@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+HTTP测试客户端
+
+整个测试会话共用一个连接池(keep-alive)，失败的请求按指数退避重试，
+每个请求的耗时(含重试)都会记录下来。
+同步接口直接使用requests；异步接口把请求交给有界线程池执行，
+因此录制/回放缓存适配器、重试和连接池对两种接口同样生效。
+
+使用方法:
+    response = client.get("/path")
+    responses = client.probe(["/a", "/b", ...])          # 并发探测，返回顺序与输入一致
+    response = await client.arequest("GET", "/path")      # 在异步代码中使用
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.page_metrics import percentile
+
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+
+# 这些状态码视为临时故障，按退避策略重试
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class APIClient:
+    """带连接池、重试和耗时记录的HTTP客户端"""
+
+    def __init__(self, base_url, http_cache=None, pool_size=32, retries=3, backoff=0.3, timeout=10,
+                 keep_latencies=True):
+        """
+        Args:
+            base_url: 相对路径的前缀
+            http_cache: utils.http_cache.HttpCache，启用时请求经过录制/回放缓存
+            pool_size: 每个主机的连接池大小，也是并发探测的最大并发数
+            retries: 连接错误和临时故障状态码的重试次数(只重试幂等方法)
+            backoff: 退避系数，第n次重试前等待 backoff * 2^(n-1) 秒
+            timeout: 默认超时(秒)
+            keep_latencies: 是否记录每个请求的耗时(负载测试自行统计，不需要保留)
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.keep_latencies = keep_latencies
+        self.latencies = []
+        self._lock = threading.Lock()
+        self._executor = None
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            raise_on_status=False,
+        )
+        adapter_options = {"pool_connections": pool_size, "pool_maxsize": pool_size, "max_retries": retry}
+        if http_cache is not None and http_cache.enabled:
+            adapter = http_cache.adapter(**adapter_options)
+        else:
+            adapter = HTTPAdapter(**adapter_options)
+
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, endpoint):
+        """相对路径拼接base_url，完整URL原样返回"""
+        if endpoint.startswith(("http://", "https://")):
+            return endpoint
+        return f"{self.base_url}{endpoint}"
+
+    def request(self, method, endpoint, **kwargs):
+        """发送请求并记录耗时"""
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(endpoint)
+        started = time.perf_counter()
+        status = None
+        try:
+            response = self.session.request(method, url, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            if self.keep_latencies:
+                with self._lock:
+                    self.latencies.append({
+                        "method": method,
+                        "url": url,
+                        "status": status,
+                        "elapsed": time.perf_counter() - started,
+                    })
+
+    def get(self, endpoint, **kwargs):
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint, **kwargs):
+        return self.request("POST", endpoint, **kwargs)
+
+    def head(self, endpoint, **kwargs):
+        return self.request("HEAD", endpoint, **kwargs)
+
+    async def arequest(self, method, endpoint, **kwargs):
+        """request()的异步版本"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), lambda: self.request(method, endpoint, **kwargs)
+        )
+
+    async def aget(self, endpoint, **kwargs):
+        return await self.arequest("GET", endpoint, **kwargs)
+
+    async def apost(self, endpoint, **kwargs):
+        return await self.arequest("POST", endpoint, **kwargs)
+
+    async def agather(self, endpoints, method="GET", **kwargs):
+        """
+        并发请求一组地址
+
+        Returns:
+            与输入顺序一致的列表，元素为响应或请求异常
+        """
+        return await asyncio.gather(
+            *(self.arequest(method, endpoint, **kwargs) for endpoint in endpoints),
+            return_exceptions=True
+        )
+
+    def probe(self, endpoints, method="GET", **kwargs):
+        """agather()的同步入口，供普通测试函数使用"""
+        return asyncio.run(self.agather(endpoints, method, **kwargs))
+
+    def latency_stats(self):
+        """
+        已记录请求的耗时统计(秒)
+
+        Returns:
+            {"n", "p50", "p95", "p99", "max"}，没有记录时为空字典
+        """
+        with self._lock:
+            values = [entry["elapsed"] for entry in self.latencies]
+        if not values:
+            return {}
+        return {
+            "n": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values),
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.pool_size, thread_name_prefix="api-client"
+                )
+            return self._executor
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+页面资源完整性检查
+
+从已加载的页面中取出全部 img/script/link/a 的URL，用有界线程池在同一个
+requests.Session 上并发检查：先发HEAD，服务器不支持时退回GET(只读响应头)。
+每个主机同时最多 per_host 个请求，避免对同一站点造成突发压力。
+整页检查的耗时约等于最慢的单个请求。
+
+每条检查结果:
+    url, kind, status, ok, final_url, redirects[(状态码, URL)], size, elapsed, error, oversized
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urldefrag, urljoin, urlparse, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.dom_snapshot import snapshot_many
+
+
+# 各类资源的大小上限(字节)，超过视为过大
+DEFAULT_SIZE_LIMITS = {
+    "img": 1024 * 1024,
+    "script": 512 * 1024,
+    "link": 300 * 1024,
+}
+
+# 这些状态码表示服务器不支持HEAD，需要改用GET
+_HEAD_UNSUPPORTED = (403, 404, 405, 501)
+
+_SOURCES = {
+    "img": ("img[src]", "src"),
+    "script": ("script[src]", "src"),
+    "link": ("link[href]", "href"),
+    "a": ("a[href]", "href"),
+}
+
+
+def collect_asset_urls(driver, served=None):
+    """
+    取出当前页面引用的全部资源URL(一次脚本调用)
+
+    Args:
+        served: 可选，判断站点能否提供某个路径的函数，见 served_only()
+
+    Returns:
+        [(url, 类型)]，已转为绝对地址、去掉锚点并去重，只保留http/https
+    """
+    found = snapshot_many(driver, [selector for selector, _ in _SOURCES.values()], ["src", "href"])
+    page_url = driver.current_url
+
+    urls = {}
+    for kind, (selector, attribute) in _SOURCES.items():
+        for record in found[selector]:
+            value = (record["attributes"][attribute] or "").strip()
+            if not value:
+                continue
+            url = urldefrag(urljoin(page_url, value))[0]
+            if urlparse(url).scheme in ("http", "https"):
+                urls.setdefault(url, kind)
+    if served is not None:
+        return served_only(urls.items(), page_url, served)
+    return list(urls.items())
+
+
+def served_only(urls, page_url, served):
+    """
+    只保留与页面同源、且站点能提供的URL
+
+    本地镜像只保存了首页及其资源(跨域资源也改写到了镜像下)，首页上的其他页面链接在镜像中都是404，
+    跨域的页面链接保持原样，离线时无法访问。
+
+    Args:
+        urls: [(url, 类型)]
+        served: 判断站点能否提供某个路径(含查询参数)的函数，例如 ReplicaServer.serves
+    """
+    origin = urlsplit(page_url).netloc
+    result = []
+    for url, kind in urls:
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        if parts.netloc == origin and served(path):
+            result.append((url, kind))
+    return result
+
+
+class AssetChecker:
+    """并发的资源检查器"""
+
+    def __init__(self, session=None, max_workers=16, per_host=4, timeout=10, size_limits=None):
+        """
+        Args:
+            session: 复用的requests.Session(例如挂载了录制/回放缓存的api_client.session)
+            max_workers: 总并发数
+            per_host: 每个主机的最大并发数
+            timeout: 单个请求的超时(秒)
+            size_limits: {类型: 字节上限}，默认 DEFAULT_SIZE_LIMITS
+        """
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.size_limits = DEFAULT_SIZE_LIMITS if size_limits is None else size_limits
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    def check(self, urls):
+        """
+        并发检查一组URL
+
+        Args:
+            urls: [(url, 类型)]，collect_asset_urls()的结果
+
+        Returns:
+            检查结果列表，顺序与输入一致
+        """
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            return list(executor.map(lambda item: self.check_one(*item), urls))
+
+    def check_one(self, url, kind="a"):
+        """检查单个URL"""
+        result = {
+            "url": url, "kind": kind, "status": None, "ok": False, "final_url": url,
+            "redirects": [], "size": None, "elapsed": None, "error": None, "oversized": False,
+        }
+        with self._host_limit(url):
+            try:
+                response = self._fetch(url)
+            except requests.RequestException as e:
+                result["error"] = str(e)
+                return result
+
+        result["status"] = response.status_code
+        result["ok"] = response.status_code < 400
+        result["final_url"] = response.url
+        result["redirects"] = [(r.status_code, r.url) for r in response.history]
+        result["elapsed"] = sum(
+            (r.elapsed.total_seconds() for r in response.history), response.elapsed.total_seconds()
+        )
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit():
+            result["size"] = int(length)
+            limit = self.size_limits.get(kind)
+            result["oversized"] = limit is not None and result["size"] > limit
+        return result
+
+    def _fetch(self, url):
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            if response.status_code not in _HEAD_UNSUPPORTED:
+                return response
+        except requests.RequestException:
+            pass
+        # stream=True只读取响应头，不下载响应体
+        response = self.session.get(url, allow_redirects=True, timeout=self.timeout, stream=True)
+        response.close()
+        return response
+
+    def _host_limit(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+
+def summarize(results):
+    """
+    汇总检查结果
+
+    Returns:
+        包含 checked、broken、redirected、oversized、slowest 的字典
+    """
+    timed = [r for r in results if r["elapsed"] is not None]
+    return {
+        "checked": len(results),
+        "broken": [r for r in results if not r["ok"]],
+        "redirected": [r for r in results if r["redirects"]],
+        "oversized": [r for r in results if r["oversized"]],
+        "slowest": max(timed, key=lambda r: r["elapsed"]) if timed else None,
+    }
+
+
+def format_report(summary):
+    """格式化为便于阅读的报告"""
+    lines = [
+        f"检查 {summary['checked']} 个URL: 失效 {len(summary['broken'])}，"
+        f"重定向 {len(summary['redirected'])}，过大 {len(summary['oversized'])}"
+    ]
+    for r in summary["broken"]:
+        lines.append(f"  失效 [{r['status'] or r['error']}] {r['url']}")
+    for r in summary["redirected"]:
+        chain = " -> ".join(f"{url} ({status})" for status, url in r["redirects"])
+        lines.append(f"  重定向 {chain} -> {r['final_url']}")
+    for r in summary["oversized"]:
+        lines.append(f"  过大 {r['size'] / 1024:.0f}KB {r['url']}")
+    if summary["slowest"]:
+        lines.append(f"  最慢 {summary['slowest']['elapsed']:.2f}秒 {summary['slowest']['url']}")
+    return "\n".join(lines)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+基于CDP Fetch域的浏览器请求拦截
+
+FetchInterceptor在后台线程中通过Selenium的bidi_connection监听Fetch.requestPaused，
+把每个被暂停的请求交给一组处理器决定：放行、直接返回响应或使请求失败。
+
+处理器需要实现:
+    intercepts_responses: 为True时同时在响应阶段暂停请求
+    resource_types: 可选，只需要处理的资源类型(如 ("Image", "Font"))；
+                    所有处理器都声明时只暂停这些类型的请求，否则暂停全部请求
+    on_request(info): 返回 None(不处理)、Fulfill 或 Fail
+    on_response(info, body): 响应阶段回调，body为响应体字节(重定向等情况下为None)
+
+info 为普通字典，包含 url、method、resource_type、post_data，响应阶段另有 status、headers。
+"""
+
+import base64
+import threading
+import weakref
+from collections import namedtuple
+
+import trio
+
+
+# 直接返回响应
+Fulfill = namedtuple("Fulfill", ["status", "headers", "body"])
+# 使请求失败，reason为CDP Network.ErrorReason的取值，例如 "BlockedByClient"
+Fail = namedtuple("Fail", ["reason"])
+
+_interceptors = weakref.WeakKeyDictionary()
+
+
+def interceptor_for(driver):
+    """返回已挂载到该浏览器上的拦截器，没有时返回None"""
+    return _interceptors.get(driver)
+
+
+class FetchInterceptor:
+    """在后台线程中运行的CDP请求拦截器"""
+
+    def __init__(self, driver, handlers=()):
+        self.driver = driver
+        self.handlers = list(handlers)
+        self._ready = threading.Event()
+        self._error = None
+        self._token = None
+        self._cancel_scope = None
+        self._thread = None
+
+    def start(self, timeout=10):
+        """启动拦截线程，等待Fetch域启用后返回"""
+        self._thread = threading.Thread(target=self._thread_main, daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("CDP请求拦截器启动超时")
+        if self._error:
+            raise self._error
+        _interceptors[self.driver] = self
+        return self
+
+    def stop(self, timeout=5):
+        """
+        停止拦截并等待CDP连接关闭，浏览器已退出时静默返回
+
+        连接关闭后浏览器端的Fetch拦截随之失效，之后的请求不再暂停。
+        """
+        if _interceptors.get(self.driver) is self:
+            del _interceptors[self.driver]
+        if self._token is None:
+            return
+        try:
+            trio.from_thread.run_sync(self._cancel_scope.cancel, trio_token=self._token)
+        except (trio.RunFinishedError, RuntimeError):
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _thread_main(self):
+        try:
+            trio.run(self._run)
+        except BaseException as e:
+            if not self._ready.is_set():
+                self._error = e
+                self._ready.set()
+
+    async def _run(self):
+        self._token = trio.lowlevel.current_trio_token()
+        with trio.CancelScope() as scope:
+            self._cancel_scope = scope
+            async with self.driver.bidi_connection() as connection:
+                session, devtools = connection.session, connection.devtools
+                fetch = devtools.fetch
+
+                types = [getattr(handler, "resource_types", None) for handler in self.handlers]
+                if types and all(types):
+                    patterns = [
+                        fetch.RequestPattern(
+                            url_pattern="*",
+                            resource_type=devtools.network.ResourceType(resource_type),
+                            request_stage=fetch.RequestStage.REQUEST,
+                        )
+                        for resource_type in sorted(set().union(*types))
+                    ]
+                else:
+                    patterns = [fetch.RequestPattern(url_pattern="*", request_stage=fetch.RequestStage.REQUEST)]
+                if any(handler.intercepts_responses for handler in self.handlers):
+                    patterns.append(
+                        fetch.RequestPattern(url_pattern="*", request_stage=fetch.RequestStage.RESPONSE)
+                    )
+                await session.execute(fetch.enable(patterns=patterns))
+                events = session.listen(fetch.RequestPaused, buffer_size=256)
+                self._ready.set()
+
+                async with trio.open_nursery() as nursery:
+                    async for event in events:
+                        nursery.start_soon(self._handle, session, devtools, event)
+
+    async def _handle(self, session, devtools, event):
+        fetch = devtools.fetch
+        info = {
+            "url": event.request.url,
+            "method": event.request.method,
+            "resource_type": event.resource_type.value,
+            "post_data": event.request.post_data,
+        }
+
+        try:
+            if event.response_status_code is None and event.response_error_reason is None:
+                await self._handle_request(session, devtools, event, info)
+                return
+
+            info["status"] = event.response_status_code
+            info["headers"] = {h.name.lower(): h.value for h in event.response_headers or []}
+            body = None
+            if event.response_status_code is not None and not 300 <= event.response_status_code < 400:
+                try:
+                    data, encoded = await session.execute(fetch.get_response_body(event.request_id))
+                    body = base64.b64decode(data) if encoded else data.encode("utf-8")
+                except Exception:
+                    body = None
+            for handler in self.handlers:
+                if handler.intercepts_responses:
+                    handler.on_response(info, body)
+            await session.execute(fetch.continue_request(request_id=event.request_id))
+        except Exception:
+            # 页面已经跳转或浏览器关闭时，暂停中的请求会失效
+            pass
+
+    async def _handle_request(self, session, devtools, event, info):
+        fetch = devtools.fetch
+        action = None
+        for handler in self.handlers:
+            action = handler.on_request(info)
+            if action is not None:
+                break
+
+        if isinstance(action, Fulfill):
+            await session.execute(fetch.fulfill_request(
+                request_id=event.request_id,
+                response_code=action.status,
+                response_headers=[fetch.HeaderEntry(name=k, value=v) for k, v in action.headers.items()],
+                body=base64.b64encode(action.body).decode("ascii"),
+            ))
+        elif isinstance(action, Fail):
+            await session.execute(fetch.fail_request(
+                request_id=event.request_id,
+                error_reason=devtools.network.ErrorReason(action.reason),
+            ))
+        else:
+            await session.execute(fetch.continue_request(request_id=event.request_id))
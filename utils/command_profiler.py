@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+WebDriver命令耗时分析
+
+包装浏览器的命令执行器(driver.command_executor.execute)，记录每一条WebDriver命令的
+名称、请求和响应大小以及往返时间。大小只统计字符串的长度(截图、页面源码、脚本等)，
+不在每条命令上序列化参数和返回值。测试和fixture不需要修改，CDP命令按 "cdp:方法名" 分别统计。
+每个测试结束时汇总为各命令的次数、总耗时、p50/p95和延迟直方图，
+记在测试名下(结果事件流中的 commands 属性)。
+
+测试总耗时减去命令耗时即为Python代码(以及HTTP请求等非浏览器操作)的耗时，
+命令耗时中 get、cdp:Page.navigate 等页面加载命令主要取决于站点，其余主要是驱动和浏览器本身。
+
+指定 --command-trace 时另外导出Chrome trace_event格式的时间线，可以在 chrome://tracing 或
+https://ui.perfetto.dev 中打开；并行运行时每个worker写一个文件(文件名加 -gw0 等后缀)。
+
+使用方法:
+    python -m utils.command_profiler report              # 最近一次运行中耗时最多的命令
+    python -m utils.command_profiler report --top 50 --run <运行id>
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import weakref
+
+from utils.result_sink import DEFAULT_STREAM_PATH, iter_tests, last_run
+
+
+# 延迟直方图的桶上界(毫秒)，最后一个桶为超过最大上界的命令
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_recorders = weakref.WeakKeyDictionary()
+
+
+class CommandRecorder:
+    """一个浏览器执行过的命令 [(名称, 开始时间, 耗时, 请求字节, 响应字节, 错误)]"""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def add(self, *call):
+        with self._lock:
+            self.calls.append(call)
+
+    def take(self):
+        with self._lock:
+            calls, self.calls = self.calls, []
+        return calls
+
+
+def command_name(command, params):
+    if command == "executeCdpCommand" and isinstance(params, dict):
+        return f"cdp:{params.get('cmd')}"
+    return command
+
+
+def _size(value):
+    """命令参数或响应值的近似大小: 字符串本身或第一层字符串值的长度之和"""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (list, tuple)):
+        return 0
+    return sum(len(item) for item in value if isinstance(item, str))
+
+
+def profile_commands(driver):
+    """包装浏览器的命令执行器(同一个浏览器只需调用一次)，返回CommandRecorder"""
+    if driver in _recorders:
+        return _recorders[driver]
+    recorder = _recorders[driver] = CommandRecorder()
+    executor = driver.command_executor
+    execute = executor.execute
+
+    def timed_execute(command, params=None):
+        name = command_name(command, params)
+        started = time.perf_counter()
+        try:
+            response = execute(command, params)
+        except Exception as e:
+            recorder.add(name, started, time.perf_counter() - started, _size(params), 0, type(e).__name__)
+            raise
+        elapsed = time.perf_counter() - started
+        value = response.get("value") if isinstance(response, dict) else None
+        recorder.add(name, started, elapsed, _size(params), _size(value), None)
+        return response
+
+    executor.execute = timed_execute
+    return recorder
+
+
+def take(driver):
+    """取出并清空浏览器记录的命令，没有包装过的浏览器返回空列表"""
+    recorder = _recorders.get(driver)
+    return recorder.take() if recorder else []
+
+
+def _percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def _bucket(ms):
+    for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+        if ms <= bound:
+            return index
+    return len(HISTOGRAM_BOUNDS_MS)
+
+
+def summarize(calls):
+    """
+    按命令汇总
+
+    Returns:
+        {"count", "total_ms", "commands": {名称: {"count", "total_ms", "p50_ms", "p95_ms", "max_ms",
+         "request_bytes", "response_bytes", "errors", "histogram"}}}
+    """
+    grouped = {}
+    for name, _, elapsed, request_bytes, response_bytes, error in calls:
+        entry = grouped.setdefault(name, {"times": [], "request_bytes": 0, "response_bytes": 0, "errors": 0})
+        entry["times"].append(elapsed * 1000)
+        entry["request_bytes"] += request_bytes
+        entry["response_bytes"] += response_bytes
+        entry["errors"] += int(error is not None)
+
+    commands = {}
+    for name, entry in grouped.items():
+        times = sorted(entry.pop("times"))
+        histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        for ms in times:
+            histogram[_bucket(ms)] += 1
+        commands[name] = dict(
+            entry,
+            count=len(times),
+            total_ms=round(sum(times), 1),
+            p50_ms=round(_percentile(times, 50), 1),
+            p95_ms=round(_percentile(times, 95), 1),
+            max_ms=round(times[-1], 1),
+            histogram=histogram,
+        )
+    return {
+        "count": len(calls),
+        "total_ms": round(sum(entry["total_ms"] for entry in commands.values()), 1),
+        "commands": commands,
+    }
+
+
+def format_histogram(histogram):
+    labels = [f"≤{bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+    return " ".join(f"{label}:{count}" for label, count in zip(labels, histogram) if count)
+
+
+def format_report(records, durations=None, top=20):
+    """
+    耗时最多的命令和命令耗时最多的测试
+
+    Args:
+        records: {nodeid: summarize()的返回值}
+        durations: {nodeid: 测试总耗时(秒)}，用于计算命令耗时所占比例
+    """
+    durations = durations or {}
+    totals = {}
+    for record in records.values():
+        for name, entry in record["commands"].items():
+            total = totals.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0,
+                                             "response_bytes": 0, "histogram": [0] * len(entry["histogram"])})
+            total["count"] += entry["count"]
+            total["total_ms"] += entry["total_ms"]
+            total["max_ms"] = max(total["max_ms"], entry["max_ms"])
+            total["errors"] += entry["errors"]
+            total["response_bytes"] += entry["response_bytes"]
+            total["histogram"] = [a + b for a, b in zip(total["histogram"], entry["histogram"])]
+
+    lines = [f"{'总耗时':>9} {'次数':>6} {'平均':>8} {'最大':>8} {'响应':>8}  命令"]
+    for name, total in sorted(totals.items(), key=lambda kv: kv[1]["total_ms"], reverse=True)[:top]:
+        errors = f"  [{total['errors']}次失败]" if total["errors"] else ""
+        lines.append(
+            f"{total['total_ms'] / 1000:8.2f}s {total['count']:6d} {total['total_ms'] / total['count']:6.1f}ms "
+            f"{total['max_ms']:6.0f}ms {total['response_bytes'] / 1024:6.0f}KB  {name}{errors}"
+        )
+        lines.append(f"{'':>42}{format_histogram(total['histogram'])}")
+
+    lines.append("命令耗时最多的测试(命令耗时 / 测试总耗时):")
+    ranked = sorted(records.items(), key=lambda kv: kv[1]["total_ms"], reverse=True)
+    for nodeid, record in ranked[:min(top, 10)]:
+        seconds = record["total_ms"] / 1000
+        duration = durations.get(nodeid)
+        share = f"{seconds:7.2f}s / {duration:7.2f}s ({seconds / duration:4.0%})" if duration else f"{seconds:7.2f}s"
+        lines.append(f"{share}  {record['count']:5d}条  {nodeid}")
+    return "\n".join(lines)
+
+
+def trace_path(path, worker=None):
+    """并行运行时每个worker写自己的文件"""
+    if not worker:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}-{worker}{ext}"
+
+
+class TraceWriter:
+    """Chrome trace_event格式的命令时间线，每个浏览器一行"""
+
+    def __init__(self, path, process_name="pytest"):
+        self.path = path
+        self.pid = os.getpid()
+        self.events = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": process_name}}]
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def _tid(self, driver):
+        key = id(driver)
+        if key not in self._threads:
+            self._threads[key] = tid = len(self._threads) + 1
+            self.events.append({
+                "name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                "args": {"name": f"浏览器 {tid}"}
+            })
+        return self._threads[key]
+
+    def add_test(self, nodeid, driver, started, ended, calls):
+        """
+        Args:
+            started, ended: 测试借用浏览器的起止时间(time.perf_counter())
+            calls: take()的返回值
+        """
+        with self._lock:
+            tid = self._tid(driver)
+            self.events.append({
+                "name": nodeid, "cat": "test", "ph": "X", "pid": self.pid, "tid": tid,
+                "ts": started * 1e6, "dur": (ended - started) * 1e6,
+            })
+            for name, start, elapsed, request_bytes, response_bytes, error in calls:
+                args = {"request_bytes": request_bytes, "response_bytes": response_bytes}
+                if error:
+                    args["error"] = error
+                self.events.append({
+                    "name": name, "cat": "webdriver", "ph": "X", "pid": self.pid, "tid": tid,
+                    "ts": start * 1e6, "dur": elapsed * 1e6, "args": args,
+                })
+
+    def write(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="WebDriver命令耗时报告")
+    parser.add_argument("command", choices=["report"], help="report: 耗时最多的命令和测试")
+    parser.add_argument("--stream", default=DEFAULT_STREAM_PATH, help="结果事件流文件")
+    parser.add_argument("--run", default=None, help="运行id (默认: 最近一次)")
+    parser.add_argument("--top", type=int, default=20, help="显示多少条命令 (默认: 20)")
+    args = parser.parse_args()
+
+    run = args.run or last_run(args.stream)
+    records, durations = {}, {}
+    for test in iter_tests(args.stream, run):
+        if "commands" in test["properties"]:
+            records[test["nodeid"]] = test["properties"]["commands"]
+            durations[test["nodeid"]] = sum(test.get(when, 0) for when in ("setup", "call", "teardown"))
+    if not records:
+        print(f"运行 {run} 中没有命令记录")
+        return 1
+    print(f"运行 {run} 中耗时最多的WebDriver命令:")
+    print(format_report(records, durations, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+流式测试数据
+
+用 @pytest.mark.data_source 从JSON Lines、CSV、Excel或JSON文件参数化测试，数据按需逐行读取:
+
+    @pytest.mark.data_source("test_data.json#browser_sizes", argname="size", ids="name")
+    def test_layout(size): ...                 # 每条记录一个测试
+
+    @pytest.mark.data_source("data/users.jsonl", argname="users", chunk_size=500)
+    def test_users(users):                     # 每500条记录一个测试
+        failures = collect_failures(users, check_user)
+        assert not failures, "\\n".join(failures)
+
+数据源写法: 路径(相对于仓库根目录)，可带 #部分:
+    *.jsonl / *.ndjson      每行一个JSON对象
+    *.csv                   第一行为表头
+    *.xlsx#工作表           第一行为表头，省略工作表时使用第一个
+    *.json#键               JSON中该键对应的列表(整个文件一次读入，只适合小文件)
+
+大数据集使用chunk_size: 收集阶段只扫描换行符记录每段的起始字节位置，不解析记录，
+测试执行时才从该位置读取和解析这一段；Excel按工作表尺寸中的行数分段，读取时从该段的第一行开始。
+xdist各worker收集到相同的分段，每个worker只解析分配给它的分段，内存占用与数据集大小无关。
+不分段时收集阶段(每个worker都会)读取全部记录，超过MAX_UNCHUNKED_BYTES的文件必须指定chunk_size。
+"""
+
+import csv
+import io
+import json
+import os
+from itertools import islice
+
+from openpyxl import load_workbook
+
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+
+# 不分段参数化时数据文件的大小上限
+MAX_UNCHUNKED_BYTES = 1024 * 1024
+
+
+class DataSource:
+    """一个数据文件(或其中的一部分)"""
+
+    def __init__(self, spec, root=_ROOT):
+        path, _, self.part = spec.partition("#")
+        self.spec = spec
+        self.path = path if os.path.isabs(path) else os.path.join(root, path)
+        self.name = os.path.splitext(os.path.basename(path))[0] + (f"-{self.part}" if self.part else "")
+        self.kind = os.path.splitext(path)[1].lower()
+        if self.kind not in JSONL_EXTENSIONS + EXCEL_EXTENSIONS + (".csv", ".json"):
+            raise ValueError(f"不支持的数据源格式: {spec}")
+
+    def __iter__(self):
+        """逐条读取全部记录"""
+        return self.read(0, None)
+
+    def read(self, start, stop, offset=0):
+        """
+        读取第start条到第stop条(不含)之间的记录
+
+        Args:
+            offset: 第start条记录在文件中的字节位置(JSONL和CSV)，由scan()得到
+
+        Excel的序号是表头之后的行号，空行占用序号但不产生记录。
+        """
+        if self.kind in JSONL_EXTENSIONS:
+            return self._read_jsonl(start, stop, offset)
+        if self.kind == ".csv":
+            return self._read_csv(start, stop, offset)
+        if self.kind in EXCEL_EXTENSIONS:
+            return self._read_excel(start, stop)
+        return islice(self._load_json(), start, stop)
+
+    def scan(self, chunk_size, limit=None):
+        """
+        把记录按chunk_size分段，不解析记录内容
+
+        Returns:
+            [(起始序号, 结束序号, 起始字节位置)]
+        """
+        if self.kind in EXCEL_EXTENSIONS:
+            count = self._excel_row_count()
+            if limit is not None:
+                count = min(count, limit)
+            return [(start, min(start + chunk_size, count), None) for start in range(0, count, chunk_size)]
+
+        chunks = []
+        count = 0
+        for offset in self._row_offsets():
+            if limit is not None and count >= limit:
+                break
+            if count % chunk_size == 0:
+                chunks.append([count, count, offset])
+            count += 1
+            chunks[-1][1] = count
+        return [tuple(chunk) for chunk in chunks]
+
+    def chunks(self, chunk_size, limit=None):
+        return [DataChunk(self, start, stop, offset) for start, stop, offset in self.scan(chunk_size, limit)]
+
+    def _row_offsets(self):
+        """每条记录的起始字节位置(JSON为None)"""
+        if self.kind in JSONL_EXTENSIONS:
+            with open(self.path, "rb") as f:
+                offset = 0
+                for line in f:
+                    if line.strip():
+                        yield offset
+                    offset += len(line)
+        elif self.kind == ".csv":
+            with open(self.path, "rb") as f:
+                offset = len(f.readline())  # 表头
+                row_start, quotes = offset, 0
+                for line in f:
+                    offset += len(line)
+                    # 引号内的换行属于同一条记录
+                    quotes += line.count(b'"')
+                    if quotes % 2 == 0:
+                        if line.strip():
+                            yield row_start
+                        row_start, quotes = offset, 0
+        else:
+            for _ in self._load_json():
+                yield None
+
+    def _read_jsonl(self, start, stop, offset):
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            index = start
+            for line in f:
+                if stop is not None and index >= stop:
+                    break
+                if line.strip():
+                    yield json.loads(line)
+                    index += 1
+
+    def _read_csv(self, start, stop, offset):
+        with open(self.path, "r", encoding="utf-8-sig", newline="") as f:
+            header = next(csv.reader(f))
+        with open(self.path, "rb") as raw:
+            raw.seek(offset or 0)
+            text = io.TextIOWrapper(raw, encoding="utf-8-sig" if not offset else "utf-8", newline="")
+            reader = csv.reader(text)
+            if not offset:
+                next(reader, None)
+            rows = (row for row in reader if any(cell.strip() for cell in row))
+            for row in islice(rows, 0, None if stop is None else stop - start):
+                yield dict(zip(header, row))
+
+    def _open_sheet(self):
+        # 只读模式按行流式解析，不把整个工作表读入内存
+        workbook = load_workbook(self.path, read_only=True, data_only=True)
+        return workbook, workbook[self.part] if self.part else workbook.worksheets[0]
+
+    def _read_excel(self, start, stop):
+        workbook, sheet = self._open_sheet()
+        try:
+            header = next(sheet.iter_rows(max_row=1, values_only=True), None)
+            if header is None:
+                return
+            # 从该段的第一行开始取值，之前的行不转换为单元格；读到结束行即停止解析
+            rows = sheet.iter_rows(min_row=start + 2, max_row=None if stop is None else stop + 1, values_only=True)
+            for row in rows:
+                if any(cell is not None for cell in row):
+                    yield dict(zip(header, row))
+        finally:
+            workbook.close()
+
+    def _excel_row_count(self):
+        """表头之后的行数，取自工作表记录的尺寸，没有记录尺寸时才逐行统计"""
+        workbook, sheet = self._open_sheet()
+        try:
+            if sheet.max_row is None:
+                sheet.calculate_dimension(force=True)
+            return max((sheet.max_row or 0) - 1, 0)
+        finally:
+            workbook.close()
+
+    def _load_json(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data[self.part] if self.part else data
+
+
+class DataChunk:
+    """数据源中连续的一段记录，迭代时才读取"""
+
+    def __init__(self, source, start, stop, offset=None):
+        self.source = source
+        self.start = start
+        self.stop = stop
+        self.offset = offset
+
+    def __iter__(self):
+        return self.source.read(self.start, self.stop, self.offset or 0)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    @property
+    def id(self):
+        return f"{self.source.name}[{self.start}:{self.stop}]"
+
+    def __repr__(self):
+        return f"DataChunk({self.id})"
+
+
+def collect_failures(records, check, max_failures=20):
+    """
+    对每条记录执行check，收集失败而不是在第一条失败时停止
+
+    Returns:
+        失败描述列表，最多max_failures条
+    """
+    failures = []
+    start = getattr(records, "start", 0)
+    for index, record in enumerate(records, start):
+        try:
+            check(record)
+        except AssertionError as e:
+            failures.append(f"第{index}条 {record}: {e}")
+            if len(failures) >= max_failures:
+                failures.append("失败过多，后续记录未检查")
+                break
+    return failures
+
+
+def parametrize(metafunc, limit=None):
+    """按data_source标记参数化测试(在pytest_generate_tests中调用)"""
+    for mark in metafunc.definition.iter_markers("data_source"):
+        source = DataSource(mark.args[0])
+        argname = mark.kwargs.get("argname", "record")
+        if argname not in metafunc.fixturenames:
+            continue
+        chunk_size = mark.kwargs.get("chunk_size")
+        if chunk_size:
+            chunks = source.chunks(chunk_size, limit)
+            metafunc.parametrize(argname, chunks, ids=[chunk.id for chunk in chunks])
+            continue
+
+        if os.path.getsize(source.path) > MAX_UNCHUNKED_BYTES:
+            raise ValueError(
+                f"{source.spec} 超过 {MAX_UNCHUNKED_BYTES // 1024}KB，"
+                "逐条参数化会在每个worker的收集阶段读取全部记录，请指定chunk_size"
+            )
+        records = list(islice(source, limit))
+        key = mark.kwargs.get("ids")
+        ids = [
+            str(record[key]) if key and isinstance(record, dict) and key in record else f"{source.name}-{index}"
+            for index, record in enumerate(records)
+        ]
+        metafunc.parametrize(argname, records, ids=ids)
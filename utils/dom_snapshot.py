@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+批量DOM快照
+
+对每个元素逐个调用 is_displayed()/get_attribute() 都是一次WebDriver往返，
+首页上几百个图片和链接就是几百次往返。这里用一次 execute_script 取回所有匹配元素的
+标签、属性、文本、可见性、位置尺寸以及图片加载状态，返回普通的字典供测试断言。
+
+每条记录:
+    tag, text, attributes{名称: 值}, visible, rect{x, y, width, height}
+    图片额外包含: complete, natural_width, natural_height, current_src, loaded
+"""
+
+
+DEFAULT_ATTRIBUTES = ("id", "class", "src", "href", "alt", "title")
+
+# 文本只用于断言和排查，过长的截断以减少传输
+_MAX_TEXT = 200
+
+_SNAPSHOT_SCRIPT = """
+var selectors = arguments[0], names = arguments[1], maxText = arguments[2];
+
+function isVisible(el) {
+    if (el.checkVisibility) {
+        if (!el.checkVisibility({opacityProperty: true, visibilityProperty: true})) {
+            return false;
+        }
+    } else {
+        var style = window.getComputedStyle(el);
+        if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') {
+            return false;
+        }
+    }
+    var rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0;
+}
+
+function record(el) {
+    var rect = el.getBoundingClientRect();
+    var attributes = {};
+    for (var i = 0; i < names.length; i++) {
+        attributes[names[i]] = el.getAttribute(names[i]);
+    }
+    var item = {
+        tag: el.tagName.toLowerCase(),
+        text: (el.innerText || '').trim().slice(0, maxText),
+        attributes: attributes,
+        visible: isVisible(el),
+        rect: {x: rect.left + window.scrollX, y: rect.top + window.scrollY,
+               width: rect.width, height: rect.height}
+    };
+    if (item.tag === 'img') {
+        item.complete = el.complete;
+        item.natural_width = el.naturalWidth;
+        item.natural_height = el.naturalHeight;
+        item.current_src = el.currentSrc;
+        item.loaded = el.complete && el.naturalWidth > 0;
+    }
+    return item;
+}
+
+var result = {};
+for (var s = 0; s < selectors.length; s++) {
+    result[selectors[s]] = Array.prototype.map.call(document.querySelectorAll(selectors[s]), record);
+}
+return result;
+"""
+
+
+def snapshot_many(driver, selectors, attributes=DEFAULT_ATTRIBUTES):
+    """
+    一次调用获取多个CSS选择器匹配的元素
+
+    Returns:
+        {选择器: [记录, ...]}，按文档顺序
+    """
+    return driver.execute_script(_SNAPSHOT_SCRIPT, list(selectors), list(attributes), _MAX_TEXT)
+
+
+def snapshot(driver, selector, attributes=DEFAULT_ATTRIBUTES):
+    """获取一个CSS选择器匹配的全部元素记录"""
+    return snapshot_many(driver, [selector], attributes)[selector]
+
+
+def visible(records):
+    """过滤出可见的元素"""
+    return [r for r in records if r["visible"]]
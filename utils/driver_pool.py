@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+WebDriver浏览器池
+
+每个进程(xdist worker)只在启动时预热N个无头Chrome，测试之间通过重置
+cookies、storage和窗口大小复用浏览器，而不是每个测试类都冷启动一次。
+浏览器在使用次数达到上限或崩溃后会被回收，并在后台补充新的实例。
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+from utils import page_profiles, perf_log
+
+
+DEFAULT_WINDOW_SIZE = (1920, 1080)
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+
+# 等待空闲浏览器的默认超时(秒)，超时通常说明有浏览器借出后没有归还
+DEFAULT_ACQUIRE_TIMEOUT = 300
+
+# 新建浏览器的隐式等待(秒)，归还时恢复，避免测试中设置的值带到之后的测试
+DEFAULT_IMPLICIT_WAIT = 0
+
+
+def build_chrome_options(headless=True, window_size=DEFAULT_WINDOW_SIZE):
+    """构建所有测试共用的Chrome选项"""
+    options = Options()
+
+    if headless:
+        options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--window-size={},{}".format(*window_size))
+    options.add_argument(f"--user-agent={USER_AGENT}")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+
+    # 启用性能日志
+    options.add_experimental_option('perfLoggingPrefs', {
+        'enableNetwork': True,
+        'enablePage': False,
+        'enableTimeline': False
+    })
+    # perfLoggingPrefs只配置内容，需要同时开启performance日志才会真正采集
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    options.add_argument("--enable-logging")
+    options.add_argument("--log-level=0")
+
+    return options
+
+
+def chrome_factory(driver_path=None, headless=True):
+    """
+    返回创建Chrome实例的工厂函数
+
+    Args:
+        driver_path: ChromeDriver路径，为None时由Selenium自行解析
+        headless: 是否使用无头模式
+    """
+    def create():
+        service = Service(driver_path) if driver_path else Service()
+        driver = webdriver.Chrome(service=service, options=build_chrome_options(headless))
+
+        # 执行脚本移除webdriver标识
+        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        return driver
+
+    return create
+
+
+def reset_driver(driver, window_size=DEFAULT_WINDOW_SIZE, implicit_wait=DEFAULT_IMPLICIT_WAIT):
+    """
+    将浏览器恢复到干净状态：关闭多余窗口、清空cookies和storage、取消视口模拟和页面加载配置、
+    恢复窗口大小和隐式等待
+
+    Raises:
+        WebDriverException: 浏览器无法重置(例如测试关闭了全部窗口)，应回收该浏览器
+    """
+    handles = driver.window_handles
+    if not handles:
+        raise WebDriverException("浏览器的窗口已全部关闭")
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+
+    # localStorage/sessionStorage只能在当前源上清理，需要在离开页面前执行
+    driver.execute_script(
+        "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}"
+    )
+    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    driver.delete_all_cookies()
+
+    driver.get("about:blank")
+    # 取消响应式检查留下的设备尺寸模拟
+    driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+    # 取消 @pytest.mark.profile 设置的请求拦截和动画关闭
+    page_profiles.clear(driver)
+    driver.set_window_size(*window_size)
+    driver.implicitly_wait(implicit_wait)
+    perf_log.clear(driver)
+
+
+class DriverPool:
+    """预热的浏览器池，按测试借出、归还时重置状态"""
+
+    def __init__(self, factory, size=1, max_uses=20, reset=reset_driver):
+        """
+        Args:
+            factory: 无参函数，返回新的WebDriver实例
+            size: 池中浏览器数量
+            max_uses: 单个浏览器被借出多少次后回收重建
+            reset: 归还时用于重置浏览器状态的函数
+        """
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.reset = reset
+
+        self._idle = queue.Queue()
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._live = 0
+        self._closed = False
+
+    def warm_up(self):
+        """并行启动池中全部浏览器"""
+        with self._lock:
+            missing = self.size - self._live
+            self._live += missing
+        if missing <= 0:
+            return
+
+        with ThreadPoolExecutor(max_workers=missing) as executor:
+            futures = [executor.submit(self._create) for _ in range(missing)]
+        error = None
+        for future in futures:
+            try:
+                self._idle.put(future.result())
+            except Exception as e:
+                with self._lock:
+                    self._live -= 1
+                error = error or e
+        if error:
+            raise error
+
+    def acquire(self, timeout=DEFAULT_ACQUIRE_TIMEOUT):
+        """
+        借出一个浏览器，池为空且未满时现场创建
+
+        Args:
+            timeout: 浏览器全部借出时最多等待的秒数，为None时一直等待
+
+        Raises:
+            TimeoutError: 超时仍没有浏览器归还
+        """
+        if self._closed:
+            raise RuntimeError("浏览器池已关闭")
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._live < self.size
+            if can_create:
+                self._live += 1
+        if can_create:
+            try:
+                return self._create()
+            except Exception:
+                with self._lock:
+                    self._live -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"等待{timeout}秒仍没有空闲浏览器: 池中{self.size}个浏览器都已借出，"
+                "请检查是否有浏览器借出后没有归还，或增大浏览器池(DRIVER_POOL_SIZE)"
+            ) from None
+
+    def release(self, driver, discard=False):
+        """
+        归还浏览器
+
+        Args:
+            driver: 借出的浏览器
+            discard: 为True时直接回收该浏览器(例如测试中浏览器崩溃)
+
+        重置失败(浏览器已崩溃)同样会触发回收。
+        """
+        uses = self._uses.get(id(driver), 0) + 1
+        self._uses[id(driver)] = uses
+
+        if not discard and uses < self.max_uses and not self._closed:
+            try:
+                self.reset(driver)
+                self._idle.put(driver)
+                return
+            except WebDriverException:
+                pass
+
+        self._destroy(driver)
+        if not self._closed:
+            self._replenish()
+
+    @contextmanager
+    def lease(self):
+        """以上下文管理器的方式借用浏览器"""
+        driver = self.acquire()
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        """关闭池中所有空闲浏览器"""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._destroy(driver)
+
+    def _create(self):
+        driver = self.factory()
+        self._uses[id(driver)] = 0
+        return driver
+
+    def _destroy(self, driver):
+        self._uses.pop(id(driver), None)
+        with self._lock:
+            self._live -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _replenish(self):
+        """在后台补充一个浏览器，避免下一个测试承担冷启动时间"""
+        def spawn():
+            with self._lock:
+                if self._live >= self.size:
+                    return
+                self._live += 1
+            try:
+                driver = self._create()
+            except Exception:
+                with self._lock:
+                    self._live -= 1
+                return
+            if self._closed:
+                self._destroy(driver)
+            else:
+                self._idle.put(driver)
+
+        threading.Thread(target=spawn, daemon=True).start()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ChromeDriver离线解析缓存
+
+ChromeDriverManager().install()每次都会联网查询版本，在隔离网络的CI中直接失败。
+这里在本地记录"Chrome版本 -> ChromeDriver路径"的对应关系：已安装的Chrome版本
+没有变化时直接复用缓存的驱动路径，不发起任何网络请求。
+"""
+
+import json
+import os
+import subprocess
+import tempfile
+import warnings
+from datetime import datetime
+
+from webdriver_manager.chrome import ChromeDriverManager
+from webdriver_manager.core.os_manager import ChromeType, OperationSystemManager
+
+
+# 显式指定ChromeDriver路径的环境变量，run_tests.py --driver-path 会设置它
+DRIVER_PATH_ENV = "CHROMEDRIVER_PATH"
+CACHE_FILE_ENV = "CHROMEDRIVER_CACHE_FILE"
+DEFAULT_CACHE_FILE = os.path.join(
+    os.path.expanduser("~"), ".cache", "nikon-webtest", "chromedriver.json"
+)
+
+
+def detect_chrome_version():
+    """读取本机已安装的Chrome版本(只执行本地命令，不联网)"""
+    os_manager = OperationSystemManager()
+    for chrome_type in (ChromeType.GOOGLE, ChromeType.CHROMIUM):
+        try:
+            version = os_manager.get_browser_version_from_os(chrome_type)
+        except Exception:
+            version = None
+        if version:
+            return version
+    return None
+
+
+def detect_driver_version(driver_path):
+    """读取ChromeDriver二进制的版本号"""
+    try:
+        output = subprocess.run(
+            [driver_path, "--version"], capture_output=True, text=True, timeout=10
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    parts = output.split()
+    return parts[1] if len(parts) > 1 else None
+
+
+def load_cache(cache_file):
+    """读取解析缓存，文件不存在或损坏时返回空字典"""
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_cache(cache_file, cache):
+    """原子写入解析缓存，避免多个xdist worker同时写入时产生半截文件"""
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_file), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, cache_file)
+
+
+def _major(version):
+    return version.split(".")[0] if version else None
+
+
+def _fallback_entry(cache, chrome_version):
+    """离线时挑选仍然存在的缓存驱动，优先同一主版本"""
+    entries = [e for e in cache.values() if os.path.exists(e.get("driver_path", ""))]
+    same_major = [e for e in entries if _major(e.get("chrome_version")) == _major(chrome_version)]
+    candidates = same_major or entries
+    if not candidates:
+        return None
+    return max(candidates, key=lambda e: e.get("resolved_at", ""))
+
+
+def resolve_driver_path(cache_file=None):
+    """
+    解析ChromeDriver路径
+
+    优先级: 环境变量 CHROMEDRIVER_PATH > 本地缓存(Chrome版本未变) > ChromeDriverManager联网下载。
+    联网失败时退回到缓存中同主版本的驱动。
+
+    Args:
+        cache_file: 缓存文件路径，默认取环境变量 CHROMEDRIVER_CACHE_FILE 或用户缓存目录
+
+    Returns:
+        ChromeDriver可执行文件路径
+    """
+    override = os.environ.get(DRIVER_PATH_ENV)
+    if override:
+        if not os.path.isfile(override):
+            raise FileNotFoundError(f"{DRIVER_PATH_ENV} 指定的ChromeDriver不存在: {override}")
+        return override
+
+    cache_file = cache_file or os.environ.get(CACHE_FILE_ENV, DEFAULT_CACHE_FILE)
+    chrome_version = detect_chrome_version()
+    cache = load_cache(cache_file)
+
+    key = chrome_version or "unknown"
+    entry = cache.get(key)
+    if entry and os.path.exists(entry["driver_path"]):
+        return entry["driver_path"]
+
+    try:
+        driver_path = ChromeDriverManager().install()
+    except Exception as e:
+        fallback = _fallback_entry(cache, chrome_version)
+        if fallback is None:
+            raise
+        warnings.warn(
+            f"ChromeDriver联网解析失败({e})，使用缓存的驱动: {fallback['driver_path']}"
+        )
+        return fallback["driver_path"]
+
+    cache[key] = {
+        "chrome_version": chrome_version,
+        "driver_version": detect_driver_version(driver_path),
+        "driver_path": driver_path,
+        "resolved_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    save_cache(cache_file, cache)
+    return driver_path
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+不稳定测试检测与隔离
+
+启用 --flaky-reruns N 后失败的测试立即在新的浏览器上重跑(见 conftest.pooled_driver)，重跑通过记为flaky，
+全部失败才记为failed；结果写入测试历史数据库，用于统计每个测试的不稳定率。
+
+隔离名单(quarantine.json)是可选的：启用 --quarantine 后名单中的测试不参加主流程，
+用 --run-quarantined 单独运行它们(例如每晚一次)，稳定后再移出名单。
+
+使用方法:
+    python -m utils.flaky report                    # 各测试的不稳定率
+    python -m utils.flaky quarantine --min-rate 0.2 # 把不稳定率超过20%的测试加入隔离名单
+    python -m utils.flaky release <nodeid>          # 移出隔离名单
+"""
+
+import argparse
+import json
+import os
+from datetime import date
+
+from _pytest.runner import runtestprotocol
+
+from utils.history_store import DEFAULT_DB_PATH, HistoryStore
+
+
+DEFAULT_QUARANTINE_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "quarantine.json"
+)
+
+RERUN = "rerun"
+
+
+def run_with_reruns(item, nextitem, reruns):
+    """
+    执行一个测试，setup或call失败时重跑，最多重跑reruns次
+
+    除最后一次外，失败的报告以 rerun 结果上报，不计入失败数。
+    """
+    item.ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+    for attempt in range(reruns + 1):
+        reports = runtestprotocol(item, nextitem=nextitem, log=False)
+        failed = any(r.failed for r in reports if r.when in ("setup", "call"))
+        will_rerun = failed and attempt < reruns
+        for report in reports:
+            if will_rerun and report.failed and report.when in ("setup", "call"):
+                report.outcome = RERUN
+            item.ihook.pytest_runtest_logreport(report=report)
+        if not will_rerun:
+            break
+        _reset_fixtures(item)
+    item.ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
+
+
+def _reset_fixtures(item):
+    """
+    重跑前清除测试用到的fixture缓存(与pytest-rerunfailures相同)
+
+    失败的fixture缓存着异常，重跑时会直接再次抛出；类级、模块级fixture(如 responsive_results、
+    screenshots)缓存着上一次采集的数据，不重新执行的话重跑只是用同样的数据再断言一次。
+    会话级fixture(浏览器池等)执行成功时保留。
+    """
+    if not item._request:
+        item._initrequest()
+    for fixturedefs in item._fixtureinfo.name2fixturedefs.values():
+        for fixturedef in fixturedefs:
+            if fixturedef.cached_result is None:
+                continue
+            if fixturedef.cached_result[2] is not None:
+                fixturedef.cached_result = None
+            elif fixturedef.scope not in ("function", "session"):
+                fixturedef.finish(item._request)
+
+
+def load_quarantine(path=DEFAULT_QUARANTINE_FILE):
+    """读取隔离名单 {nodeid: {"reason", "added"}}，文件不存在时为空"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_quarantine(quarantine, path=DEFAULT_QUARANTINE_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(quarantine, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="不稳定测试统计与隔离名单")
+    parser.add_argument("command", choices=["report", "quarantine", "release"],
+                        help="report: 不稳定率, quarantine: 加入隔离名单, release: 移出隔离名单")
+    parser.add_argument("nodeids", nargs="*", help="release时要移出的测试")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="历史数据库路径")
+    parser.add_argument("--file", default=DEFAULT_QUARANTINE_FILE, help="隔离名单路径")
+    parser.add_argument("--runs", type=int, default=20, help="统计最近多少次运行 (默认: 20)")
+    parser.add_argument("--min-rate", type=float, default=0.2, help="加入隔离名单的最低不稳定率 (默认: 0.2)")
+    args = parser.parse_args()
+
+    quarantine = load_quarantine(args.file)
+
+    if args.command == "release":
+        for nodeid in args.nodeids:
+            if quarantine.pop(nodeid, None) is not None:
+                print(f"已移出隔离名单: {nodeid}")
+        save_quarantine(quarantine, args.file)
+        return 0
+
+    rates = HistoryStore(args.db).flake_rates(args.runs)
+    if args.command == "report":
+        print(f"最近{args.runs}次运行中的不稳定测试:")
+        for nodeid, stats in rates.items():
+            mark = "  [已隔离]" if nodeid in quarantine else ""
+            print(f"  {stats['rate']:6.1%}  flaky {stats['flaky']}/{stats['runs']}  "
+                  f"failed {stats['failed']}  {nodeid}{mark}")
+        return 0
+
+    for nodeid, stats in rates.items():
+        if stats["rate"] >= args.min_rate and nodeid not in quarantine:
+            quarantine[nodeid] = {
+                "reason": f"最近{stats['runs']}次运行不稳定率 {stats['rate']:.0%}",
+                "added": date.today().isoformat(),
+            }
+            print(f"已加入隔离名单: {nodeid}")
+    save_quarantine(quarantine, args.file)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试历史数据库
+
+每次运行把每个测试的setup/call/teardown耗时和结果写入本地SQLite，
+用于按耗时排序、负载均衡和查看哪些检查越来越慢。
+
+使用方法:
+    python -m utils.history_store trend      # 耗时增长最多的测试
+    python -m utils.history_store slowest    # 最近几次运行中最慢的测试
+"""
+
+import argparse
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reports", "test_history.db"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    exitstatus INTEGER
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    nodeid TEXT NOT NULL,
+    worker TEXT,
+    setup REAL DEFAULT 0,
+    call REAL DEFAULT 0,
+    teardown REAL DEFAULT 0,
+    outcome TEXT,
+    attempts INTEGER DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_results_nodeid ON results (nodeid, run_id);
+"""
+
+
+def outcome_of(phases, attempts=1):
+    """把各阶段结果合并为一个: failed > skipped > passed，重跑后才通过的记为flaky"""
+    outcomes = set(phases.values())
+    if "failed" in outcomes:
+        return "failed"
+    if "skipped" in outcomes:
+        return "skipped"
+    return "flaky" if attempts > 1 else "passed"
+
+
+class HistoryStore:
+    """基于SQLite的测试历史"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+            # 旧数据库没有attempts列
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(results)")]
+            if "attempts" not in columns:
+                conn.execute("ALTER TABLE results ADD COLUMN attempts INTEGER DEFAULT 1")
+
+    def _connect(self):
+        # 多个pytest进程可能同时写入，等待锁而不是立即失败
+        return sqlite3.connect(self.path, timeout=30)
+
+    def record_run(self, started_at, results, exitstatus=None):
+        """
+        写入一次运行的结果
+
+        Args:
+            started_at: 运行开始时间(datetime)
+            results: {nodeid: {"worker": str, "setup": 秒, "call": 秒, "teardown": 秒,
+                               "outcome": str, "attempts": 执行次数}}
+            exitstatus: pytest退出码
+
+        Returns:
+            本次运行的id
+        """
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (started_at, finished_at, exitstatus) VALUES (?, ?, ?)",
+                (started_at.isoformat(timespec="seconds"),
+                 datetime.now().isoformat(timespec="seconds"), exitstatus)
+            )
+            run_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO results (run_id, nodeid, worker, setup, call, teardown, outcome, attempts) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, nodeid, r.get("worker"), r.get("setup", 0), r.get("call", 0),
+                  r.get("teardown", 0), r.get("outcome"), r.get("attempts", 1))
+                 for nodeid, r in results.items()]
+            )
+        return run_id
+
+    def durations(self, last_runs=5):
+        """最近几次运行中每个测试的平均总耗时 {nodeid: 秒}"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT nodeid, AVG(setup + call + teardown) FROM results "
+                "WHERE run_id IN (SELECT id FROM runs ORDER BY id DESC LIMIT ?) "
+                "GROUP BY nodeid",
+                (last_runs,)
+            ).fetchall()
+        return dict(rows)
+
+    def recent_failures(self, last_runs=3):
+        """最近几次运行中失败过的测试及失败次数 {nodeid: 次数}"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT nodeid, COUNT(*) FROM results "
+                "WHERE outcome = 'failed' AND run_id IN (SELECT id FROM runs ORDER BY id DESC LIMIT ?) "
+                "GROUP BY nodeid",
+                (last_runs,)
+            ).fetchall()
+        return dict(rows)
+
+    def flake_rates(self, last_runs=20):
+        """
+        最近几次运行中出现过flaky的测试
+
+        Returns:
+            {nodeid: {"runs", "flaky", "failed", "rate"}}，按不稳定率从高到低排序
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT nodeid, COUNT(*), SUM(outcome = 'flaky'), SUM(outcome = 'failed') FROM results "
+                "WHERE outcome != 'skipped' AND run_id IN (SELECT id FROM runs ORDER BY id DESC LIMIT ?) "
+                "GROUP BY nodeid HAVING SUM(outcome = 'flaky') > 0",
+                (last_runs,)
+            ).fetchall()
+        rates = {
+            nodeid: {"runs": runs, "flaky": flaky, "failed": failed, "rate": flaky / runs}
+            for nodeid, runs, flaky, failed in rows
+        }
+        return dict(sorted(rates.items(), key=lambda item: item[1]["rate"], reverse=True))
+
+    def trend(self, last_runs=10, limit=10):
+        """
+        耗时增长最多的测试
+
+        比较最近last_runs次运行中后一半与前一半的平均耗时。
+
+        Returns:
+            [(nodeid, 前一半平均, 后一半平均, 增长秒数)]，按增长从大到小排序
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT nodeid, run_id, setup + call + teardown FROM results "
+                "WHERE run_id IN (SELECT id FROM runs ORDER BY id DESC LIMIT ?) "
+                "ORDER BY nodeid, run_id",
+                (last_runs,)
+            ).fetchall()
+
+        series = {}
+        for nodeid, _, duration in rows:
+            series.setdefault(nodeid, []).append(duration)
+
+        trends = []
+        for nodeid, values in series.items():
+            if len(values) < 2:
+                continue
+            half = len(values) // 2
+            before = sum(values[:half]) / half
+            after = sum(values[half:]) / (len(values) - half)
+            trends.append((nodeid, before, after, after - before))
+
+        trends.sort(key=lambda t: t[3], reverse=True)
+        return trends[:limit]
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="测试耗时历史")
+    parser.add_argument("command", choices=["trend", "slowest"], help="trend: 耗时增长, slowest: 最慢的测试")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="历史数据库路径")
+    parser.add_argument("--runs", type=int, default=10, help="统计最近多少次运行 (默认: 10)")
+    parser.add_argument("--limit", type=int, default=10, help="显示条数 (默认: 10)")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    if args.command == "trend":
+        print(f"最近{args.runs}次运行中耗时增长最多的测试:")
+        for nodeid, before, after, delta in store.trend(args.runs, args.limit):
+            print(f"  {delta:+7.2f}秒  {before:6.2f} -> {after:6.2f}  {nodeid}")
+    else:
+        print(f"最近{args.runs}次运行中最慢的测试:")
+        durations = sorted(store.durations(args.runs).items(), key=lambda d: d[1], reverse=True)
+        for nodeid, duration in durations[:args.limit]:
+            print(f"  {duration:7.2f}秒  {nodeid}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
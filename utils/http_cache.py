@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+HTTP录制/回放缓存
+
+record 模式下真实发出请求并把响应写入磁盘上按内容寻址的存储，重定向链上的每一跳分别保存；
+replay 模式下直接从存储返回响应，不产生任何网络流量。
+requests流量通过传输适配器(CachingAdapter)接入，浏览器流量通过CDP Fetch拦截接入。
+
+存储结构:
+    <root>/objects/ab/abcdef...    响应体，文件名为内容的sha256
+    <root>/index/12/1234....json   请求(方法+URL+请求体)到响应元数据的索引
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from utils.cdp_fetch import Fail, Fulfill
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".http_cache")
+MODES = ("off", "record", "replay")
+
+# 响应体按解码后的内容保存，这些头部回放时不再适用
+_DROPPED_HEADERS = ("content-encoding", "transfer-encoding", "content-length", "connection")
+
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _to_bytes(body):
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    return body
+
+
+class HttpCache:
+    """按内容寻址的HTTP响应存储"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, mode="off", refresh=()):
+        """
+        Args:
+            root: 存储目录
+            mode: off/record/replay
+            refresh: URL通配模式列表，replay模式下匹配的URL仍会联网并重新录制
+        """
+        if mode not in MODES:
+            raise ValueError(f"未知的缓存模式: {mode}")
+        self.root = root
+        self.mode = mode
+        self.refresh = list(refresh)
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    @property
+    def intercepts_responses(self):
+        """浏览器拦截器是否需要在响应阶段暂停请求(只有需要录制时才需要)"""
+        return self.mode == "record" or bool(self.refresh)
+
+    def should_refresh(self, url):
+        return any(fnmatch.fnmatch(url, pattern) for pattern in self.refresh)
+
+    def uses_network(self, url):
+        """该URL是否需要真实联网"""
+        return self.mode != "replay" or self.should_refresh(url)
+
+    def key(self, method, url, body=None):
+        digest = hashlib.sha256(f"{method.upper()} {url}\n".encode("utf-8"))
+        digest.update(_to_bytes(body))
+        return digest.hexdigest()
+
+    def lookup(self, method, url, body=None):
+        """
+        查找缓存的响应
+
+        Returns:
+            包含 status、reason、headers、body 的字典，未命中时返回None
+        """
+        key = self.key(method, url, body)
+        try:
+            with open(self._index_path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            with open(self._object_path(entry["body"]), "rb") as f:
+                entry["body"] = f.read()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return entry
+
+    def store(self, method, url, status, headers, body, request_body=None, reason=""):
+        """保存一条响应，相同内容的响应体只保存一份"""
+        body = _to_bytes(body)
+        body_hash = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(body_hash)
+        if not os.path.exists(object_path):
+            _atomic_write(object_path, body)
+
+        entry = {
+            "method": method.upper(),
+            "url": url,
+            "status": status,
+            "reason": reason,
+            "headers": {k: v for k, v in headers.items() if k.lower() not in _DROPPED_HEADERS},
+            "body": body_hash,
+        }
+        key = self.key(method, url, request_body)
+        _atomic_write(self._index_path(key), json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+
+    def adapter(self, **kwargs):
+        """返回可挂载到requests.Session上的传输适配器"""
+        return CachingAdapter(self, **kwargs)
+
+    # 以下两个方法供 utils.cdp_fetch.FetchInterceptor 调用
+
+    def on_request(self, info):
+        if self.uses_network(info["url"]):
+            return None
+        entry = self.lookup(info["method"], info["url"], info["post_data"])
+        if entry is None:
+            return Fail("InternetDisconnected")
+        return Fulfill(entry["status"], entry["headers"], entry["body"])
+
+    def on_response(self, info, body):
+        if not self.uses_network(info["url"]):
+            return
+        if body is None:
+            # 重定向没有响应体，仍需录制(连同Location头部)，回放时浏览器才能从原始URL跟随到最终页面
+            if info["status"] is None or not 300 <= info["status"] < 400:
+                return
+            body = b""
+        self.store(info["method"], info["url"], info["status"], info["headers"], body, info["post_data"])
+
+    def _index_path(self, key):
+        return os.path.join(self.root, "index", key[:2], f"{key}.json")
+
+    def _object_path(self, body_hash):
+        return os.path.join(self.root, "objects", body_hash[:2], body_hash)
+
+
+class CachingAdapter(HTTPAdapter):
+    """按缓存模式录制或回放requests请求的传输适配器"""
+
+    def __init__(self, cache, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request, **kwargs):
+        if not self.cache.uses_network(request.url):
+            entry = self.cache.lookup(request.method, request.url, request.body)
+            if entry is None:
+                raise requests.ConnectionError(
+                    f"回放模式下缓存未命中: {request.method} {request.url}", request=request
+                )
+            return self._build_cached_response(request, entry)
+
+        response = super().send(request, **kwargs)
+        self.cache.store(
+            request.method, request.url, response.status_code, response.headers,
+            response.content, request.body, response.reason
+        )
+        return response
+
+    def _build_cached_response(self, request, entry):
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry.get("reason", "")
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry["body"]
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = timedelta(0)
+        return response
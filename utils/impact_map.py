@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试影响分析
+
+运行时记录每个测试实际用到的依赖，写入影响图(reports/impact_map.json):
+- data: 读取过的 test_data.json 顶层键(test_data fixture返回的字典会记录访问)，
+  模块导入时读取的数据用 @pytest.mark.uses_data("键") 声明
+- fixtures: 实际激活的fixture，包括通过 getfixturevalue 动态请求的
+- urls: 浏览器加载过的文档和API客户端请求过的路径
+
+指定 --changed <git版本> 时根据 git diff 选出受影响的测试，其余测试不运行:
+- 测试函数被修改 -> 该测试
+- fixture函数被修改(conftest.py或测试文件中) -> 用到该fixture的测试
+- test_data.json 某个顶层键的值变化 -> 读取过该键的测试
+- perf_budgets.json、visual_baselines/ 等数据文件 -> 用到对应fixture的测试
+- @pytest.mark.data_source 引用的数据文件 -> 从该文件参数化的测试
+- 测试文件的其他位置(导入、模块级代码、类定义) -> 该文件的全部测试
+- 其他Python文件和无法判断的文件 -> 全部测试
+- 文档等 -> 不影响
+--changed-url 指定变更的页面路径(支持通配符)，选出加载过这些页面的测试。
+影响图中没有记录的测试(新测试或从未完整运行过)总是会运行。
+"""
+
+import fnmatch
+import inspect
+import json
+import os
+import re
+import subprocess
+import threading
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import WebDriverException
+from urllib3.exceptions import HTTPError
+
+from utils import perf_log
+
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MAP_PATH = os.path.join(_ROOT, "reports", "impact_map.json")
+
+TEST_DATA_FILE = "test_data.json"
+
+# 数据文件(或目录前缀) -> 读取它的fixture
+DATA_FILE_FIXTURES = {
+    "perf_budgets.json": "perf_budgets",
+    "visual_baselines/": "visual_store",
+}
+
+# 不影响测试结果的文件
+IGNORED_PATTERNS = ("*.md", "*.pdf", ".gitignore", "requests.jsonl", "quarantine.json")
+
+_HUNK = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+# 当前测试读取过的test_data键，None表示没有在记录
+_current = None
+_lock = threading.Lock()
+
+
+class TrackedData(dict):
+    """记录顶层键访问的测试数据字典"""
+
+    def __getitem__(self, key):
+        record_data(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        record_data(key)
+        return super().get(key, default)
+
+
+def begin():
+    """开始记录一个测试的数据访问"""
+    global _current
+    with _lock:
+        _current = set()
+
+
+def record_data(key):
+    with _lock:
+        if _current is not None:
+            _current.add(key)
+
+
+def end():
+    """结束记录，返回读取过的键"""
+    global _current
+    with _lock:
+        keys, _current = _current or set(), None
+    return keys
+
+
+def url_path(url):
+    """影响图只记录路径，线上站点和本地镜像的同一页面视为同一个"""
+    return urlsplit(url).path or "/"
+
+
+def document_urls(driver):
+    """浏览器加载过的文档路径(来自性能日志)"""
+    paths = set()
+    for entry in perf_log.entries(driver):
+        method, params = perf_log.parse(entry)
+        if method == "Network.requestWillBeSent" and params.get("type") == "Document":
+            url = params["request"]["url"]
+            if url.startswith(("http://", "https://")):
+                paths.add(url_path(url))
+    return paths
+
+
+def safe_document_urls(driver):
+    """document_urls()，浏览器已崩溃或chromedriver无法连接时返回空集合"""
+    try:
+        return document_urls(driver)
+    except (WebDriverException, HTTPError, ConnectionError):
+        return set()
+
+
+def collect(item, data_keys, urls=()):
+    """
+    汇总一个测试的依赖
+
+    Args:
+        item: pytest测试项
+        data_keys: 运行中读取过的test_data键(见end())
+        urls: 运行中访问过的URL
+    """
+    for mark in item.iter_markers("uses_data"):
+        data_keys = set(data_keys) | set(mark.args)
+    for mark in item.iter_markers("data_source"):
+        path, _, key = mark.args[0].partition("#")
+        if path == TEST_DATA_FILE and key:
+            data_keys = set(data_keys) | {key}
+    fixtures = set(item.fixturenames)
+    request = getattr(item, "_request", None)
+    if request is not None:
+        # SubRequest与测试的request共用_fixture_defs，动态请求的fixture也在其中
+        fixtures.update(request._fixture_defs)
+    return {
+        "data": sorted(data_keys),
+        "fixtures": sorted(fixtures),
+        "urls": sorted({url_path(url) for url in urls}),
+    }
+
+
+def load_map(path=DEFAULT_MAP_PATH):
+    """读取影响图 {nodeid: {"data", "fixtures", "urls"}}，文件不存在时为空"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def update_map(records, path=DEFAULT_MAP_PATH):
+    """用本次运行的记录覆盖对应测试，其余测试保留原有记录"""
+    impact = load_map(path)
+    impact.update(records)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(impact, f, ensure_ascii=False, indent=1, sort_keys=True)
+    return impact
+
+
+def _git(args, cwd):
+    result = subprocess.run(["git"] + args, cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} 失败: {result.stderr.strip()}")
+    return result.stdout
+
+
+def git_root(cwd=_ROOT):
+    return _git(["rev-parse", "--show-toplevel"], cwd).strip()
+
+
+def changed_lines(rev, root):
+    """
+    工作区相对于rev的修改
+
+    Returns:
+        {路径: [(起始行, 结束行)]}，行号为工作区中的行号；删除的文件覆盖全部行
+    """
+    changes = {}
+    path = None
+    in_header = False
+    for line in _git(["diff", "-U0", "--no-color", "--no-ext-diff", rev, "--"], root).splitlines():
+        if line.startswith("diff --git"):
+            path, in_header = None, True
+        elif in_header and line.startswith("--- "):
+            old = line[4:]
+            path = old[2:] if old.startswith("a/") else None
+        elif in_header and line.startswith("+++ "):
+            new = line[4:]
+            if new.startswith("b/"):
+                path = new[2:]
+            changes.setdefault(path, [])
+            if new == "/dev/null":
+                changes[path].append((1, float("inf")))
+        elif in_header and line.startswith("Binary files"):
+            # 二进制文件(如基线截图)没有---/+++行
+            match = re.match(r"Binary files (?:a/(\S+)|/dev/null) and (?:b/(\S+)|/dev/null) differ", line)
+            if match:
+                changes.setdefault(match.group(2) or match.group(1), []).append((1, float("inf")))
+        elif line.startswith("@@") and path is not None:
+            in_header = False
+            match = _HUNK.match(line)
+            if match:
+                start, count = int(match.group(1)), int(match.group(2) or 1)
+                # 纯删除的块记为删除位置前后两行
+                changes[path].append((start, start + count - 1) if count else (start, start + 1))
+    return changes
+
+
+def changed_data_keys(rev, root, name=TEST_DATA_FILE):
+    """test_data.json中值发生变化的顶层键，无法解析时返回None"""
+    try:
+        old = json.loads(_git(["show", f"{rev}:{name}"], root))
+    except RuntimeError:
+        old = {}
+    except json.JSONDecodeError:
+        return None
+    try:
+        with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+            new = json.load(f)
+    except FileNotFoundError:
+        new = {}
+    except json.JSONDecodeError:
+        return None
+    return {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+
+
+def _source_range(func, root):
+    """函数所在文件(相对于仓库根目录)和行范围"""
+    try:
+        lines, start = inspect.getsourcelines(func)
+        path = inspect.getsourcefile(func)
+    except (OSError, TypeError):
+        return None
+    return os.path.relpath(path, root), start, start + len(lines) - 1
+
+
+def _overlaps(ranges, start, end):
+    return any(a <= end and start <= b for a, b in ranges)
+
+
+def _fixture_ranges(item, names, root):
+    """测试用到的fixture的定义位置 {fixture名称: [(文件, 起始行, 结束行)]}"""
+    manager = item.session._fixturemanager
+    ranges = {}
+    for name in names:
+        for fixturedef in manager.getfixturedefs(name, item.nodeid) or ():
+            found = _source_range(fixturedef.func, root)
+            if found:
+                ranges.setdefault(name, []).append(found)
+    return ranges
+
+
+def _data_sources(item):
+    """测试通过data_source标记引用的数据文件(test_data.json按键单独处理)"""
+    paths = {mark.args[0].partition("#")[0] for mark in item.iter_markers("data_source")}
+    paths.discard(TEST_DATA_FILE)
+    return paths
+
+
+def affected_tests(items, impact, root, changes=None, data_keys=None, url_patterns=()):
+    """
+    选出受影响的测试
+
+    Args:
+        items: 收集到的测试项
+        impact: 影响图(load_map的返回值)
+        root: 仓库根目录
+        changes: changed_lines的返回值，为None时只按URL选择
+        data_keys: changed_data_keys的返回值
+        url_patterns: 变更的页面路径或URL，支持通配符
+
+    Returns:
+        {nodeid: 选中原因}
+    """
+    url_patterns = [url_path(p) if "://" in p else p for p in url_patterns]
+    changes = changes or {}
+    reasons = {}
+
+    # 每个测试的文件、函数范围和fixture范围
+    info = {}
+    for item in items:
+        nodeid = item.nodeid.split("@")[0]
+        record = impact.get(nodeid)
+        names = set(item.fixturenames) | set(record["fixtures"] if record else ())
+        info[nodeid] = (record, _source_range(item.function, root), _fixture_ranges(item, names, root),
+                        _data_sources(item))
+
+    # 被修改的行中，不在任何测试函数或fixture内的部分需要按文件处理
+    known = {}
+    for _, function, fixtures, _ in info.values():
+        for path, start, end in filter(None, [function] + [r for rs in fixtures.values() for r in rs]):
+            known.setdefault(path, set()).add((start, end))
+    test_files = {function[0] for _, function, _, _ in info.values() if function}
+    source_files = {path for _, _, _, sources in info.values() for path in sources}
+
+    file_wide = set()
+    outside_tests = []
+    for path, ranges in changes.items():
+        if path == TEST_DATA_FILE or any(fnmatch.fnmatch(os.path.basename(path), p) or path == p
+                                         for p in IGNORED_PATTERNS):
+            continue
+        if path in source_files or any(path.startswith(prefix) for prefix in DATA_FILE_FIXTURES):
+            continue
+        covered = all(
+            any(a <= start and end <= b for a, b in known.get(path, ())) for start, end in ranges
+        )
+        if not covered:
+            if path in test_files:
+                file_wide.add(path)
+            else:
+                outside_tests.append(path)
+
+    data_fixtures = {
+        fixture: prefix for prefix, fixture in DATA_FILE_FIXTURES.items()
+        if any(path.startswith(prefix) for path in changes)
+    }
+    if data_keys is None and TEST_DATA_FILE in changes:
+        # 解析失败，按整个文件变化处理
+        data_fixtures["test_data"] = TEST_DATA_FILE
+
+    for nodeid, (record, function, fixtures, sources) in info.items():
+        changed_sources = sorted(sources & set(changes))
+        if record is None:
+            reasons[nodeid] = "影响图中没有记录"
+        elif changed_sources:
+            reasons[nodeid] = f"数据源 {', '.join(changed_sources)} 已修改"
+        elif outside_tests:
+            reasons[nodeid] = "修改了测试以外的文件: " + ", ".join(sorted(outside_tests)[:3])
+        elif function and function[0] in file_wide:
+            reasons[nodeid] = f"{function[0]} 的模块级代码已修改"
+        elif function and _overlaps(changes.get(function[0], ()), function[1], function[2]):
+            reasons[nodeid] = "测试函数已修改"
+        else:
+            for name, ranges in fixtures.items():
+                if any(_overlaps(changes.get(path, ()), start, end) for path, start, end in ranges):
+                    reasons[nodeid] = f"fixture {name} 已修改"
+                    break
+                if name in data_fixtures:
+                    reasons[nodeid] = f"{data_fixtures[name]} 已修改"
+                    break
+            else:
+                keys = sorted(set(record["data"]) & (data_keys or set()))
+                urls = [u for u in record["urls"] if any(fnmatch.fnmatch(u, p) for p in url_patterns)]
+                if keys:
+                    reasons[nodeid] = f"{TEST_DATA_FILE} 的 {', '.join(keys)} 已修改"
+                elif urls:
+                    reasons[nodeid] = f"页面已修改: {', '.join(urls[:3])}"
+    return reasons
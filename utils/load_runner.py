@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+负载测试
+
+把功能检查作为虚拟用户反复执行:
+- HTTP虚拟用户: 每个用户是一个asyncio协程，循环访问首页和首页链接到的站内页面，
+  并做与 test_api_basic_check 相同的检查(状态码200、HTML内容)；
+  请求经过APIClient的异步接口和连接池，不重试，失败如实计入错误率；
+- 浏览器虚拟用户: 数量较少，用浏览器池中的无头Chrome重放真实的页面加载，记录Navigation Timing的load时间。
+
+延迟按对数分桶统计(相对误差约1%)，内存占用与请求数无关。
+每隔interval秒把各场景的吞吐量、错误率和p50/p95/p99写入结果事件流并打印，
+结束时与 perf_budgets.json 中的 load 预算比较，超出预算时退出码为1。
+
+使用方法:
+    python -m utils.load_runner --users 200 --duration 10m --browsers 2
+    python -m utils.load_runner --target replica --users 50 --duration 30s --browsers 0
+    python run_tests.py --type load --users 200 --duration 10m
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from selenium.common.exceptions import WebDriverException
+
+from utils.api_client import APIClient
+from utils.driver_pool import DriverPool, chrome_factory
+from utils.driver_resolver import resolve_driver_path
+from utils.page_metrics import DEFAULT_BUDGETS_FILE, collect_metrics, load_budgets
+from utils.replica_server import DEFAULT_SNAPSHOT_DIR, LIVE_BASE_URL, ReplicaServer
+from utils.result_sink import DEFAULT_STREAM_PATH, ResultSink
+
+
+# 浏览器虚拟用户记录在这个场景名下
+BROWSER_SCENARIO = "browser_load"
+
+# 最多使用多少个站内链接
+MAX_LINKS = 50
+
+_ANCHOR_HREF = re.compile(r'<a\s[^>]*?href=["\']([^"\'#]+)', re.IGNORECASE)
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)([smh]?)$")
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600}
+
+
+class CheckFailed(Exception):
+    """响应没有通过功能检查"""
+
+
+def parse_duration(text):
+    """'90'、'30s'、'10m'、'1h' -> 秒"""
+    match = _DURATION.match(str(text).strip().lower())
+    if not match:
+        raise ValueError(f"无法解析的时长: {text}")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+class LatencyHistogram:
+    """对数分桶的延迟直方图，相对误差约1%"""
+
+    BASE = 1.01
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, seconds):
+        ms = max(seconds * 1000, 0.001)
+        self.buckets[math.floor(math.log(ms, self.BASE))] += 1
+        self.count += 1
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        """分位数(毫秒)，没有样本时为None"""
+        if not self.count:
+            return None
+        rank = self.count * p / 100
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.BASE ** (bucket + 0.5), self.max)
+        return self.max
+
+
+class LoadStats:
+    """各场景的延迟、吞吐量和错误，HTTP协程和浏览器线程共用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = self._window_started = time.monotonic()
+        self._total = {}
+        self._window = {}
+
+    def record(self, name, elapsed, error=None):
+        with self._lock:
+            for scope in (self._total, self._window):
+                entry = scope.setdefault(name, {"latency": LatencyHistogram(), "errors": Counter()})
+                entry["latency"].add(elapsed)
+                if error:
+                    entry["errors"][error] += 1
+
+    def window(self):
+        """自上次调用以来的统计，之后开始新的窗口"""
+        with self._lock:
+            window, self._window = self._window, {}
+            seconds = time.monotonic() - self._window_started
+            self._window_started = time.monotonic()
+        return {name: _summarize(entry, seconds) for name, entry in sorted(window.items())}
+
+    def totals(self):
+        """整个运行的统计"""
+        with self._lock:
+            seconds = time.monotonic() - self._started
+            return {name: _summarize(entry, seconds) for name, entry in sorted(self._total.items())}
+
+
+def _summarize(entry, seconds):
+    latency, errors = entry["latency"], entry["errors"]
+    failed = sum(errors.values())
+    return {
+        "requests": latency.count,
+        "errors": failed,
+        "error_rate": failed / latency.count if latency.count else 0.0,
+        "rps": latency.count / seconds if seconds > 0 else 0.0,
+        "p50": latency.percentile(50),
+        "p95": latency.percentile(95),
+        "p99": latency.percentile(99),
+        "max": latency.max,
+        "top_errors": errors.most_common(3),
+    }
+
+
+def format_stats(elapsed, stats):
+    """每个场景一行"""
+    lines = []
+    for name, s in stats.items():
+        lines.append(
+            f"[{elapsed:6.0f}s] {name:<14} {s['rps']:7.1f} req/s  错误 {s['error_rate']:6.2%}  "
+            f"p50 {s['p50'] or 0:6.0f}ms  p95 {s['p95'] or 0:6.0f}ms  p99 {s['p99'] or 0:6.0f}ms"
+        )
+    return "\n".join(lines)
+
+
+def check_load_budgets(totals, budgets):
+    """
+    与负载预算比较
+
+    Args:
+        budgets: {"p95_ms", "p99_ms", "error_rate"}，也可以按场景名分别配置 {场景: {...}}
+
+    Returns:
+        超出预算的描述列表
+    """
+    violations = []
+    for name, stats in totals.items():
+        limits = budgets.get(name, budgets)
+        for key, stat in (("p95_ms", "p95"), ("p99_ms", "p99")):
+            if key in limits and stats[stat] is not None and stats[stat] > limits[key]:
+                violations.append(f"{name} {stat} = {stats[stat]:.0f}ms，超出预算 {limits[key]}ms")
+        if "error_rate" in limits and stats["error_rate"] > limits["error_rate"]:
+            violations.append(f"{name} 错误率 {stats['error_rate']:.2%}，超出预算 {limits['error_rate']:.2%}")
+    return violations
+
+
+def check_html(response):
+    """与 test_api_basic_check 相同的检查"""
+    if response.status_code != 200:
+        raise CheckFailed(f"HTTP {response.status_code}")
+    content_type = response.headers.get("content-type", "")
+    if "html" not in content_type.lower():
+        raise CheckFailed(f"内容类型错误: {content_type}")
+
+
+def discover_links(client, base_url, limit=MAX_LINKS, served=None):
+    """
+    首页上<a>链接到的站内页面
+
+    Args:
+        served: 可选，判断站点能否提供某个路径的函数，只使用能提供的页面；
+                本地镜像只保存了首页及其资源，首页上的其他页面链接在镜像中都是404
+    """
+    homepage = client.get("")
+    check_html(homepage)
+    links = {urljoin(base_url, href) for href in _ANCHOR_HREF.findall(homepage.text)}
+    links = sorted(url for url in links if url.startswith(base_url) and url.rstrip("/") != base_url)
+    if served is not None:
+        links = [url for url in links if served(_path_of(url))]
+    return links[:limit]
+
+
+def _path_of(url):
+    parts = urlsplit(url)
+    return f"{parts.path or '/'}?{parts.query}" if parts.query else parts.path or "/"
+
+
+async def _timed_get(client, stats, name, endpoint):
+    started = time.perf_counter()
+    try:
+        check_html(await client.aget(endpoint))
+    except CheckFailed as e:
+        stats.record(name, time.perf_counter() - started, str(e))
+    except requests.RequestException as e:
+        stats.record(name, time.perf_counter() - started, type(e).__name__)
+    else:
+        stats.record(name, time.perf_counter() - started)
+
+
+async def _http_user(client, stats, links, start_delay, deadline, think_time, rng):
+    """一个HTTP虚拟用户: 打开首页，再打开一个站内页面"""
+    await asyncio.sleep(start_delay)
+    while time.monotonic() < deadline:
+        await _timed_get(client, stats, "homepage", "")
+        if links and time.monotonic() < deadline:
+            await _timed_get(client, stats, "page", rng.choice(links))
+        if think_time:
+            await asyncio.sleep(think_time * rng.uniform(0.5, 1.5))
+
+
+def _browser_user(pool, stats, urls, start_delay, deadline, think_time, rng):
+    """一个浏览器虚拟用户: 重放真实的页面加载"""
+    time.sleep(start_delay)
+    with pool.lease() as driver:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                driver.get(rng.choice(urls))
+                load = collect_metrics(driver)["load"]
+            except WebDriverException as e:
+                stats.record(BROWSER_SCENARIO, time.perf_counter() - started, type(e).__name__)
+            else:
+                elapsed = load / 1000 if load else time.perf_counter() - started
+                stats.record(BROWSER_SCENARIO, elapsed)
+            if think_time:
+                time.sleep(think_time * rng.uniform(0.5, 1.5))
+
+
+async def _report(stats, sink, started, interval, stop):
+    """每隔interval秒输出一个窗口的统计"""
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        window = stats.window()
+        if not window:
+            continue
+        elapsed = time.monotonic() - started
+        print(format_stats(elapsed, window), flush=True)
+        if sink is not None:
+            sink.write("load_stats", elapsed=round(elapsed, 1), scenarios=window)
+
+
+async def _run_http(client, stats, links, users, duration, ramp_up, think_time, interval, sink, seed):
+    started = time.monotonic()
+    deadline = started + duration
+    stop = asyncio.Event()
+    reporter = asyncio.create_task(_report(stats, sink, started, interval, stop))
+    await asyncio.gather(*(
+        _http_user(client, stats, links, ramp_up * i / max(users, 1), deadline, think_time,
+                   random.Random(seed + i))
+        for i in range(users)
+    ))
+    stop.set()
+    await reporter
+
+
+def run_load(base_url, users=10, duration=60, browsers=0, ramp_up=None, think_time=1.0,
+             interval=10, sink=None, driver_path=None, seed=0, served=None):
+    """
+    运行负载测试
+
+    Args:
+        base_url: 被测站点
+        users: HTTP虚拟用户数
+        duration: 持续时间(秒)
+        browsers: 浏览器虚拟用户数
+        ramp_up: 在多少秒内逐步启动全部用户，默认为持续时间的1/10(最多60秒)
+        think_time: 每次迭代之间的平均等待(秒)
+        interval: 统计输出间隔(秒)
+        sink: utils.result_sink.ResultSink，统计写入结果事件流
+        driver_path: ChromeDriver路径
+        served: 可选，判断站点能否提供某个路径的函数，见discover_links
+
+    Returns:
+        各场景的总体统计
+    """
+    if ramp_up is None:
+        ramp_up = min(duration / 10, 60)
+    stats = LoadStats()
+    client = APIClient(base_url, pool_size=max(users, 1), retries=0, keep_latencies=False)
+    links = discover_links(client, base_url, served=served)
+    if sink is not None:
+        sink.write("load_start", base_url=base_url, users=users, browsers=browsers,
+                   duration=duration, links=len(links))
+
+    pool = None
+    threads = []
+    if browsers:
+        pool = DriverPool(chrome_factory(driver_path or resolve_driver_path()), size=browsers)
+        pool.warm_up()
+        deadline = time.monotonic() + duration
+        for i in range(browsers):
+            thread = threading.Thread(
+                target=_browser_user,
+                args=(pool, stats, [base_url] + links, ramp_up * i / browsers, deadline, think_time,
+                      random.Random(seed - i - 1)),
+                daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+
+    try:
+        asyncio.run(_run_http(client, stats, links, users, duration, ramp_up, think_time, interval, sink, seed))
+        for thread in threads:
+            thread.join()
+    finally:
+        client.close()
+        if pool is not None:
+            pool.close()
+
+    totals = stats.totals()
+    if sink is not None:
+        sink.write("load_summary", scenarios=totals)
+    return totals
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="尼康网站负载测试")
+    parser.add_argument("--users", type=int, default=10, help="HTTP虚拟用户数 (默认: 10)")
+    parser.add_argument("--duration", default="1m", help="持续时间，如 30s、10m、1h (默认: 1m)")
+    parser.add_argument("--browsers", type=int, default=2, help="浏览器虚拟用户数，0为不使用浏览器 (默认: 2)")
+    parser.add_argument("--ramp-up", default=None, help="逐步启动全部用户的时长 (默认: 持续时间的1/10)")
+    parser.add_argument("--think-time", type=float, default=1.0, help="每次迭代之间的平均等待秒数 (默认: 1)")
+    parser.add_argument("--interval", type=float, default=10, help="统计输出间隔秒数 (默认: 10)")
+    parser.add_argument("--base-url", default=None, help="被测站点 (默认: 线上站点)")
+    parser.add_argument("--target", choices=["live", "replica"], default="live",
+                        help="replica为在本地启动镜像服务器作为被测站点 (默认: live)")
+    parser.add_argument("--replica-dir", default=DEFAULT_SNAPSHOT_DIR, help="本地镜像快照目录")
+    parser.add_argument("--stream", default=DEFAULT_STREAM_PATH, help="结果事件流文件，空字符串表示不写")
+    parser.add_argument("--budgets", default=DEFAULT_BUDGETS_FILE, help="性能预算文件，使用其中的load")
+    parser.add_argument("--driver-path", default=None, help="ChromeDriver路径")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url or LIVE_BASE_URL
+    if args.target == "replica":
+        try:
+            server = ReplicaServer(args.replica_dir).start()
+        except FileNotFoundError as e:
+            print(e, file=sys.stderr)
+            return 1
+        base_url = server.url
+    sink = ResultSink(args.stream) if args.stream else None
+
+    duration = parse_duration(args.duration)
+    ramp_up = parse_duration(args.ramp_up) if args.ramp_up else None
+    print(f"负载测试: {base_url}，HTTP用户 {args.users}，浏览器 {args.browsers}，持续 {duration:.0f}秒")
+    try:
+        totals = run_load(base_url, args.users, duration, args.browsers, ramp_up, args.think_time,
+                          args.interval, sink, args.driver_path,
+                          served=server.serves if server is not None else None)
+    except (CheckFailed, requests.RequestException) as e:
+        print(f"无法访问被测站点: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if sink is not None:
+            sink.close()
+        if server is not None:
+            server.stop()
+
+    print("\n总计:")
+    print(format_stats(duration, totals))
+    for name, stats in totals.items():
+        for error, count in stats["top_errors"]:
+            print(f"  {name} 错误 {count}次: {error}")
+
+    violations = check_load_budgets(totals, load_budgets(args.budgets).get("load", {}))
+    if violations:
+        print("\n超出负载预算:\n" + "\n".join(violations))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+定位器索引
+
+页面对象中的每个元素有一组按优先级排列的定位策略(CSS、链接文字、XPath等)。
+网站改版后靠前的策略可能失效，逐个尝试时每次未命中都要等满隐式等待(5-10秒)。
+索引记录每个页面、每个前端版本上一次命中的策略:
+- 查找时关闭隐式等待，先试上次命中的策略，未命中才按顺序尝试其余策略；
+- 元素尚未出现时整组策略一起轮询直到超时，不会因为某个策略未命中而单独等待；
+- 学到的结果保存在 reports/locator_index.json，下次运行直接使用。
+前端版本由页面引用的同源脚本和样式表地址计算(构建产物的文件名通常带内容哈希)，
+新版本还没有记录时先使用该页面最近一个版本的结果。
+
+使用方法:
+    python -m utils.locator_index show                 # 查看索引
+    python -m utils.locator_index show --page home
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from selenium.common.exceptions import NoSuchElementException
+
+from utils.waits import POLL_INTERVAL, no_implicit_wait
+
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INDEX_PATH = os.path.join(_ROOT, "reports", "locator_index.json")
+
+# 每个页面保留最近几个前端版本的记录
+MAX_BUILDS = 5
+
+_BUILD_SCRIPT = """
+var urls = Array.prototype.map.call(
+    document.querySelectorAll('script[src], link[rel="stylesheet"][href]'),
+    function (e) { return e.src || e.href; }
+).filter(function (url) { return url.indexOf(location.origin + '/') === 0; });
+return urls.sort().join('\\n');
+"""
+
+
+def strategy_key(by, value):
+    """定位策略在索引中的写法，如 "css selector=nav" """
+    return f"{by}={value}"
+
+
+def page_build(driver):
+    """当前页面的前端版本标识"""
+    urls = driver.execute_script(_BUILD_SCRIPT)
+    return hashlib.sha1(urls.encode("utf-8")).hexdigest()[:12] if urls else "unknown"
+
+
+def load_index(path=DEFAULT_INDEX_PATH):
+    """读取索引 {页面: {版本: {"seen", "elements": {元素: 策略}}}}，文件不存在时为空"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+class LocatorIndex:
+    """按页面和前端版本记录命中的定位策略"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        """
+        Args:
+            path: 索引文件，为None时只在内存中记录
+        """
+        self.path = path
+        self.entries = load_index(path) if path else {}
+        self.stats = {"hits": 0, "fallbacks": 0, "misses": 0}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def preferred(self, page, build, element):
+        """上次命中的策略，当前版本没有记录时使用最近一个版本的"""
+        builds = self.entries.get(page, {})
+        if element in builds.get(build, {}).get("elements", {}):
+            return builds[build]["elements"][element]
+        for entry in sorted(builds.values(), key=lambda e: e["seen"], reverse=True):
+            if element in entry["elements"]:
+                return entry["elements"][element]
+        return None
+
+    def remember(self, page, build, element, key):
+        with self._lock:
+            entry = self.entries.setdefault(page, {}).setdefault(build, {"seen": None, "elements": {}})
+            if (page, build) not in self._dirty or entry["elements"].get(element) != key:
+                entry["seen"] = datetime.now().isoformat(timespec="seconds")
+                entry["elements"][element] = key
+                self._dirty.add((page, build))
+
+    def ordered(self, page, build, element, strategies):
+        """上次命中的策略排在最前面，其余保持原有顺序"""
+        key = self.preferred(page, build, element)
+        first = [s for s in strategies if strategy_key(*s) == key]
+        return first + [s for s in strategies if strategy_key(*s) != key]
+
+    def find(self, driver, page, build, element, strategies, timeout=0, multiple=False, params=None):
+        """
+        按索引顺序查找元素
+
+        Args:
+            strategies: [(By, 值)]，值中可以有 {名称} 占位符，由params填充
+            timeout: 所有策略都未命中时继续轮询的时间(秒)
+            multiple: 返回全部匹配的元素列表(找不到时为空列表)，否则返回第一个
+
+        Raises:
+            NoSuchElementException: multiple为False且超时后仍未找到
+        """
+        ordered = self.ordered(page, build, element, strategies)
+        deadline = time.monotonic() + timeout
+        with no_implicit_wait(driver):
+            while True:
+                for position, (by, value) in enumerate(ordered):
+                    found = driver.find_elements(by, value.format(**params) if params else value)
+                    if found:
+                        self._count("hits" if position == 0 else "fallbacks")
+                        self.remember(page, build, element, strategy_key(by, value))
+                        return found if multiple else found[0]
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(POLL_INTERVAL)
+
+        self._count("misses")
+        if multiple:
+            return []
+        tried = ", ".join(strategy_key(by, value) for by, value in ordered)
+        raise NoSuchElementException(f"{page}.{element}: 所有定位策略均未找到元素 ({tried})")
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def save(self):
+        """把本次学到的结果合并到索引文件(并行运行时各进程分别合并)"""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            merged = load_index(self.path)
+            for page, build in self._dirty:
+                ours = self.entries[page][build]
+                entry = merged.setdefault(page, {}).setdefault(build, {"seen": None, "elements": {}})
+                entry["seen"] = max(filter(None, [entry["seen"], ours["seen"]]))
+                entry["elements"].update(ours["elements"])
+            for page, builds in merged.items():
+                for build in sorted(builds, key=lambda b: builds[b]["seen"], reverse=True)[MAX_BUILDS:]:
+                    del builds[build]
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(merged, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(temp, self.path)
+            self._dirty.clear()
+
+
+def format_index(index, page=None):
+    lines = []
+    for name in sorted(index):
+        if page and name != page:
+            continue
+        builds = index[name]
+        for build in sorted(builds, key=lambda b: builds[b]["seen"], reverse=True):
+            entry = builds[build]
+            lines.append(f"{name}  版本 {build}  最近使用 {entry['seen']}")
+            for element, key in sorted(entry["elements"].items()):
+                lines.append(f"    {element:<20} {key}")
+    return "\n".join(lines)
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="定位器索引")
+    parser.add_argument("command", choices=["show"], help="show: 查看各页面命中的定位策略")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="索引文件")
+    parser.add_argument("--page", default=None, help="只显示该页面")
+    args = parser.parse_args()
+
+    text = format_index(load_index(args.index), args.page)
+    if not text:
+        print("索引为空")
+        return 1
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
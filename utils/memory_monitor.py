@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+浏览器内存监控
+
+浏览器在池中被多个测试复用，长时间运行时Chrome的内存会持续增长。
+每个测试借出浏览器时(空闲状态)和测试结束时各采样一次，差值记在该测试名下：
+- JS堆和DOM节点数: CDP Performance.getMetrics，采样前先触发一次垃圾回收，只统计仍被引用的对象；
+- 进程内存: chromedriver及其全部子进程(Chrome主进程、渲染进程、GPU进程等)的RSS之和，
+  读取 /proc，共享内存会被重复计算，适合看趋势而不是绝对值。
+测试结束时浏览器进程内存超过上限会被回收，下一个测试拿到新的浏览器。
+
+使用方法:
+    python -m utils.memory_monitor report              # 最近一次运行中内存增长最多的测试
+    python -m utils.memory_monitor report --top 50 --run <运行id>
+"""
+
+import argparse
+import os
+import weakref
+
+from selenium.common.exceptions import WebDriverException
+from urllib3.exceptions import HTTPError
+
+from utils.result_sink import DEFAULT_STREAM_PATH, iter_tests, last_run
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_MB = 1024 * 1024
+
+DEFAULT_LIMIT_MB = 1536
+
+# Performance.getMetrics中记录的指标
+_METRICS = {
+    "JSHeapUsedSize": "js_heap_used",
+    "JSHeapTotalSize": "js_heap_total",
+    "Nodes": "dom_nodes",
+    "Documents": "documents",
+    "JSEventListeners": "listeners",
+}
+
+_enabled = weakref.WeakSet()
+
+
+def _parent_pids():
+    """{pid: 父进程pid}，无法读取/proc时为空"""
+    parents = {}
+    try:
+        names = os.listdir("/proc")
+    except OSError:
+        return parents
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "r") as f:
+                # 进程名可能包含空格和括号，从最后一个右括号之后解析
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        parents[int(name)] = int(fields[1])
+    return parents
+
+
+def process_tree(pid):
+    """pid及其全部子孙进程"""
+    children = {}
+    for child, parent in _parent_pids().items():
+        children.setdefault(parent, []).append(child)
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, ()))
+    return tree
+
+
+def rss_bytes(pid):
+    """进程的常驻内存，进程已退出时为0"""
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def process_memory(driver):
+    """
+    chromedriver和浏览器进程的内存
+
+    Returns:
+        {"driver_rss", "browser_rss", "processes"}，无法定位进程时为空字典
+    """
+    service = getattr(driver, "service", None)
+    process = getattr(service, "process", None)
+    if process is None or not os.path.isdir(f"/proc/{process.pid}"):
+        return {}
+    tree = process_tree(process.pid)
+    return {
+        "driver_rss": rss_bytes(process.pid),
+        "browser_rss": sum(rss_bytes(pid) for pid in tree[1:]),
+        "processes": len(tree),
+    }
+
+
+def sample(driver, collect_garbage=True):
+    """
+    采样当前页面和浏览器进程的内存
+
+    Returns:
+        {"js_heap_used", "js_heap_total", "dom_nodes", "documents", "listeners",
+         "driver_rss", "browser_rss", "processes"}
+    """
+    if driver not in _enabled:
+        driver.execute_cdp_cmd("Performance.enable", {})
+        driver.execute_cdp_cmd("HeapProfiler.enable", {})
+        _enabled.add(driver)
+    if collect_garbage:
+        driver.execute_cdp_cmd("HeapProfiler.collectGarbage", {})
+    metrics = driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+    result = {_METRICS[m["name"]]: int(m["value"]) for m in metrics if m["name"] in _METRICS}
+    result.update(process_memory(driver))
+    return result
+
+
+def safe_sample(driver, collect_garbage=True):
+    """sample()，浏览器已崩溃或chromedriver无法连接时返回None"""
+    try:
+        return sample(driver, collect_garbage)
+    except (WebDriverException, HTTPError, ConnectionError):
+        return None
+
+
+def compare(before, after, session=None):
+    """
+    测试前后两次采样的对比 {"session", "before", "after", "growth"}
+
+    Args:
+        session: 浏览器的会话id，用于统计同一个浏览器空闲内存的变化趋势
+    """
+    return {
+        "session": session,
+        "before": before,
+        "after": after,
+        "growth": {key: after[key] - before[key] for key in after if key in before},
+    }
+
+
+def total_rss(memory):
+    """chromedriver和浏览器进程的内存之和"""
+    return memory.get("driver_rss", 0) + memory.get("browser_rss", 0)
+
+
+def over_limit(memory, limit_mb=DEFAULT_LIMIT_MB):
+    """浏览器进程内存是否超过上限"""
+    return bool(limit_mb) and total_rss(memory) > limit_mb * _MB
+
+
+def format_report(records, top=20):
+    """
+    内存增长最多的测试
+
+    Args:
+        records: {nodeid: compare()的返回值，可带"recycled"}
+    """
+    ranked = sorted(
+        records.items(),
+        key=lambda kv: (kv[1]["growth"].get("browser_rss", 0), kv[1]["growth"].get("js_heap_used", 0)),
+        reverse=True
+    )
+    lines = [f"{'RSS增长':>10} {'RSS':>9} {'JS堆增长':>10} {'DOM节点':>8}  测试"]
+    for nodeid, record in ranked[:top]:
+        growth, after = record["growth"], record["after"]
+        mark = "  [已回收]" if record.get("recycled") else ""
+        lines.append(
+            f"{growth.get('browser_rss', 0) / _MB:+9.1f}M {total_rss(after) / _MB:8.0f}M "
+            f"{growth.get('js_heap_used', 0) / _MB:+9.1f}M {after.get('dom_nodes', 0):8d}  {nodeid}{mark}"
+        )
+
+    # 同一个浏览器每次借出时都处于空闲状态，空闲内存持续上升说明有泄漏
+    idle = {}
+    for record in records.values():
+        if record.get("session"):
+            idle.setdefault(record["session"], []).append(total_rss(record["before"]))
+    trends = sorted(
+        ((samples[-1] - samples[0], len(samples), session) for session, samples in idle.items() if len(samples) > 1),
+        reverse=True
+    )
+    if trends:
+        lines.append("浏览器空闲内存变化(首次借出 -> 最后一次借出):")
+        for growth, uses, session in trends[:5]:
+            lines.append(f"{growth / _MB:+9.1f}M  {uses}个测试  会话 {session}")
+
+    recycled = sum(1 for record in records.values() if record.get("recycled"))
+    if recycled:
+        lines.append(f"超过内存上限被回收的浏览器: {recycled} 个")
+    return "\n".join(lines)
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="浏览器内存监控报告")
+    parser.add_argument("command", choices=["report"], help="report: 内存增长最多的测试")
+    parser.add_argument("--stream", default=DEFAULT_STREAM_PATH, help="结果事件流文件")
+    parser.add_argument("--run", default=None, help="运行id (默认: 最近一次)")
+    parser.add_argument("--top", type=int, default=20, help="显示多少个测试 (默认: 20)")
+    args = parser.parse_args()
+
+    run = args.run or last_run(args.stream)
+    records = {
+        test["nodeid"]: test["properties"]["memory"]
+        for test in iter_tests(args.stream, run)
+        if "memory" in test["properties"]
+    }
+    if not records:
+        print(f"运行 {run} 中没有内存采样")
+        return 1
+    print(f"运行 {run} 中内存增长最多的测试:")
+    print(format_report(records, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+网络瀑布图分析
+
+把Chrome性能日志(driver.get_log('performance'))中的Network事件流逐条解析为请求记录，
+再汇总为页面重量指标：总字节数、请求数、关键路径长度和最大的资源。
+
+每条请求记录是一个普通字典:
+    url, method, type, status, mime_type, size(传输字节数), cache_hit, failed, error,
+    start/end(相对第一条请求的毫秒), duration, ttfb, initiator
+"""
+
+from utils import perf_log
+from utils.waits import wait_for_page_settled
+
+
+class NetworkLogParser:
+    """Network事件的流式解析器，请求完成(或失败)时产出记录"""
+
+    def __init__(self):
+        self._pending = {}
+        self._origin = None
+
+    def feed(self, entry):
+        """
+        处理一条性能日志
+
+        Returns:
+            本条日志使之完成的请求记录列表(通常为0或1条)
+        """
+        method, params = perf_log.parse(entry)
+        if not method or not method.startswith("Network."):
+            return []
+
+        request_id = params.get("requestId")
+        timestamp = params.get("timestamp")
+        if timestamp is not None and self._origin is None:
+            self._origin = timestamp
+
+        finished = []
+        if method == "Network.requestWillBeSent":
+            previous = self._pending.pop(request_id, None)
+            if previous is not None and "redirectResponse" in params:
+                # 重定向: 上一跳以重定向响应结束，同一个requestId继续下一跳
+                self._apply_response(previous, params["redirectResponse"])
+                finished.append(self._finish(previous, timestamp))
+            request = params.get("request", {})
+            self._pending[request_id] = {
+                "url": request.get("url"),
+                "method": request.get("method"),
+                "type": params.get("type"),
+                "status": None,
+                "mime_type": None,
+                "size": 0,
+                "cache_hit": False,
+                "failed": False,
+                "error": None,
+                "start": self._ms(timestamp),
+                "end": None,
+                "duration": None,
+                "ttfb": None,
+                "initiator": _initiator_url(params.get("initiator", {})),
+            }
+            return finished
+
+        record = self._pending.get(request_id)
+        if record is None:
+            return finished
+
+        if method == "Network.responseReceived":
+            self._apply_response(record, params.get("response", {}))
+            if params.get("type"):
+                record["type"] = params["type"]
+        elif method == "Network.requestServedFromCache":
+            record["cache_hit"] = True
+        elif method == "Network.dataReceived":
+            record["size"] += params.get("encodedDataLength", 0)
+        elif method == "Network.loadingFinished":
+            # encodedDataLength为整个响应在线上的字节数，比dataReceived累计值更准确
+            record["size"] = params.get("encodedDataLength", record["size"])
+            finished.append(self._finish(self._pending.pop(request_id), timestamp))
+        elif method == "Network.loadingFailed":
+            record["failed"] = True
+            record["error"] = params.get("errorText")
+            finished.append(self._finish(self._pending.pop(request_id), timestamp))
+        return finished
+
+    def pending(self):
+        """尚未完成的请求记录"""
+        return list(self._pending.values())
+
+    def _ms(self, timestamp):
+        if timestamp is None or self._origin is None:
+            return None
+        return (timestamp - self._origin) * 1000
+
+    def _apply_response(self, record, response):
+        record["status"] = response.get("status")
+        record["mime_type"] = response.get("mimeType")
+        if response.get("fromDiskCache") or response.get("fromPrefetchCache") \
+                or response.get("fromServiceWorker"):
+            record["cache_hit"] = True
+        timing = response.get("timing")
+        if timing:
+            record["ttfb"] = timing.get("receiveHeadersEnd")
+
+    def _finish(self, record, timestamp):
+        record["end"] = self._ms(timestamp)
+        if record["start"] is not None and record["end"] is not None:
+            record["duration"] = record["end"] - record["start"]
+        return record
+
+
+def _initiator_url(initiator):
+    """请求发起者的URL(解析器或脚本)"""
+    if initiator.get("url"):
+        return initiator["url"]
+    frames = initiator.get("stack", {}).get("callFrames", [])
+    return frames[0].get("url") if frames else None
+
+
+def parse_network_log(entries):
+    """解析一组性能日志，返回全部已完成的请求记录"""
+    parser = NetworkLogParser()
+    records = []
+    for entry in entries:
+        records.extend(parser.feed(entry))
+    return records
+
+
+def capture_page_load(driver, url, cold=True):
+    """
+    加载页面并返回这次导航产生的请求记录
+
+    Args:
+        cold: 加载前清空浏览器缓存，统计首次访问的页面重量
+    """
+    if cold:
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+    driver.get("about:blank")
+    perf_log.clear(driver)
+    driver.get(url)
+    wait_for_page_settled(driver)
+    return parse_network_log(perf_log.entries(driver))
+
+
+def critical_path(records):
+    """
+    关键路径: 从最晚结束的请求沿发起者链回溯到根请求
+
+    Returns:
+        由根到叶的请求记录列表
+    """
+    finished = [r for r in records if r["end"] is not None]
+    if not finished:
+        return []
+
+    by_url = {}
+    for record in finished:
+        by_url.setdefault(record["url"], record)
+
+    chain = [max(finished, key=lambda r: r["end"])]
+    seen = {id(chain[0])}
+    while True:
+        parent = by_url.get(chain[-1]["initiator"])
+        if parent is None or id(parent) in seen:
+            break
+        chain.append(parent)
+        seen.add(id(parent))
+    return list(reversed(chain))
+
+
+def build_waterfall(records, top=10):
+    """
+    汇总页面重量
+
+    Returns:
+        包含 request_count、total_bytes、cache_hits、failed、by_type、
+        critical_path_ms、critical_path_depth、critical_path、largest 的字典
+    """
+    by_type = {}
+    for record in records:
+        stats = by_type.setdefault(record["type"] or "Other", {"count": 0, "bytes": 0})
+        stats["count"] += 1
+        stats["bytes"] += record["size"]
+
+    path = critical_path(records)
+    if path:
+        critical_path_ms = path[-1]["end"] - path[0]["start"]
+    else:
+        critical_path_ms = 0
+
+    largest = sorted(records, key=lambda r: r["size"], reverse=True)[:top]
+    return {
+        "request_count": len(records),
+        "total_bytes": sum(r["size"] for r in records),
+        "cache_hits": sum(1 for r in records if r["cache_hit"]),
+        "failed": [r["url"] for r in records if r["failed"] or (r["status"] or 0) >= 400],
+        "by_type": by_type,
+        "critical_path_ms": critical_path_ms,
+        "critical_path_depth": len(path),
+        "critical_path": [r["url"] for r in path],
+        "largest": [(r["url"], r["size"]) for r in largest],
+    }
+
+
+def check_page_weight(waterfall, budgets):
+    """
+    与页面重量预算比较
+
+    Args:
+        budgets: {"total_bytes": 上限, "request_count": 上限, "critical_path_ms": 上限}
+
+    Returns:
+        超出预算的描述列表
+    """
+    return [
+        f"{name} = {waterfall[name]:.0f}，超出预算 {limit}"
+        for name, limit in budgets.items()
+        if waterfall.get(name, 0) > limit
+    ]
+
+
+def format_waterfall(waterfall):
+    """格式化为便于阅读的摘要"""
+    lines = [
+        f"请求数: {waterfall['request_count']}  总传输: {waterfall['total_bytes'] / 1024:.1f}KB  "
+        f"缓存命中: {waterfall['cache_hits']}  失败: {len(waterfall['failed'])}",
+        f"关键路径: {waterfall['critical_path_ms']:.0f}ms / {waterfall['critical_path_depth']}跳",
+        "最大的资源:",
+    ]
+    for url, size in waterfall["largest"]:
+        lines.append(f"  {size / 1024:8.1f}KB  {url}")
+    return "\n".join(lines)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+页面加载性能采集
+
+使用浏览器内的 Navigation Timing / Paint Timing / LCP 数据，而不是在Python端
+用time.time()包住driver.get(后者混入了WebDriver往返时间)。
+对冷加载(清空缓存)和热加载分别重复N次，输出分位数并与预算比较。
+"""
+
+import json
+import math
+import os
+
+from utils.waits import wait_for_page_ready
+
+
+METRICS = ("ttfb", "dom_content_loaded", "load", "fcp", "lcp")
+MODES = ("cold", "warm")
+
+DEFAULT_BUDGETS_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "perf_budgets.json"
+)
+
+# 所有时间均为相对导航开始的毫秒数
+_COLLECT_SCRIPT = """
+var done = arguments[arguments.length - 1];
+var nav = performance.getEntriesByType('navigation')[0];
+var fcp = performance.getEntriesByName('first-contentful-paint')[0];
+var result = {
+    ttfb: nav ? nav.responseStart : null,
+    dom_content_loaded: nav ? nav.domContentLoadedEventEnd : null,
+    load: nav ? nav.loadEventEnd : null,
+    fcp: fcp ? fcp.startTime : null,
+    lcp: null
+};
+try {
+    new PerformanceObserver(function (list) {
+        var entries = list.getEntries();
+        if (entries.length) {
+            result.lcp = entries[entries.length - 1].startTime;
+        }
+    }).observe({type: 'largest-contentful-paint', buffered: true});
+} catch (e) {}
+// 缓冲的LCP条目在下一个任务中回调
+setTimeout(function () { done(result); }, 0);
+"""
+
+
+def collect_metrics(driver):
+    """读取当前页面的加载指标 {指标: 毫秒}，浏览器不支持的指标为None"""
+    # loadEventEnd在load事件处理完成后才会写入
+    wait_for_page_ready(driver)
+    driver.execute_async_script(
+        "var done = arguments[arguments.length - 1]; setTimeout(done, 0);"
+    )
+    return driver.execute_async_script(_COLLECT_SCRIPT)
+
+
+def measure_page_load(driver, url, runs=5, mode="cold"):
+    """
+    重复加载页面并采集指标
+
+    Args:
+        url: 页面地址
+        runs: 采样次数
+        mode: cold为每次加载前清空浏览器缓存，warm为先预热一次再采样
+
+    Returns:
+        每次加载的指标列表
+    """
+    if mode not in MODES:
+        raise ValueError(f"未知的加载模式: {mode}")
+
+    if mode == "warm":
+        driver.get(url)
+        wait_for_page_ready(driver)
+
+    samples = []
+    for _ in range(runs):
+        if mode == "cold":
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        # 先离开页面，保证每次都是一次完整的导航
+        driver.get("about:blank")
+        driver.get(url)
+        samples.append(collect_metrics(driver))
+    return samples
+
+
+def percentile(values, p):
+    """线性插值分位数，p取0~100"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = (len(ordered) - 1) * p / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize(samples):
+    """
+    汇总采样结果
+
+    Returns:
+        {指标: {"p50", "p90", "p95", "min", "max", "mean", "n"}}，没有数据的指标不出现
+    """
+    summary = {}
+    for metric in METRICS:
+        values = [s[metric] for s in samples if s.get(metric) is not None]
+        if not values:
+            continue
+        summary[metric] = {
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p95": percentile(values, 95),
+            "min": min(values),
+            "max": max(values),
+            "mean": sum(values) / len(values),
+            "n": len(values),
+        }
+    return summary
+
+
+def load_budgets(path=DEFAULT_BUDGETS_FILE):
+    """读取性能预算配置"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_budgets(summary, budgets, mode):
+    """
+    与预算比较
+
+    Args:
+        summary: summarize()的结果
+        budgets: {指标: {统计量: 毫秒上限}}
+        mode: 加载模式，仅用于生成提示信息
+
+    Returns:
+        超出预算的描述列表，全部达标时为空
+    """
+    violations = []
+    for metric, limits in budgets.items():
+        stats = summary.get(metric)
+        if stats is None:
+            continue
+        for stat, limit in limits.items():
+            if stats[stat] > limit:
+                violations.append(
+                    f"[{mode}] {metric} {stat} = {stats[stat]:.0f}ms，超出预算 {limit}ms"
+                )
+    return violations
+
+
+def format_summary(mode, summary):
+    """格式化为便于阅读的表格"""
+    lines = [f"{mode}加载 (ms)      p50      p90      p95      max"]
+    for metric, stats in summary.items():
+        lines.append(
+            f"  {metric:<18}{stats['p50']:>7.0f}  {stats['p90']:>7.0f}  "
+            f"{stats['p95']:>7.0f}  {stats['max']:>7.0f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+页面加载配置
+
+不需要图片、字体或统计脚本的测试可以用 @pytest.mark.profile("text-only") 选择轻量配置，
+浏览器在加载页面时直接拦截这些请求，减少页面加载时间和带宽：
+- 资源类型(图片、媒体、字体)通过CDP Fetch拦截，请求以BlockedByClient失败，只暂停这几类请求；
+- 第三方统计等URL模式用 Network.setBlockedURLs 在浏览器内部屏蔽，不经过拦截器；
+- 新文档加载时注入样式关闭CSS动画和过渡，并模拟 prefers-reduced-motion。
+
+没有标记的测试使用full配置(不做任何拦截)。浏览器归还到池中时恢复为full配置，
+配置专用的拦截器随之停止，之后的测试不再有任何请求被暂停。
+"""
+
+import weakref
+
+from utils.cdp_fetch import Fail, FetchInterceptor, interceptor_for
+
+
+# 第三方统计和广告
+ANALYTICS_PATTERNS = (
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*hm.baidu.com*",
+    "*cnzz.com*",
+    "*growingio.com*",
+    "*sensorsdata.cn*",
+)
+
+PROFILES = {
+    # 完整加载
+    "full": {},
+    # 不加载图片和音视频，保留字体和样式
+    "no-media": {
+        "block_types": ("Image", "Media"),
+        "reduce_motion": True,
+    },
+    # 只保留文档、样式和脚本
+    "text-only": {
+        "block_types": ("Image", "Media", "Font"),
+        "block_urls": ANALYTICS_PATTERNS,
+        "reduce_motion": True,
+    },
+}
+
+DEFAULT_PROFILE = "full"
+
+# 拦截器只需要暂停这些类型的请求
+BLOCKABLE_TYPES = tuple(sorted({t for profile in PROFILES.values() for t in profile.get("block_types", ())}))
+
+# 在页面脚本执行前插入样式，动画和过渡立即结束
+_NO_ANIMATIONS = """
+(function () {
+    var css = '*, *::before, *::after { animation-duration: 0s !important; animation-delay: 0s !important;'
+        + ' transition: none !important; scroll-behavior: auto !important; }';
+    function inject() {
+        var style = document.createElement('style');
+        style.textContent = css;
+        (document.head || document.documentElement).appendChild(style);
+    }
+    if (document.documentElement) {
+        inject();
+    } else {
+        new MutationObserver(function (mutations, observer) {
+            if (document.documentElement) {
+                observer.disconnect();
+                inject();
+            }
+        }).observe(document, {childList: true});
+    }
+})();
+"""
+
+_state = weakref.WeakKeyDictionary()
+
+
+class ResourceBlocker:
+    """FetchInterceptor处理器，使指定类型的请求失败"""
+
+    intercepts_responses = False
+    resource_types = BLOCKABLE_TYPES
+
+    def __init__(self):
+        self.types = frozenset()
+        self.blocked = 0
+
+    def block(self, types):
+        self.types = frozenset(types)
+
+    def on_request(self, info):
+        if info["resource_type"] in self.types:
+            self.blocked += 1
+            return Fail("BlockedByClient")
+        return None
+
+    def on_response(self, info, body):
+        pass
+
+
+def _attach_blocker(driver):
+    """
+    把拦截处理器挂到浏览器上，已有拦截器(HTTP录制/回放)时放在最前面
+
+    Returns:
+        (处理器, 为它新启动的拦截器)，共用已有拦截器时后者为None
+    """
+    blocker = ResourceBlocker()
+    interceptor = interceptor_for(driver)
+    if interceptor is not None:
+        interceptor.handlers.insert(0, blocker)
+        return blocker, None
+    return blocker, FetchInterceptor(driver, [blocker]).start()
+
+
+def current(driver):
+    """浏览器当前使用的配置名称"""
+    state = _state.get(driver)
+    return state["name"] if state else DEFAULT_PROFILE
+
+
+def apply(driver, name):
+    """切换页面加载配置，之后的页面加载生效"""
+    if name not in PROFILES:
+        raise ValueError(f"未知的页面配置: {name} (可选: {', '.join(PROFILES)})")
+    clear(driver)
+    profile = PROFILES[name]
+    if not profile:
+        return
+
+    state = _state.setdefault(driver, {
+        "name": DEFAULT_PROFILE, "blocker": None, "interceptor": None, "script": None, "urls": False
+    })
+    if profile.get("block_types"):
+        if state["blocker"] is None:
+            state["blocker"], state["interceptor"] = _attach_blocker(driver)
+        state["blocker"].block(profile["block_types"])
+    if profile.get("block_urls"):
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(profile["block_urls"])})
+        state["urls"] = True
+    if profile.get("reduce_motion"):
+        state["script"] = driver.execute_cdp_cmd(
+            "Page.addScriptToEvaluateOnNewDocument", {"source": _NO_ANIMATIONS}
+        )["identifier"]
+        driver.execute_cdp_cmd("Emulation.setEmulatedMedia", {
+            "features": [{"name": "prefers-reduced-motion", "value": "reduce"}]
+        })
+    state["name"] = name
+
+
+def clear(driver):
+    """恢复为full配置"""
+    state = _state.get(driver)
+    if state is None or state["name"] == DEFAULT_PROFILE:
+        return
+    if state["interceptor"] is not None:
+        # 专用拦截器直接停止，否则图片和字体请求仍会被暂停再经Python线程放行，影响之后测试的性能数据
+        state["interceptor"].stop()
+        state["blocker"] = state["interceptor"] = None
+    elif state["blocker"] is not None:
+        # 与HTTP录制/回放共用的拦截器仍需暂停全部请求，只清空拦截类型
+        state["blocker"].block(())
+    if state["urls"]:
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+        state["urls"] = False
+    if state["script"] is not None:
+        driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": state["script"]})
+        driver.execute_cdp_cmd("Emulation.setEmulatedMedia", {"media": "", "features": []})
+        state["script"] = None
+    state["name"] = DEFAULT_PROFILE
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Chrome性能日志缓冲区
+
+driver.get_log('performance')每次读取都会清空浏览器端的日志，
+多个使用方(等待引擎、网络分析)直接读取会互相"偷走"日志。
+这里为每个浏览器维护一个缓冲区，所有读取都经过drain()。
+"""
+
+import json
+import weakref
+
+from selenium.common.exceptions import WebDriverException
+
+
+_buffers = weakref.WeakKeyDictionary()
+
+
+def drain(driver):
+    """读取自上次调用以来的新日志，同时追加到该浏览器的缓冲区"""
+    entries = driver.get_log("performance")
+    _buffers.setdefault(driver, []).extend(entries)
+    return entries
+
+
+def entries(driver):
+    """返回缓冲区中的全部日志(会先读取浏览器端的新日志)"""
+    drain(driver)
+    return list(_buffers.get(driver, []))
+
+
+def clear(driver):
+    """丢弃浏览器端和缓冲区中的日志"""
+    _buffers.pop(driver, None)
+    try:
+        driver.get_log("performance")
+    except WebDriverException:
+        pass
+
+
+def parse(entry):
+    """将一条日志解析为 (method, params)"""
+    message = json.loads(entry["message"])["message"]
+    return message.get("method"), message.get("params", {})
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+my.nikon.com.cn 本地镜像服务器
+
+record 子命令抓取首页HTML及其引用的图片、脚本、样式表(含CSS中的url())，
+把资源地址改写为本地路径后保存到快照目录；ReplicaServer 在本地端口上提供该快照，
+测试可以在没有网络的沙箱里以本地磁盘的速度运行。
+
+使用方法:
+    python -m utils.replica_server record [--base-url URL] [--output DIR]
+    python -m utils.replica_server serve [--port PORT]
+"""
+
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+
+LIVE_BASE_URL = "https://my.nikon.com.cn"
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "replica")
+MANIFEST_NAME = "manifest.json"
+EXTERNAL_PREFIX = "/__external__/"
+
+_TAG_RE = re.compile(r"<(img|script|link|source|a|video|iframe)\b[^>]*>", re.IGNORECASE)
+_ATTR_RE = re.compile(r"\b(src|href|srcset|data-src|data-original|poster)\s*=\s*([\"'])(.*?)\2",
+                      re.IGNORECASE | re.DOTALL)
+_REL_RE = re.compile(r"\brel\s*=\s*([\"'])(.*?)\1", re.IGNORECASE)
+_CSS_URL_RE = re.compile(r"url\(\s*([\"']?)(.*?)\1\s*\)", re.IGNORECASE)
+
+# 这些rel类型的<link>才需要下载
+_DOWNLOAD_RELS = ("stylesheet", "icon", "preload", "modulepreload", "apple-touch-icon", "manifest")
+
+
+def _decode(response):
+    """响应头未声明字符集时按内容推断，避免中文页面被当作ISO-8859-1解码"""
+    if "charset" not in response.headers.get("Content-Type", "").lower():
+        response.encoding = response.apparent_encoding
+    return response.text
+
+
+def local_path(url, base_url):
+    """将资源URL映射为镜像中的本地路径，跨域资源放在 /__external__/<host>/ 下"""
+    parts = urlsplit(url)
+    base = urlsplit(base_url)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    if parts.netloc == base.netloc:
+        return path
+    return f"{EXTERNAL_PREFIX}{parts.netloc}{path}"
+
+
+class SnapshotRecorder:
+    """抓取并保存站点快照"""
+
+    def __init__(self, base_url=LIVE_BASE_URL, snapshot_dir=DEFAULT_SNAPSHOT_DIR, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.snapshot_dir = snapshot_dir
+        self.session = session or requests.Session()
+        self.session.headers.setdefault(
+            "User-Agent", "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+        )
+        self.manifest = {}
+
+    def record(self, extra_urls=()):
+        """抓取首页及其资源，返回记录的条目数"""
+        os.makedirs(os.path.join(self.snapshot_dir, "files"), exist_ok=True)
+
+        home_url = self.base_url + "/"
+        response = self.session.get(home_url, timeout=30)
+        response.raise_for_status()
+        html = self._rewrite_html(_decode(response), response.url)
+        self._store("/", response.url, 200, "text/html; charset=utf-8", html.encode("utf-8"))
+
+        for url in extra_urls:
+            self._download(urljoin(home_url, url))
+
+        with open(os.path.join(self.snapshot_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump({
+                "base_url": self.base_url,
+                "recorded_at": datetime.now().isoformat(timespec="seconds"),
+                "entries": self.manifest,
+            }, f, ensure_ascii=False, indent=2)
+        return len(self.manifest)
+
+    def _rewrite_html(self, html, page_url):
+        def rewrite_tag(tag_match):
+            tag = tag_match.group(0)
+            name = tag_match.group(1).lower()
+            if name == "a":
+                download = False
+            elif name == "link":
+                rel = _REL_RE.search(tag)
+                rel_value = rel.group(2).lower() if rel else ""
+                download = any(r in rel_value for r in _DOWNLOAD_RELS)
+            else:
+                download = True
+
+            def rewrite_attr(attr_match):
+                attr, quote, value = attr_match.groups()
+                if attr.lower() == "srcset":
+                    new_value = ", ".join(
+                        " ".join([self._map(c.split()[0], page_url, download)] + c.split()[1:])
+                        for c in value.split(",") if c.strip()
+                    )
+                else:
+                    new_value = self._map(value, page_url, download)
+                return f"{attr}={quote}{new_value}{quote}"
+
+            return _ATTR_RE.sub(rewrite_attr, tag)
+
+        return _TAG_RE.sub(rewrite_tag, html)
+
+    def _rewrite_css(self, css, css_url):
+        def rewrite_url(match):
+            quote, value = match.groups()
+            return f"url({quote}{self._map(value, css_url, True)}{quote})"
+
+        return _CSS_URL_RE.sub(rewrite_url, css)
+
+    def _map(self, value, page_url, download):
+        """解析并(按需)下载资源，返回改写后的本地路径"""
+        value = value.strip()
+        if not value or value.startswith(("data:", "javascript:", "mailto:", "tel:", "#")):
+            return value
+
+        url = urljoin(page_url, value)
+        if not url.startswith(("http://", "https://")):
+            return value
+
+        path = local_path(url, self.base_url)
+        if download:
+            self._download(url)
+        elif urlsplit(url).netloc != urlsplit(self.base_url).netloc:
+            # 跨域的页面链接保持原样
+            return value
+        return path
+
+    def _download(self, url):
+        path = local_path(url, self.base_url)
+        if path in self.manifest:
+            return
+        # 先占位，避免CSS互相引用时重复下载
+        self.manifest[path] = None
+        try:
+            response = self.session.get(url, timeout=30)
+        except requests.RequestException:
+            del self.manifest[path]
+            return
+
+        content_type = response.headers.get("Content-Type", "application/octet-stream")
+        body = response.content
+        if "text/css" in content_type:
+            body = self._rewrite_css(_decode(response), response.url).encode("utf-8")
+        self._store(path, url, response.status_code, content_type, body)
+
+    def _store(self, path, url, status, content_type, body):
+        digest = hashlib.sha1(body).hexdigest()
+        file_name = os.path.join("files", digest)
+        with open(os.path.join(self.snapshot_dir, file_name), "wb") as f:
+            f.write(body)
+        self.manifest[path] = {
+            "url": url,
+            "status": status,
+            "content_type": content_type,
+            "file": file_name,
+        }
+
+
+class _ReplicaHandler(BaseHTTPRequestHandler):
+    """根据快照manifest提供资源"""
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _serve(self, send_body):
+        entries = self.server.entries
+        entry = entries.get(self.path) or entries.get(self.path.split("?", 1)[0])
+        if entry is None:
+            body = b"Not Found"
+            self.send_response(404)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+            return
+
+        with open(os.path.join(self.server.snapshot_dir, entry["file"]), "rb") as f:
+            body = f.read()
+        content_type = entry.get("content_type") or mimetypes.guess_type(self.path)[0]
+        self.send_response(entry.get("status", 200))
+        self.send_header("Content-Type", content_type or "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "max-age=3600")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 高并发时访问日志只会拖慢测试
+        pass
+
+
+class ReplicaServer:
+    """在后台线程中运行的本地镜像服务器"""
+
+    def __init__(self, snapshot_dir=DEFAULT_SNAPSHOT_DIR, host="127.0.0.1", port=0):
+        manifest_path = os.path.join(snapshot_dir, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(
+                f"未找到镜像快照: {manifest_path}，请先运行 python -m utils.replica_server record"
+            )
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        self.httpd = ThreadingHTTPServer((host, port), _ReplicaHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.snapshot_dir = snapshot_dir
+        self.httpd.entries = {k: v for k, v in manifest["entries"].items() if v}
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serves(self, path):
+        """镜像中是否有该路径的资源(与请求处理相同，找不到时忽略查询参数)"""
+        entries = self.httpd.entries
+        return path in entries or path.split("?", 1)[0] in entries
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="尼康网站本地镜像")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="抓取站点快照")
+    record_parser.add_argument("--base-url", default=LIVE_BASE_URL, help="站点地址")
+    record_parser.add_argument("--output", default=DEFAULT_SNAPSHOT_DIR, help="快照目录")
+    record_parser.add_argument("--extra-url", action="append", default=[],
+                               help="额外需要保存的资源或接口地址，可重复指定")
+
+    serve_parser = subparsers.add_parser("serve", help="启动镜像服务器")
+    serve_parser.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_DIR, help="快照目录")
+    serve_parser.add_argument("--port", type=int, default=8000, help="监听端口")
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        count = SnapshotRecorder(args.base_url, args.output).record(args.extra_url)
+        print(f"✓ 已保存 {count} 个资源到 {args.output}")
+        return 0
+
+    server = ReplicaServer(args.snapshot, port=args.port)
+    print(f"镜像服务器已启动: {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+多视口响应式检查
+
+每个浏览器只加载一次页面，之后用CDP设备尺寸模拟(Emulation.setDeviceMetricsOverride)
+切换视口，不再重新加载页面或调整真实窗口；ResizeObserver确认布局稳定后，
+一次脚本调用记录横向溢出和关键元素的可见性。
+尺寸较多时可分摊到浏览器池中的多个浏览器上并行检查。
+
+每个尺寸的结果:
+    name, width, height, viewport[宽, 高], overflow(横向溢出像素), visible{选择器: 可见数}, total{选择器: 总数}
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.dom_snapshot import snapshot_many
+from utils.waits import wait_for_layout_settled, wait_for_page_settled
+
+
+DEFAULT_TEST_DATA = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_data.json"
+)
+
+# test_data.json缺失时使用的默认尺寸
+DEFAULT_SIZES = [
+    {"width": 1920, "height": 1080, "name": "Desktop"},
+    {"width": 1366, "height": 768, "name": "Laptop"},
+    {"width": 768, "height": 1024, "name": "Tablet"},
+    {"width": 375, "height": 667, "name": "Mobile"},
+]
+
+# 每个尺寸下统计可见性的元素
+DEFAULT_SELECTORS = ("body", "header, nav", "img", "a")
+
+# 窄于该宽度时按移动设备模拟(启用meta viewport和触摸相关的布局)
+MOBILE_MAX_WIDTH = 767
+
+
+def load_sizes(path=DEFAULT_TEST_DATA):
+    """读取test_data.json中的browser_sizes"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("browser_sizes", DEFAULT_SIZES)
+    except FileNotFoundError:
+        return DEFAULT_SIZES
+
+
+def emulate_viewport(driver, width, height):
+    """用CDP模拟指定的视口尺寸"""
+    driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+        "width": width,
+        "height": height,
+        "deviceScaleFactor": 0,
+        "mobile": width <= MOBILE_MAX_WIDTH,
+    })
+
+
+def clear_emulation(driver):
+    """取消视口模拟，恢复真实窗口尺寸"""
+    driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+
+
+def measure_layout(driver, selectors=DEFAULT_SELECTORS):
+    """记录当前视口下的横向溢出和元素可见性"""
+    viewport = driver.execute_script(
+        "var root = document.documentElement;"
+        "return [window.innerWidth, window.innerHeight, root.scrollWidth - root.clientWidth];"
+    )
+    found = snapshot_many(driver, selectors, attributes=())
+    return {
+        "viewport": viewport[:2],
+        "overflow": viewport[2],
+        "visible": {selector: sum(1 for r in records if r["visible"]) for selector, records in found.items()},
+        "total": {selector: len(records) for selector, records in found.items()},
+    }
+
+
+def for_each_viewport(driver, url, sizes, action):
+    """
+    加载一次页面，在每个尺寸下调用 action(driver, size)
+
+    Returns:
+        {尺寸名称: action的返回值}
+    """
+    driver.get(url)
+    wait_for_page_settled(driver)
+
+    results = {}
+    try:
+        for size in sizes:
+            emulate_viewport(driver, size["width"], size["height"])
+            wait_for_layout_settled(driver, size["width"])
+            results[size["name"]] = action(driver, size)
+    finally:
+        clear_emulation(driver)
+    return results
+
+
+def spread_viewports(pool, url, sizes, action):
+    """
+    把尺寸分摊到浏览器池中的多个浏览器上执行for_each_viewport，每个浏览器只加载一次页面
+
+    Returns:
+        {尺寸名称: action的返回值}
+    """
+    workers = max(1, min(pool.size, len(sizes)))
+    chunks = [sizes[i::workers] for i in range(workers)]
+
+    def run(chunk):
+        with pool.lease() as driver:
+            return for_each_viewport(driver, url, chunk, action)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk_results in executor.map(run, chunks):
+            results.update(chunk_results)
+    return results
+
+
+def check_viewports(driver, url, sizes, selectors=DEFAULT_SELECTORS):
+    """
+    加载一次页面，依次检查各个尺寸
+
+    Returns:
+        {尺寸名称: 结果}
+    """
+    return for_each_viewport(
+        driver, url, sizes, lambda d, size: dict(size, **measure_layout(d, selectors))
+    )
+
+
+def check_viewports_parallel(pool, url, sizes, selectors=DEFAULT_SELECTORS):
+    """并行版本的check_viewports，尺寸分摊到浏览器池中的多个浏览器"""
+    return spread_viewports(
+        pool, url, sizes, lambda d, size: dict(size, **measure_layout(d, selectors))
+    )
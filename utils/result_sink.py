@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+流式测试结果
+
+测试运行过程中每产生一个事件(会话开始、每个测试阶段的报告、会话结束)就向JSONL文件追加一行，
+文件超过大小上限时轮转(results.jsonl -> results.jsonl.1 -> ...)。
+运行中可以用 tail -f 实时查看；HTML和Allure报告由离线渲染器从事件流生成，
+渲染时逐行读取，内存中只保留尚未结束的测试。
+
+视觉回归的差异图以测试属性 visual_diffs ([{"name", "diff_path", "thumbnail"}]) 记录，
+HTML报告中嵌入缩略图并链接到差异图，Allure结果中作为附件。
+
+事件格式:
+    {"event": "session_start", "run": 运行id, "ts": 时间戳, "argv": [...]}
+    {"event": "test", "run", "ts", "nodeid", "when", "outcome", "duration", "start", "stop",
+     "worker", "properties": {名称: 值}, "longrepr": 失败信息}
+    {"event": "session_finish", "run", "ts", "exitstatus"}
+
+使用方法:
+    python -m utils.result_sink html                     # 最近一次运行 -> reports/report.html
+    python -m utils.result_sink allure                   # 最近一次运行 -> reports/allure-results
+    python -m utils.result_sink html --run <运行id> -o out.html
+"""
+
+import argparse
+import base64
+import html
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from logging.handlers import RotatingFileHandler
+
+from utils.history_store import outcome_of
+
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STREAM_PATH = os.path.join(_ROOT, "reports", "results.jsonl")
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+# 视觉回归差异图的测试属性名
+VISUAL_DIFFS = "visual_diffs"
+
+
+class ResultSink:
+    """按行写入的事件流，超过大小上限时轮转"""
+
+    def __init__(self, path=DEFAULT_STREAM_PATH, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.run = uuid.uuid4().hex[:12]
+        # RotatingFileHandler负责加锁、每条记录后flush和文件轮转
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def write(self, event, **fields):
+        record = dict(event=event, run=self.run, ts=time.time(), **fields)
+        message = json.dumps(record, ensure_ascii=False, default=str)
+        self._handler.emit(logging.makeLogRecord({"msg": message}))
+
+    def session_start(self, argv):
+        self.write("session_start", argv=list(argv))
+
+    def test_report(self, report):
+        """写入一个测试阶段的报告(pytest TestReport)"""
+        self.write(
+            "test",
+            nodeid=report.nodeid.split("@")[0],
+            when=report.when,
+            outcome=report.outcome,
+            duration=report.duration,
+            start=getattr(report, "start", None),
+            stop=getattr(report, "stop", None),
+            worker=getattr(report, "worker_id", "master"),
+            properties=dict(report.user_properties),
+            longrepr=str(report.longrepr) if report.failed else None,
+        )
+
+    def session_finish(self, exitstatus):
+        self.write("session_finish", exitstatus=int(exitstatus))
+
+    def close(self):
+        self._handler.close()
+
+
+def stream_files(path=DEFAULT_STREAM_PATH):
+    """事件流的全部文件，从最旧到最新"""
+    files = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.append(f"{path}.{index}")
+        index += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_events(path=DEFAULT_STREAM_PATH, run=None):
+    """逐行读取事件，run不为None时只返回该次运行的事件"""
+    for name in stream_files(path):
+        with open(name, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # 运行中被截断的最后一行
+                    continue
+                if run is None or event.get("run") == run:
+                    yield event
+
+
+def last_run(path=DEFAULT_STREAM_PATH):
+    """最近一次运行的id"""
+    run = None
+    for event in read_events(path):
+        if event["event"] == "session_start":
+            run = event["run"]
+    return run
+
+
+def iter_tests(path=DEFAULT_STREAM_PATH, run=None):
+    """
+    把阶段事件合并为测试结果，每个测试在teardown事件到达时产出
+
+    Returns:
+        生成器，元素为 {"nodeid", "outcome", "attempts", "worker", "start", "stop",
+                        "setup", "call", "teardown", "properties", "longrepr"}
+    """
+    pending = {}
+    for event in read_events(path, run):
+        if event["event"] != "test":
+            continue
+        test = pending.setdefault(event["nodeid"], {
+            "nodeid": event["nodeid"], "phases": {}, "attempts": 1, "start": event["start"],
+            "properties": {}, "longrepr": None,
+        })
+        if event["outcome"] == "rerun":
+            # 这次执行的teardown之后还会重跑，不在此时产出
+            test["attempts"] += 1
+            test["rerunning"] = True
+            continue
+        if event["when"] == "teardown" and test.pop("rerunning", False):
+            continue
+        test["phases"][event["when"]] = event["outcome"]
+        test[event["when"]] = event["duration"]
+        test["worker"] = event["worker"]
+        test["stop"] = event["stop"]
+        test["properties"].update(event["properties"])
+        if event["longrepr"]:
+            test["longrepr"] = event["longrepr"]
+        if event["when"] == "teardown":
+            del pending[event["nodeid"]]
+            test["outcome"] = outcome_of(test.pop("phases"), test["attempts"])
+            yield test
+
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 20px; }}
+table {{ border-collapse: collapse; width: 100%; }}
+th, td {{ border: 1px solid #ddd; padding: 4px 8px; text-align: left; vertical-align: top; font-size: 13px; }}
+tr.passed td.outcome {{ color: #2e7d32; }}
+tr.failed td.outcome {{ color: #c62828; }}
+tr.flaky td.outcome {{ color: #ef6c00; }}
+tr.skipped td.outcome {{ color: #757575; }}
+pre {{ margin: 0; white-space: pre-wrap; max-height: 300px; overflow: auto; }}
+figure {{ display: inline-block; margin: 4px 8px 0 0; }}
+figure img {{ max-width: 320px; border: 1px solid #ddd; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p>{summary}</p>
+<table>
+<tr><th>测试</th><th>结果</th><th>执行次数</th><th>耗时(秒)</th><th>Worker</th><th>详情</th></tr>
+"""
+
+
+def render_html(output, path=DEFAULT_STREAM_PATH, run=None, title="尼康网站自动化测试报告"):
+    """从事件流生成HTML报告(读取两遍: 先统计摘要，再逐行写出表格)"""
+    run = run or last_run(path)
+    counts = {}
+    for test in iter_tests(path, run):
+        counts[test["outcome"]] = counts.get(test["outcome"], 0) + 1
+    summary = "，".join(f"{outcome} {count}" for outcome, count in sorted(counts.items()))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(_HTML_HEAD.format(title=html.escape(title), summary=html.escape(f"运行 {run}: {summary}")))
+        for test in iter_tests(path, run):
+            duration = sum(test.get(when, 0) for when in ("setup", "call", "teardown"))
+            properties = dict(test["properties"])
+            diffs = properties.pop(VISUAL_DIFFS, None) or []
+            details = [f"{name}: {value}" for name, value in properties.items()]
+            if test["longrepr"]:
+                details.append(test["longrepr"])
+            f.write(
+                f'<tr class="{test["outcome"]}"><td>{html.escape(test["nodeid"])}</td>'
+                f'<td class="outcome">{test["outcome"]}</td><td>{test["attempts"]}</td>'
+                f'<td>{duration:.2f}</td><td>{html.escape(test["worker"])}</td>'
+                f'<td><pre>{html.escape(chr(10).join(details))}</pre>{_diff_figures(diffs)}</td></tr>\n'
+            )
+        f.write("</table>\n</body>\n</html>\n")
+    return output
+
+
+def _diff_figures(diffs):
+    """视觉回归差异图: 嵌入缩略图，链接到完整的差异图"""
+    figures = []
+    for diff in diffs:
+        image = f'<img src="data:image/png;base64,{diff["thumbnail"]}">' if diff.get("thumbnail") else ""
+        if diff.get("diff_path"):
+            href = html.escape("file://" + os.path.abspath(diff["diff_path"]), quote=True)
+            image = f'<a href="{href}">{image or html.escape(diff["diff_path"])}</a>'
+        figures.append(f'<figure>{image}<figcaption>{html.escape(diff["name"])} 差异</figcaption></figure>')
+    return "".join(figures)
+
+
+_ALLURE_STATUS = {"passed": "passed", "flaky": "passed", "failed": "failed", "skipped": "skipped"}
+
+
+def render_allure(output_dir, path=DEFAULT_STREAM_PATH, run=None):
+    """从事件流生成allure-results目录，之后可用 allure generate 生成报告"""
+    run = run or last_run(path)
+    os.makedirs(output_dir, exist_ok=True)
+    for test in iter_tests(path, run):
+        module, _, name = test["nodeid"].rpartition("::")
+        result_id = str(uuid.uuid4())
+        properties = dict(test["properties"])
+        attachments = []
+        for diff in properties.pop(VISUAL_DIFFS, None) or []:
+            if not diff.get("thumbnail"):
+                continue
+            source = f"{uuid.uuid4()}-attachment.png"
+            with open(os.path.join(output_dir, source), "wb") as f:
+                f.write(base64.b64decode(diff["thumbnail"]))
+            attachments.append({"name": f"{diff['name']} 差异", "source": source, "type": "image/png"})
+        result = {
+            "uuid": result_id,
+            "historyId": test["nodeid"],
+            "name": name,
+            "fullName": test["nodeid"],
+            "status": _ALLURE_STATUS[test["outcome"]],
+            "statusDetails": {"flaky": test["outcome"] == "flaky", "trace": test["longrepr"] or ""},
+            "stage": "finished",
+            "start": int((test["start"] or 0) * 1000),
+            "stop": int((test["stop"] or 0) * 1000),
+            "labels": [
+                {"name": "suite", "value": module},
+                {"name": "thread", "value": test["worker"]},
+            ],
+            "parameters": [{"name": key, "value": str(value)} for key, value in properties.items()],
+            "attachments": attachments,
+        }
+        with open(os.path.join(output_dir, f"{result_id}-result.json"), "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+    return output_dir
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="从结果事件流生成报告")
+    parser.add_argument("format", choices=["html", "allure"], help="报告格式")
+    parser.add_argument("--stream", default=DEFAULT_STREAM_PATH, help="事件流文件")
+    parser.add_argument("--run", default=None, help="运行id (默认: 最近一次)")
+    parser.add_argument("-o", "--output", default=None,
+                        help="输出路径 (默认: reports/report.html 或 reports/allure-results)")
+    args = parser.parse_args()
+
+    if not stream_files(args.stream):
+        print(f"未找到结果事件流: {args.stream}", file=sys.stderr)
+        return 1
+
+    if args.format == "html":
+        output = render_html(args.output or os.path.join(_ROOT, "reports", "report.html"), args.stream, args.run)
+    else:
+        output = render_allure(args.output or os.path.join(_ROOT, "reports", "allure-results"), args.stream, args.run)
+    print(f"报告已生成: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
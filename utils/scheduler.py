@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+并行调度
+
+按测试需要的资源分组(browser: 需要浏览器, viewport: 需要调整窗口尺寸, http: 只发HTTP请求)，
+共用同一份视口采集结果的测试放在同一个xdist分组(见 viewport_group())，
+用历史耗时(见 utils.history_store)按"最长优先"排序，并根据CPU和内存估算合适的xdist worker数量。
+
+配合 `pytest -n N --dist loadgroup` 使用：loadgroup 每次只给空闲worker分配一个工作单元，
+按最长优先排序后即为贪心的LPT调度，总耗时趋近于最慢的单个测试。
+"""
+
+import math
+import os
+
+
+# 需要浏览器的fixture
+BROWSER_FIXTURES = ("driver", "pooled_driver", "chrome_driver", "browser", "driver_pool")
+
+# 一次采集所有视口结果的fixture，共用同一份结果的测试必须在同一个worker上才不会重复采集
+VIEWPORT_FIXTURES = ("responsive_results", "screenshots")
+
+# 没有历史数据时各组的默认耗时估计(秒)
+DEFAULT_ESTIMATES = {
+    "browser": 5.0,
+    "viewport": 3.0,
+    "http": 1.0,
+}
+
+# 调整窗口尺寸的测试的xdist分组名前缀
+VIEWPORT_GROUP = "viewport"
+
+
+def classify(item):
+    """返回测试所属的资源分组: browser、viewport 或 http"""
+    if not any(name in item.fixturenames for name in BROWSER_FIXTURES):
+        return "http"
+    if any(name in item.fixturenames for name in VIEWPORT_FIXTURES):
+        return "viewport"
+    return "browser"
+
+
+def viewport_group(item):
+    """
+    调整窗口尺寸的测试所属的xdist分组，不需要分组时返回None
+
+    按视口fixture的缓存范围划分: 类级fixture每个测试类一组，模块级每个模块一组，
+    会话级全部放在一组；互不共享结果的测试类(如响应式和视觉回归)分到不同的worker并行执行。
+    """
+    scopes = set()
+    for name in VIEWPORT_FIXTURES:
+        fixturedefs = item._fixtureinfo.name2fixturedefs.get(name)
+        if fixturedefs:
+            scopes.add(fixturedefs[-1].scope)
+    if "session" in scopes or "package" in scopes:
+        return VIEWPORT_GROUP
+    if "module" in scopes or ("class" in scopes and item.cls is None):
+        return f"{VIEWPORT_GROUP}-{item.module.__name__}"
+    if "class" in scopes:
+        return f"{VIEWPORT_GROUP}-{item.module.__name__}.{item.cls.__qualname__}"
+    return None
+
+
+def estimate(item, durations):
+    """测试的预计耗时，优先使用历史记录"""
+    if item.nodeid in durations:
+        return durations[item.nodeid]
+    return DEFAULT_ESTIMATES[classify(item)]
+
+
+def order_longest_first(items, durations):
+    """
+    按工作单元的预计耗时从长到短排序(原地修改)
+
+    同一个xdist分组的测试作为一个整体，耗时为组内之和，组内保持原有顺序。
+    """
+    units = {}
+    for index, item in enumerate(items):
+        mark = item.get_closest_marker("xdist_group")
+        key = ("group", mark.args[0]) if mark and mark.args else ("item", index)
+        units.setdefault(key, []).append(item)
+
+    ordered = sorted(
+        units.values(),
+        key=lambda unit: sum(estimate(item, durations) for item in unit),
+        reverse=True
+    )
+    items[:] = [item for unit in ordered for item in unit]
+
+
+def order_fail_fast(items, durations, failures):
+    """
+    快速失败排序(原地修改): 最近失败过的测试优先，其余按耗时从短到长
+
+    Args:
+        items: pytest收集到的测试项
+        durations: 历史耗时 {nodeid: 秒}
+        failures: 最近的失败次数 {nodeid: 次数}
+    """
+    items.sort(key=lambda item: (
+        -failures.get(item.nodeid, 0),
+        durations.get(item.nodeid, DEFAULT_ESTIMATES[classify(item)])
+    ))
+
+
+def available_memory_mb():
+    """当前可用内存(MB)，无法获取时返回None"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def plan_workers(durations=None, pool_size=1, mem_per_browser_mb=400, reserve_mb=1024):
+    """
+    估算合适的worker数量
+
+    Args:
+        durations: 历史耗时 {nodeid: 秒}，用于计算并行度上限
+        pool_size: 每个worker预热的浏览器数量
+        mem_per_browser_mb: 每个无头Chrome预计占用的内存(MB)
+        reserve_mb: 为系统和其他进程保留的内存(MB)
+
+    Returns:
+        worker数量，至少为1
+    """
+    workers = os.cpu_count() or 1
+
+    memory = available_memory_mb()
+    if memory is not None:
+        per_worker = mem_per_browser_mb * max(1, pool_size)
+        workers = min(workers, max(1, (memory - reserve_mb) // per_worker))
+
+    # 总耗时/最长测试 之外的worker无法进一步缩短总时间
+    if durations:
+        longest = max(durations.values())
+        if longest > 0:
+            workers = min(workers, math.ceil(sum(durations.values()) / longest))
+
+    return max(1, workers)
+
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+站点爬取回归
+
+从首页和导航入口开始按广度优先发现同源页面，URL规范化后去重，
+在浏览器池的多个浏览器上并发打开每个页面并执行一组可插拔的页面检查。
+支持最大深度、最大页面数，并定期把进度写入检查点文件，中断后可从检查点继续。
+
+页面检查是一个函数 check(driver, page)，返回问题描述列表(没有问题时返回空列表)，
+page 为 {"url", "depth", "status", "title"}。
+"""
+
+import json
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, urldefrag, urlencode, urljoin, urlsplit, urlunsplit
+
+from selenium.common.exceptions import WebDriverException
+
+from utils import perf_log
+from utils.dom_snapshot import snapshot, visible
+from utils.network_log import parse_network_log
+from utils.responsive import clear_emulation, emulate_viewport, measure_layout
+from utils.waits import wait_for_layout_settled, wait_for_page_settled
+
+
+DEFAULT_CHECKPOINT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reports", "crawl_checkpoint.json"
+)
+
+# 这些扩展名的链接是下载文件，不作为页面爬取
+_SKIPPED_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".pdf", ".zip", ".rar",
+    ".exe", ".dmg", ".mp4", ".mov", ".mp3", ".css", ".js", ".json", ".xml",
+)
+
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+# 横向溢出检查使用的窗口尺寸(手机)
+OVERFLOW_WINDOW_SIZE = (375, 667)
+
+
+def normalize_url(url):
+    """规范化URL用于去重: 去掉锚点和默认端口，主机名小写，查询参数排序"""
+    url = urldefrag(url)[0]
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and str(parts.port) != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def origin_of(url):
+    parts = urlsplit(normalize_url(url))
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def is_crawlable(url, origin):
+    """同源且不是下载文件的http(s)页面"""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        return False
+    return origin_of(url) == origin and not parts.path.lower().endswith(_SKIPPED_EXTENSIONS)
+
+
+# ---- 页面检查 ----
+
+def check_title(driver, page):
+    """页面应有标题"""
+    return [] if page["title"].strip() else ["页面标题为空"]
+
+
+def check_http_status(driver, page):
+    """文档请求不应返回错误状态码"""
+    status = page["status"]
+    if status is not None and status >= 400:
+        return [f"HTTP状态码 {status}"]
+    return []
+
+
+def check_responsive_overflow(driver, page):
+    """手机宽度下页面不应出现横向滚动"""
+    emulate_viewport(driver, *OVERFLOW_WINDOW_SIZE)
+    try:
+        wait_for_layout_settled(driver, OVERFLOW_WINDOW_SIZE[0])
+        overflow = measure_layout(driver, selectors=())["overflow"]
+    finally:
+        clear_emulation(driver)
+    if overflow > 1:
+        return [f"{OVERFLOW_WINDOW_SIZE[0]}px宽度下横向溢出 {overflow}px"]
+    return []
+
+
+def check_broken_images(driver, page):
+    """可见图片都应加载成功"""
+    return [
+        f"图片加载失败: {img['current_src'] or img['attributes']['src']}"
+        for img in visible(snapshot(driver, "img"))
+        if not img["loaded"]
+    ]
+
+
+DEFAULT_CHECKS = (check_title, check_http_status, check_responsive_overflow, check_broken_images)
+
+
+def visit(driver, url, depth, checks=DEFAULT_CHECKS):
+    """
+    打开页面并执行检查
+
+    Returns:
+        (结果, 页面上的链接列表)
+    """
+    started = time.perf_counter()
+    perf_log.clear(driver)
+    driver.get(url)
+    wait_for_page_settled(driver)
+
+    documents = [r for r in parse_network_log(perf_log.entries(driver)) if r["type"] == "Document"]
+    page = {
+        "url": url,
+        "depth": depth,
+        # 重定向时最后一跳才是页面本身
+        "status": documents[-1]["status"] if documents else None,
+        "title": driver.title,
+    }
+
+    problems = []
+    for check in checks:
+        try:
+            problems.extend(check(driver, page))
+        except WebDriverException as e:
+            problems.append(f"{check.__name__} 执行失败: {e.msg}")
+
+    page_url = driver.current_url
+    links = [
+        urljoin(page_url, record["attributes"]["href"])
+        for record in snapshot(driver, "a[href]", ["href"])
+    ]
+    result = dict(page, final_url=page_url, problems=problems,
+                  elapsed=time.perf_counter() - started)
+    return result, links
+
+
+class SiteCrawler:
+    """基于浏览器池的广度优先爬取"""
+
+    def __init__(self, pool, checks=DEFAULT_CHECKS, max_depth=2, max_pages=None,
+                 concurrency=None, checkpoint=None, checkpoint_every=20):
+        """
+        Args:
+            pool: utils.driver_pool.DriverPool
+            checks: 页面检查函数列表
+            max_depth: 最大爬取深度，起始页面为0
+            max_pages: 每次运行最多检查的页面数，为None时不限；从检查点继续时不计入之前运行检查过的页面
+            concurrency: 同时打开的页面数，默认等于浏览器池大小
+            checkpoint: 检查点文件路径，为None时不保存进度
+            checkpoint_every: 每检查多少个页面保存一次检查点
+        """
+        self.pool = pool
+        self.checks = list(checks)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.concurrency = concurrency or pool.size
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+
+        self.origin = None
+        self.results = {}
+        self._queue = deque()
+        self._seen = set()
+        # 本次运行检查的页面数(self.results还包括从检查点恢复的结果)
+        self._visited_this_run = 0
+
+    def crawl(self, start_urls):
+        """
+        从起始页面开始爬取，存在匹配的检查点时从检查点继续
+
+        Returns:
+            {url: 结果}
+        """
+        start_urls = [normalize_url(url) for url in start_urls]
+        self.origin = origin_of(start_urls[0])
+        self._visited_this_run = 0
+        if not self._resume():
+            for url in start_urls:
+                self._enqueue(url, 0)
+
+        in_flight = {}
+        since_checkpoint = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="crawler") as executor:
+            while self._queue or in_flight:
+                while self._queue and len(in_flight) < self.concurrency and not self._page_limit_reached(in_flight):
+                    url, depth = self._queue.popleft()
+                    in_flight[executor.submit(self._visit, url, depth)] = (url, depth)
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, depth = in_flight.pop(future)
+                    result, links = future.result()
+                    self.results[url] = result
+                    self._visited_this_run += 1
+                    if depth < self.max_depth:
+                        for link in links:
+                            self._enqueue(normalize_url(link), depth + 1)
+
+                since_checkpoint += len(done)
+                if since_checkpoint >= self.checkpoint_every:
+                    self._save_checkpoint(in_flight.values())
+                    since_checkpoint = 0
+
+        # 爬取完成后删除检查点，下次重新开始
+        if self.checkpoint and not self._queue and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        elif self._queue:
+            self._save_checkpoint(())
+        return self.results
+
+    def problems(self):
+        """有问题的页面 {url: [问题描述]}"""
+        return {url: r["problems"] for url, r in self.results.items() if r["problems"]}
+
+    def _visit(self, url, depth):
+        with self.pool.lease() as driver:
+            try:
+                return visit(driver, url, depth, self.checks)
+            except WebDriverException as e:
+                result = {"url": url, "depth": depth, "status": None, "title": "", "final_url": url,
+                          "problems": [f"页面打开失败: {e.msg}"], "elapsed": None}
+                return result, []
+
+    def _enqueue(self, url, depth):
+        if url in self._seen or not is_crawlable(url, self.origin):
+            return
+        self._seen.add(url)
+        self._queue.append((url, depth))
+
+    def _page_limit_reached(self, in_flight):
+        return self.max_pages is not None and self._visited_this_run + len(in_flight) >= self.max_pages
+
+    def _resume(self):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return False
+        with open(self.checkpoint, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("origin") != self.origin:
+            return False
+        self._queue = deque(tuple(item) for item in state["queue"])
+        self._seen = set(state["seen"])
+        self.results = state["results"]
+        return True
+
+    def _save_checkpoint(self, in_flight):
+        if not self.checkpoint:
+            return
+        # 尚未完成的页面放回队首，恢复时重新检查
+        state = {
+            "origin": self.origin,
+            "queue": list(in_flight) + list(self._queue),
+            "seen": sorted(self._seen),
+            "results": self.results,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint)), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.checkpoint)), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint)
+
+
+def format_report(results):
+    """格式化爬取结果"""
+    failed = {url: r for url, r in results.items() if r["problems"]}
+    lines = [f"共检查 {len(results)} 个页面，{len(failed)} 个页面有问题"]
+    for url, result in sorted(failed.items()):
+        lines.append(f"  [深度{result['depth']}] {url}")
+        for problem in result["problems"]:
+            lines.append(f"      - {problem}")
+    return "\n".join(lines)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+视觉回归
+
+用CDP截取各视口下的整页截图并与基线比较：
+- 截图写入磁盘后立即释放，比较时逐张读取，并按水平条带计算差异，内存占用与截图数量无关；
+- 与基线文件的sha256相同时直接判定为未变化，不解码图片；
+- 差异按YIQ色彩空间的感知距离计算(与pixelmatch相同的度量)，轮播图等动态区域可用遮罩排除；
+- 超出容差时生成差异图(变化的像素标红)，并生成缩略图用于嵌入HTML报告。
+
+目录结构:
+    visual_baselines/<名称>.png       基线截图，随代码一起提交
+    reports/visual/<名称>.png         本次截图
+    reports/visual/<名称>-diff.png    差异图
+"""
+
+import base64
+import hashlib
+import io
+import os
+import re
+import shutil
+
+import numpy as np
+from PIL import Image
+
+from utils.dom_snapshot import snapshot_many
+from utils.responsive import spread_viewports
+
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE_DIR = os.path.join(_ROOT, "visual_baselines")
+DEFAULT_OUTPUT_DIR = os.path.join(_ROOT, "reports", "visual")
+
+# 内容会自动变化的区域，比较时默认遮罩
+DEFAULT_MASK_SELECTORS = (".swiper", ".carousel", ".slick-slider", ".banner", "video", "iframe")
+
+# 整页截图的最大高度(像素)，避免无限滚动页面产生超大图片
+MAX_CAPTURE_HEIGHT = 16384
+
+# 每次参与计算的行数
+STRIP_HEIGHT = 512
+
+# YIQ感知距离的最大值，threshold按此归一化
+_MAX_YIQ_DELTA = 35215.0
+
+THUMBNAIL_WIDTH = 800
+
+
+def _safe_name(name):
+    return re.sub(r"[^\w.-]+", "_", name)
+
+
+def capture_full_page(driver, max_height=MAX_CAPTURE_HEIGHT):
+    """截取当前页面的整页截图(PNG字节)"""
+    metrics = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+    content = metrics.get("cssContentSize") or metrics["contentSize"]
+    width = content["width"]
+    height = min(content["height"], max_height)
+    result = driver.execute_cdp_cmd("Page.captureScreenshot", {
+        "format": "png",
+        "captureBeyondViewport": True,
+        "clip": {"x": 0, "y": 0, "width": width, "height": height, "scale": 1},
+    })
+    return base64.b64decode(result["data"])
+
+
+def mask_rects(driver, selectors=DEFAULT_MASK_SELECTORS):
+    """动态区域在整页截图中的位置 [(x, y, 宽, 高)]"""
+    found = snapshot_many(driver, selectors, attributes=())
+    return [
+        (r["rect"]["x"], r["rect"]["y"], r["rect"]["width"], r["rect"]["height"])
+        for records in found.values() for r in records
+        if r["visible"]
+    ]
+
+
+def capture_viewports(pool, url, sizes, page, output_dir=DEFAULT_OUTPUT_DIR,
+                      mask_selectors=DEFAULT_MASK_SELECTORS):
+    """
+    在每个视口下截取整页截图并写入磁盘，尺寸分摊到浏览器池中的多个浏览器
+
+    Args:
+        page: 页面名称，截图命名为 <页面>-<尺寸名称>
+
+    Returns:
+        {尺寸名称: {"name", "path", "masks"}}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    def capture(driver, size):
+        name = _safe_name(f"{page}-{size['name']}")
+        path = os.path.join(output_dir, f"{name}.png")
+        with open(path, "wb") as f:
+            f.write(capture_full_page(driver))
+        return {"name": name, "path": path, "masks": mask_rects(driver, mask_selectors)}
+
+    return spread_viewports(pool, url, sizes, capture)
+
+
+def _yiq(rgb):
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    return (
+        0.29889531 * r + 0.58662247 * g + 0.11448223 * b,
+        0.59597799 * r - 0.27417610 * g - 0.32180189 * b,
+        0.21147017 * r - 0.52261711 * g + 0.31114694 * b,
+    )
+
+
+def _strip_mask(masks, top, height, width):
+    """条带内需要忽略的像素"""
+    ignored = np.zeros((height, width), dtype=bool)
+    for x, y, w, h in masks:
+        y0, y1 = max(int(y) - top, 0), min(int(y + h) - top + 1, height)
+        x0, x1 = max(int(x), 0), min(int(x + w) + 1, width)
+        if y0 < y1 and x0 < x1:
+            ignored[y0:y1, x0:x1] = True
+    return ignored
+
+
+def _strips(baseline, actual, masks, threshold):
+    """按条带逐段计算差异，产出 (起始行, 差异布尔矩阵)，只覆盖两张图的重叠区域"""
+    width = min(baseline.width, actual.width)
+    height = min(baseline.height, actual.height)
+    limit = _MAX_YIQ_DELTA * threshold * threshold
+    for top in range(0, height, STRIP_HEIGHT):
+        bottom = min(top + STRIP_HEIGHT, height)
+        a = np.asarray(baseline.crop((0, top, width, bottom)), dtype=np.float32)
+        b = np.asarray(actual.crop((0, top, width, bottom)), dtype=np.float32)
+        ya, ia, qa = _yiq(a)
+        yb, ib, qb = _yiq(b)
+        delta = 0.5053 * (ya - yb) ** 2 + 0.299 * (ia - ib) ** 2 + 0.1957 * (qa - qb) ** 2
+        changed = delta > limit
+        changed &= ~_strip_mask(masks, top, bottom - top, width)
+        yield top, changed
+
+
+class BaselineStore:
+    """截图基线存储与比较"""
+
+    def __init__(self, baseline_dir=DEFAULT_BASELINE_DIR, output_dir=DEFAULT_OUTPUT_DIR,
+                 update=False, threshold=0.1, tolerance=0.001):
+        """
+        Args:
+            baseline_dir: 基线目录
+            output_dir: 差异图输出目录
+            update: 为True时用本次截图覆盖基线
+            threshold: 单个像素的感知差异阈值(0~1)，越小越敏感
+            tolerance: 允许变化的像素比例
+        """
+        self.baseline_dir = baseline_dir
+        self.output_dir = output_dir
+        self.update = update
+        self.threshold = threshold
+        self.tolerance = tolerance
+
+    def baseline_path(self, name):
+        return os.path.join(self.baseline_dir, f"{name}.png")
+
+    def compare(self, name, actual_path, masks=()):
+        """
+        与基线比较
+
+        Returns:
+            {"name", "status", "message", "diff_ratio", "diff_path", "thumbnail"}
+            status为 new(新建基线)、updated、unchanged、passed 或 failed，
+            thumbnail为失败时差异图缩略图的base64(PNG)
+        """
+        result = {"name": name, "status": None, "message": "", "diff_ratio": 0.0,
+                  "diff_path": None, "thumbnail": None}
+        baseline_path = self.baseline_path(name)
+
+        if self.update or not os.path.exists(baseline_path):
+            result["status"] = "updated" if os.path.exists(baseline_path) else "new"
+            os.makedirs(self.baseline_dir, exist_ok=True)
+            shutil.copyfile(actual_path, baseline_path)
+            result["message"] = f"已保存基线: {baseline_path}"
+            return result
+
+        if _file_hash(baseline_path) == _file_hash(actual_path):
+            result["status"] = "unchanged"
+            return result
+
+        with Image.open(baseline_path) as baseline, Image.open(actual_path) as actual:
+            baseline = baseline.convert("RGB")
+            actual = actual.convert("RGB")
+            changed = sum(int(diff.sum()) for _, diff in _strips(baseline, actual, masks, self.threshold))
+            # 尺寸不一致时，只存在于一张图中的区域全部算作变化
+            overlap = min(baseline.width, actual.width) * min(baseline.height, actual.height)
+            total = max(baseline.width * baseline.height, actual.width * actual.height)
+            changed += total - overlap
+            result["diff_ratio"] = changed / total
+
+            if result["diff_ratio"] <= self.tolerance:
+                result["status"] = "passed"
+                return result
+
+            result["status"] = "failed"
+            result["message"] = f"{name}: {result['diff_ratio']:.2%} 的像素发生变化"
+            if baseline.size != actual.size:
+                result["message"] += f"，尺寸 {baseline.size} -> {actual.size}"
+            result["diff_path"], result["thumbnail"] = self._write_diff(name, baseline, actual, masks)
+        return result
+
+    def _write_diff(self, name, baseline, actual, masks):
+        """生成差异图: 本次截图淡化为灰度背景，变化的像素标红"""
+        diff_image = Image.new("RGB", actual.size, (255, 255, 255))
+        for top, changed in _strips(baseline, actual, masks, self.threshold):
+            height, width = changed.shape
+            gray = np.asarray(actual.crop((0, top, width, top + height)).convert("L"), dtype=np.float32)
+            faded = (255 - (255 - gray) * 0.3).astype(np.uint8)
+            strip = np.repeat(faded[..., None], 3, axis=2)
+            strip[changed] = (255, 0, 0)
+            diff_image.paste(Image.fromarray(strip), (0, top))
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        diff_path = os.path.join(self.output_dir, f"{name}-diff.png")
+        diff_image.save(diff_path)
+
+        scale = THUMBNAIL_WIDTH / diff_image.width
+        if scale < 1:
+            diff_image = diff_image.resize((THUMBNAIL_WIDTH, max(1, int(diff_image.height * scale))))
+        buffer = io.BytesIO()
+        diff_image.save(buffer, format="PNG")
+        return diff_path, base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+等待时间统计
+
+按浏览器记录元素查找和等待条件花费的时间，每个测试结束时取出，
+记在该测试名下(结果事件流中的 waits 属性):
+- 元素查找: 按定位器(如 "css selector=nav")统计次数、耗时和未找到的次数；
+- 等待条件: wait_for_page_ready、wait_for_network_idle 等按条件名称统计。
+报告列出耗时最多的定位器和测试，用来找出套件时间花在了哪里。
+
+使用方法:
+    python -m utils.wait_stats report              # 最近一次运行的等待耗时排行
+    python -m utils.wait_stats report --top 50 --run <运行id>
+"""
+
+import argparse
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from utils.result_sink import DEFAULT_STREAM_PATH, iter_tests, last_run
+
+
+# {driver: {标签: {"count", "seconds", "misses"}}}，只统计启用了的浏览器
+_stats = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def enable(driver):
+    with _lock:
+        _stats.setdefault(driver, {})
+
+
+def record(driver, label, seconds, missed=False):
+    """记录一次查找或等待"""
+    with _lock:
+        stats = _stats.get(driver)
+        if stats is None:
+            return
+        entry = stats.setdefault(label, {"count": 0, "seconds": 0.0, "misses": 0})
+        entry["count"] += 1
+        entry["seconds"] += seconds
+        entry["misses"] += int(missed)
+
+
+@contextmanager
+def timed(driver, label):
+    """统计with块的耗时，块内抛出异常(如等待超时)记为未满足"""
+    started = time.monotonic()
+    missed = True
+    try:
+        yield
+        missed = False
+    finally:
+        record(driver, label, time.monotonic() - started, missed)
+
+
+def take(driver):
+    """取出并清空浏览器的统计"""
+    with _lock:
+        stats = _stats.get(driver)
+        if stats is None:
+            return {}
+        _stats[driver] = {}
+    return {label: dict(entry, seconds=round(entry["seconds"], 3)) for label, entry in stats.items()}
+
+
+def format_report(records, top=20):
+    """
+    等待耗时最多的定位器/条件和测试
+
+    Args:
+        records: {nodeid: take()的返回值}
+    """
+    by_label = {}
+    for nodeid, stats in records.items():
+        for label, entry in stats.items():
+            total = by_label.setdefault(label, {"count": 0, "seconds": 0.0, "misses": 0, "tests": 0})
+            total["count"] += entry["count"]
+            total["seconds"] += entry["seconds"]
+            total["misses"] += entry["misses"]
+            total["tests"] += 1
+
+    lines = [f"{'耗时':>8} {'次数':>6} {'未满足':>6} {'测试数':>6}  定位器/等待条件"]
+    for label, total in sorted(by_label.items(), key=lambda kv: kv[1]["seconds"], reverse=True)[:top]:
+        lines.append(
+            f"{total['seconds']:7.2f}s {total['count']:6d} {total['misses']:6d} {total['tests']:6d}  {label}"
+        )
+
+    tests = sorted(
+        ((sum(entry["seconds"] for entry in stats.values()), nodeid, stats) for nodeid, stats in records.items()),
+        reverse=True
+    )
+    lines.append("等待耗时最多的测试:")
+    for seconds, nodeid, stats in tests[:min(top, 10)]:
+        label = max(stats, key=lambda name: stats[name]["seconds"]) if stats else "-"
+        lines.append(f"{seconds:7.2f}s  {nodeid}  (最多: {label})")
+    return "\n".join(lines)
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="等待时间统计报告")
+    parser.add_argument("command", choices=["report"], help="report: 等待耗时最多的定位器和测试")
+    parser.add_argument("--stream", default=DEFAULT_STREAM_PATH, help="结果事件流文件")
+    parser.add_argument("--run", default=None, help="运行id (默认: 最近一次)")
+    parser.add_argument("--top", type=int, default=20, help="显示多少个定位器 (默认: 20)")
+    args = parser.parse_args()
+
+    run = args.run or last_run(args.stream)
+    records = {
+        test["nodeid"]: test["properties"]["waits"]
+        for test in iter_tests(args.stream, run)
+        if "waits" in test["properties"]
+    }
+    if not records:
+        print(f"运行 {run} 中没有等待统计")
+        return 1
+    print(f"运行 {run} 中等待耗时最多的定位器:")
+    print(format_report(records, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
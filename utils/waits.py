@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+自适应等待引擎
+
+用条件轮询代替固定的time.sleep：条件满足立即返回，页面快时只需等待几十毫秒。
+每种条件都有独立的超时时间，默认值见 DEFAULT_TIMEOUTS。
+元素查找和等待条件的耗时记入 utils.wait_stats。
+
+use_explicit_lookups() 让浏览器的元素查找改为显式超时(隐式等待始终为0):
+- find_element 轮询到超时，默认超时为测试通过 implicitly_wait() 设置的值；
+- find_elements 默认不等待，找不到立即返回空列表，需要等待时传入 timeout。
+"""
+
+import functools
+import time
+import weakref
+from contextlib import contextmanager
+
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support.ui import WebDriverWait
+
+from utils import perf_log, wait_stats
+
+
+# 各等待条件的默认超时(秒)
+DEFAULT_TIMEOUTS = {
+    "page_ready": 10,
+    "network_idle": 5,
+    "dom_stable": 3,
+    "resize": 3,
+}
+
+POLL_INTERVAL = 0.05
+
+_DOM_QUIET_SCRIPT = """
+if (!window.__nikonMutations) {
+    window.__nikonMutations = {last: performance.now()};
+    new MutationObserver(function () {
+        window.__nikonMutations.last = performance.now();
+    }).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+}
+return performance.now() - window.__nikonMutations.last;
+"""
+
+_VIEWPORT_AFTER_FRAMES_SCRIPT = """
+var done = arguments[arguments.length - 1];
+requestAnimationFrame(function () {
+    requestAnimationFrame(function () {
+        done([window.innerWidth, window.innerHeight, document.documentElement.scrollWidth]);
+    });
+});
+"""
+
+# ResizeObserver记录根元素和body最后一次尺寸变化的时间；
+# 视口宽度达到预期且在quiet毫秒内没有新的变化即认为布局已稳定
+_LAYOUT_SETTLED_SCRIPT = """
+var width = arguments[0], quiet = arguments[1], timeout = arguments[2];
+var done = arguments[arguments.length - 1];
+var state = window.__nikonResize;
+if (!state) {
+    state = window.__nikonResize = {last: performance.now()};
+    var observer = new ResizeObserver(function () { state.last = performance.now(); });
+    observer.observe(document.documentElement);
+    if (document.body) { observer.observe(document.body); }
+}
+var started = performance.now();
+function check() {
+    var now = performance.now();
+    if (window.innerWidth === width && now - state.last >= quiet) {
+        done(true);
+    } else if (now - started >= timeout) {
+        done(false);
+    } else {
+        requestAnimationFrame(check);
+    }
+}
+requestAnimationFrame(check);
+"""
+
+
+# 已接管元素查找的浏览器 {driver: {"zero": 是否关闭隐式等待, "timeout": find_element的默认超时}}
+_lookups = weakref.WeakKeyDictionary()
+
+
+def _timeout(name, timeout):
+    return DEFAULT_TIMEOUTS[name] if timeout is None else timeout
+
+
+def _accounted(func):
+    """把等待条件的耗时记入wait_stats"""
+    @functools.wraps(func)
+    def wrapper(driver, *args, **kwargs):
+        with wait_stats.timed(driver, func.__name__):
+            return func(driver, *args, **kwargs)
+    return wrapper
+
+
+def _find(driver, find_elements, by, value, timeout, single):
+    """轮询find_elements直到找到或超时，耗时按定位器记入wait_stats"""
+    state = _lookups[driver]
+    if timeout is None:
+        timeout = state["timeout"] if single and state["zero"] else 0
+    label = f"{by}={value}"
+    started = time.monotonic()
+    deadline = started + timeout
+    while True:
+        found = find_elements(by, value)
+        if found or time.monotonic() >= deadline:
+            break
+        time.sleep(POLL_INTERVAL)
+    wait_stats.record(driver, label, time.monotonic() - started, missed=not found)
+
+    if not single:
+        return found
+    if not found:
+        raise NoSuchElementException(f"{timeout}秒内未找到元素: {label}")
+    return found[0]
+
+
+class _LookupElement(WebElement):
+    """子元素查找同样使用显式超时"""
+
+    def find_element(self, by=By.ID, value=None, timeout=None):
+        return _find(self._parent, super().find_elements, by, value, timeout, single=True)
+
+    def find_elements(self, by=By.ID, value=None, timeout=None):
+        return _find(self._parent, super().find_elements, by, value, timeout, single=False)
+
+
+def use_explicit_lookups(driver, zero_implicit_wait=True):
+    """
+    接管浏览器的元素查找(同一个浏览器只需调用一次)
+
+    Args:
+        zero_implicit_wait: 为True时浏览器的隐式等待固定为0，implicitly_wait()只设置find_element的默认超时；
+            为False时保持原有的隐式等待，只统计查找耗时
+    """
+    if driver in _lookups:
+        return
+    _lookups[driver] = state = {"zero": zero_implicit_wait, "timeout": 0}
+    wait_stats.enable(driver)
+    find_elements = driver.find_elements
+    implicitly_wait = driver.implicitly_wait
+
+    def set_implicit_wait(seconds):
+        if state["zero"]:
+            state["timeout"] = seconds
+        else:
+            implicitly_wait(seconds)
+
+    def find_element_(by=By.ID, value=None, timeout=None):
+        return _find(driver, find_elements, by, value, timeout, single=True)
+
+    def find_elements_(by=By.ID, value=None, timeout=None):
+        return _find(driver, find_elements, by, value, timeout, single=False)
+
+    driver.implicitly_wait = set_implicit_wait
+    driver.find_element = find_element_
+    driver.find_elements = find_elements_
+    driver._web_element_cls = _LookupElement
+    if zero_implicit_wait:
+        implicitly_wait(0)
+
+
+@contextmanager
+def no_implicit_wait(driver):
+    """临时关闭隐式等待，找不到元素时立即返回"""
+    previous = driver.timeouts.implicit_wait
+    if not previous:
+        yield
+        return
+    driver.implicitly_wait(0)
+    try:
+        yield
+    finally:
+        driver.implicitly_wait(previous)
+
+
+@_accounted
+def wait_for_page_ready(driver, timeout=None):
+    """等待 document.readyState 变为 complete"""
+    timeout = _timeout("page_ready", timeout)
+    WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+        lambda d: d.execute_script("return document.readyState") == "complete",
+        message=f"页面在{timeout}秒内未加载完成"
+    )
+
+
+@_accounted
+def wait_for_network_idle(driver, idle_time=0.5, max_inflight=0, timeout=None):
+    """
+    等待网络空闲
+
+    通过Chrome性能日志跟踪进行中的请求，进行中的请求数不超过max_inflight
+    并持续idle_time秒即视为空闲。浏览器未开启性能日志时退回到
+    Resource Timing条目数量不再增长的判断方式。
+
+    Args:
+        idle_time: 需要保持空闲的时长(秒)
+        max_inflight: 允许的进行中请求数(统计、长轮询等请求可能永不结束)
+        timeout: 超时时间(秒)
+    """
+    timeout = _timeout("network_idle", timeout)
+    deadline = time.monotonic() + timeout
+    last_activity = time.monotonic()
+    inflight = set()
+    resource_count = None
+
+    while True:
+        now = time.monotonic()
+        try:
+            for entry in perf_log.drain(driver):
+                method, params = perf_log.parse(entry)
+                if method == "Network.requestWillBeSent":
+                    if not params.get("request", {}).get("url", "").startswith("data:"):
+                        inflight.add(params.get("requestId"))
+                        last_activity = now
+                elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+                    inflight.discard(params.get("requestId"))
+                    last_activity = now
+        except WebDriverException:
+            count = driver.execute_script("return performance.getEntriesByType('resource').length")
+            if count != resource_count:
+                resource_count = count
+                last_activity = now
+
+        if len(inflight) <= max_inflight and now - last_activity >= idle_time:
+            return
+        if now >= deadline:
+            raise TimeoutException(f"网络在{timeout}秒内未空闲，仍有{len(inflight)}个请求未完成")
+        time.sleep(POLL_INTERVAL)
+
+
+@_accounted
+def wait_for_dom_stable(driver, quiet_time=0.3, timeout=None):
+    """等待DOM在quiet_time秒内没有任何变化(基于MutationObserver)"""
+    timeout = _timeout("dom_stable", timeout)
+    WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+        lambda d: d.execute_script(_DOM_QUIET_SCRIPT) >= quiet_time * 1000,
+        message=f"DOM在{timeout}秒内未稳定"
+    )
+
+
+@_accounted
+def wait_for_resize(driver, timeout=None):
+    """
+    等待窗口尺寸调整完成
+
+    连续两次在两帧渲染之后读取到相同的视口尺寸和文档宽度，即认为布局已稳定。
+    """
+    timeout = _timeout("resize", timeout)
+    deadline = time.monotonic() + timeout
+    previous = None
+
+    while True:
+        current = driver.execute_async_script(_VIEWPORT_AFTER_FRAMES_SCRIPT)
+        if current == previous:
+            return current
+        if time.monotonic() >= deadline:
+            raise TimeoutException(f"窗口尺寸在{timeout}秒内未稳定")
+        previous = current
+
+
+@_accounted
+def wait_for_layout_settled(driver, width, quiet_time=0.1, timeout=None):
+    """
+    等待视口切换(例如CDP设备尺寸模拟)后的布局稳定
+
+    Args:
+        width: 预期的视口宽度(CSS像素)
+        quiet_time: 最后一次尺寸变化后需要保持不变的时间(秒)
+    """
+    timeout = _timeout("resize", timeout)
+    settled = driver.execute_async_script(
+        _LAYOUT_SETTLED_SCRIPT, width, quiet_time * 1000, timeout * 1000
+    )
+    if not settled:
+        raise TimeoutException(f"视口宽度{width}下布局在{timeout}秒内未稳定")
+
+
+def wait_for_page_settled(driver, timeout=None):
+    """
+    等待页面加载完成并基本稳定
+
+    readyState必须在超时内变为complete；网络空闲和DOM稳定为尽力等待，
+    第三方统计等持续请求不会导致测试失败。
+    """
+    wait_for_page_ready(driver, timeout)
+    for condition in (wait_for_network_idle, wait_for_dom_stable):
+        try:
+            condition(driver)
+        except TimeoutException:
+            pass